@@ -0,0 +1,327 @@
+"""
+入座歷史：事件紀錄與每小時彙總（GET /analytics/occupancy）
+
+桌位的 occupied / updateTime 每次都被覆蓋，沒辦法回頭看哪個時段最滿、哪張桌子常空著。現在：
+- OccupancyLog 掛在 TableCache 上（跟 IM_stats 一樣），任何寫入路徑（入座 / 離座、PATCH、
+  /seats、配置套用）讓某張桌子的 occupied 或座位數改變時，記一筆事件：
+  {ts, table_id, floor, occupied, delta, seats}
+- 事件先放在記憶體佇列，背景 task 每 OCCUPANCY_FLUSH_INTERVAL 秒批次寫入資料庫
+  （MongoDB 為 time-series collection），寫入不在請求的路徑上；程序異常結束時最多遺失這幾秒的事件
+- 背景 task 每 OCCUPANCY_ROLLUP_INTERVAL 秒把事件彙總成每小時的 rollup：
+  每張桌子（table）、每個樓層（floor）、全店（store）的時間加權平均使用率、最高使用率 / 人數、
+  到店人數（arrivals，occupied 增加的量）
+- GET /analytics/occupancy 只讀 rollup（一年約 8760 x (樓層數 + 1) 筆），不掃原始事件
+- 原始事件保留 OCCUPANCY_EVENT_RETENTION_DAYS 天（預設 90），rollup 永久保留
+
+平均使用率 = Σ(人數 x 秒數) / Σ(座位數 x 秒數)，座位數的計算方式同 IM_stats（capacity + extraSeatLimit，
+只算 capacity > 0 且不是 s_ 開頭的桌子）。
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from IM_stats import is_seatable
+
+HOUR = timedelta(hours=1)
+STORE_KEY = "*"
+# 停機很久之後一次最多補算這麼多小時，其餘留到下一輪
+MAX_CATCHUP_HOURS = 24 * 7
+# 資料庫一直寫不進去時，記憶體裡最多保留的事件數（超過時丟掉最舊的）
+MAX_PENDING = 100_000
+
+
+def _seats(table: Optional[dict]) -> Tuple[Optional[str], int, int]:
+    """(floor, occupied, seats)；不列入統計的桌子視為 0 座位"""
+    if table is None or not is_seatable(table):
+        return None, 0, 0
+    return table.get("floor"), table.get("occupied", 0), table.get("capacity", 0) + table.get("extraSeatLimit", 0)
+
+
+def hour_start(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+# ---------- 彙總 ----------
+
+class _Series:
+    """一個統計對象（桌子 / 樓層 / 全店）在一個小時內的時間加權累計"""
+
+    __slots__ = ("occupied", "seats", "since", "occupied_seconds", "seat_seconds", "peak_occupied",
+                 "peak_utilization", "arrivals", "touched")
+
+    def __init__(self, start: datetime, occupied: int = 0, seats: int = 0):
+        self.occupied, self.seats, self.since = 0, 0, start
+        self.occupied_seconds = self.seat_seconds = 0.0
+        self.peak_occupied = 0
+        self.peak_utilization = 0.0
+        self.arrivals = 0
+        self.touched = False
+        self.seed(occupied, seats)
+
+    def seed(self, occupied: int, seats: int):
+        """整點時已經在的人數 / 座位數（不算到店）"""
+        self.occupied += occupied
+        self.seats += seats
+        self._peak()
+
+    def _peak(self):
+        self.peak_occupied = max(self.peak_occupied, self.occupied)
+        if self.seats:
+            self.peak_utilization = max(self.peak_utilization, self.occupied / self.seats)
+
+    def change(self, ts: datetime, d_occupied: int, d_seats: int, arrivals: int):
+        self.advance(ts)
+        self.occupied += d_occupied
+        self.seats += d_seats
+        self.arrivals += arrivals
+        self._peak()
+        self.touched = True
+
+    def advance(self, ts: datetime):
+        seconds = (ts - self.since).total_seconds()
+        self.occupied_seconds += self.occupied * seconds
+        self.seat_seconds += self.seats * seconds
+        self.since = ts
+
+    def doc(self, level: str, key: str, hour: datetime, seconds: float) -> dict:
+        return {
+            "level": level, "key": key, "hour": hour, "seconds": seconds, "seats": self.seats,
+            "occupied_seconds": self.occupied_seconds, "seat_seconds": self.seat_seconds,
+            "peak_occupied": self.peak_occupied, "peak_utilization": round(self.peak_utilization, 4),
+            "arrivals": self.arrivals,
+        }
+
+
+def rollup_hour(hour: datetime, end: datetime, levels: Dict[str, list],
+                events: List[dict]) -> Tuple[List[dict], Dict[str, list]]:
+    """
+    彙總 [hour, end) 之間的事件（依 ts 排序）
+    - levels：整點時每張桌子的 [floor, occupied, seats]
+    - 回傳 (rollup documents, end 時的 levels)
+    有事件或有人入座的桌子才產生 table 層級的 document；樓層與全店每小時都有一筆
+    """
+    levels = {table_id: list(level) for table_id, level in levels.items()}
+    store = _Series(hour)
+    floors: Dict[str, _Series] = {}
+    tables: Dict[str, _Series] = {}
+    for table_id, (floor, occupied, seats) in levels.items():
+        tables[table_id] = _Series(hour, occupied, seats)
+        floors.setdefault(floor, _Series(hour)).seed(occupied, seats)
+        store.seed(occupied, seats)
+
+    for event in events:
+        ts, table_id = event["ts"], event["table_id"]
+        old_floor, old_occupied, old_seats = levels.get(
+            table_id, [event["floor"], event["occupied"] - event["delta"], event["seats"]])
+        new_floor, new_occupied, new_seats = event["floor"], event["occupied"], event["seats"]
+        arrivals = max(0, event["delta"])
+        levels[table_id] = [new_floor, new_occupied, new_seats]
+
+        series = tables.get(table_id)
+        if series is None:
+            # 整點時還沒記錄到的桌子：事件之前的狀態視為從整點就存在
+            series = tables[table_id] = _Series(hour, old_occupied, old_seats)
+            floors.setdefault(old_floor, _Series(hour)).seed(old_occupied, old_seats)
+            store.seed(old_occupied, old_seats)
+        series.change(ts, new_occupied - old_occupied, new_seats - old_seats, arrivals)
+        if old_floor == new_floor:
+            floors.setdefault(new_floor, _Series(hour)).change(
+                ts, new_occupied - old_occupied, new_seats - old_seats, arrivals)
+        else:
+            floors.setdefault(old_floor, _Series(hour)).change(ts, -old_occupied, -old_seats, 0)
+            floors.setdefault(new_floor, _Series(hour)).change(ts, new_occupied, new_seats, arrivals)
+        store.change(ts, new_occupied - old_occupied, new_seats - old_seats, arrivals)
+
+    seconds = (end - hour).total_seconds()
+    docs = []
+    for table_id, series in tables.items():
+        series.advance(end)
+        if series.touched or series.occupied_seconds:
+            doc = series.doc("table", table_id, hour, seconds)
+            doc["floor"] = levels[table_id][0]
+            docs.append(doc)
+    for floor, series in floors.items():
+        series.advance(end)
+        if floor is not None and (series.seat_seconds or series.touched):
+            docs.append(series.doc("floor", floor, hour, seconds))
+    store.advance(end)
+    docs.append(store.doc("store", STORE_KEY, hour, seconds))
+    # 已經刪除 / 不列入統計的桌子不用再帶到下一個小時
+    levels = {t: level for t, level in levels.items() if level[1] or level[2]}
+    return docs, levels
+
+
+def _empty() -> dict:
+    return {"occupied_seconds": 0.0, "seat_seconds": 0.0, "seconds": 0.0,
+            "peak_occupied": 0, "peak_utilization": 0.0, "arrivals": 0}
+
+
+def _accumulate(acc: dict, doc: dict):
+    for field in ("occupied_seconds", "seat_seconds", "seconds", "arrivals"):
+        acc[field] += doc[field]
+    acc["peak_occupied"] = max(acc["peak_occupied"], doc["peak_occupied"])
+    acc["peak_utilization"] = max(acc["peak_utilization"], doc["peak_utilization"])
+
+
+def _point(acc: dict) -> dict:
+    rate = acc["occupied_seconds"] / acc["seat_seconds"] if acc["seat_seconds"] else 0.0
+    return {
+        "avgUtilization": round(rate, 4),
+        "avgOccupied": round(acc["occupied_seconds"] / acc["seconds"], 2) if acc["seconds"] else 0.0,
+        "peakUtilization": acc["peak_utilization"],
+        "peakOccupied": acc["peak_occupied"],
+        "arrivals": acc["arrivals"],
+    }
+
+
+def summarize(rollups: List[dict], bucket: str) -> Tuple[List[dict], dict]:
+    """
+    把每小時的 rollup 依 bucket（hour / day / week）合併成時間序列，另外回傳整段期間的合計。
+    樓層 / 全店的 peak 為各小時 peak 的最大值
+    """
+    buckets: Dict[datetime, dict] = {}
+    total = _empty()
+    for doc in rollups:
+        start = doc["hour"]
+        if bucket != "hour":
+            start = start.replace(hour=0)
+            if bucket == "week":
+                start -= timedelta(days=start.weekday())
+        _accumulate(buckets.setdefault(start, _empty()), doc)
+        _accumulate(total, doc)
+    series = [{"start": start.isoformat(), **_point(acc)} for start, acc in sorted(buckets.items())]
+    return series, _point(total)
+
+
+# ---------- 事件紀錄 ----------
+
+class OccupancyLog:
+    """TableCache listener：記錄入座變化，背景批次寫入並定期彙總"""
+
+    def __init__(self, store, retention_days: Optional[float] = None):
+        self.store = store
+        if retention_days is None:
+            retention_days = float(os.getenv("OCCUPANCY_EVENT_RETENTION_DAYS", 90))
+        self.retention = timedelta(days=retention_days)
+        self._pending: deque = deque(maxlen=MAX_PENDING)
+        self._lock = threading.Lock()
+        self._rollup_lock = asyncio.Lock()
+        self.last_rollup: Optional[dict] = None
+        self.written = 0
+
+    # ---------- TableCache listener ----------
+    def reset(self, tables):
+        # 整批重新載入不代表有人入座 / 離座（寫入的那個程序已經記過了）
+        pass
+
+    def apply(self, old: Optional[dict], new: Optional[dict]):
+        old_floor, old_occupied, old_seats = _seats(old)
+        floor, occupied, seats = _seats(new)
+        if (old_occupied, old_seats, old_floor) == (occupied, seats, floor) or (not seats and not old_seats):
+            return
+        table_id = (new or old)["table_id"]
+        event = {"ts": datetime.now(), "table_id": table_id, "floor": floor or old_floor,
+                 "occupied": occupied, "delta": occupied - old_occupied, "seats": seats}
+        with self._lock:
+            self._pending.append(event)
+
+    # ---------- 寫入 ----------
+    async def flush(self) -> int:
+        with self._lock:
+            batch = list(self._pending)
+            self._pending.clear()
+        if not batch:
+            return 0
+        try:
+            await self.store.append_occupancy_events(batch)
+        except Exception:
+            # 寫入失敗：放回佇列前面，下一輪再試
+            with self._lock:
+                self._pending.extendleft(reversed(batch))
+            raise
+        self.written += len(batch)
+        return len(batch)
+
+    # ---------- 彙總 ----------
+    async def rollup(self, now: Optional[datetime] = None, initial_tables: Optional[List[dict]] = None) -> dict:
+        """
+        從上次完成的整點開始，逐小時彙總到 now（最多 MAX_CATCHUP_HOURS 小時）。
+        還沒結束的這個小時也會先算一份（seconds < 3600），下一輪重算覆蓋。
+        第一次執行時以 initial_tables（目前的桌位狀態）當作起點
+        """
+        async with self._rollup_lock:
+            now = now or datetime.now()
+            state = await self.store.get_occupancy_state()
+            if state is None:
+                levels = {}
+                for table in initial_tables or []:
+                    floor, occupied, seats = _seats(table)
+                    if seats:
+                        levels[table["table_id"]] = [floor, occupied, seats]
+                state = {"hour": hour_start(now), "levels": levels}
+            hour, levels = state["hour"], state["levels"]
+            hours = 0
+            while hour <= now and hours < MAX_CATCHUP_HOURS:
+                end = min(hour + HOUR, now)
+                events = await self.store.occupancy_events_between(hour, end)
+                docs, end_levels = rollup_hour(hour, end, levels, events)
+                await self.store.save_occupancy_rollups(docs)
+                hours += 1
+                if end < hour + HOUR:
+                    break
+                hour, levels = hour + HOUR, end_levels
+                await self.store.save_occupancy_state({"hour": hour, "levels": levels})
+            self.last_rollup = {"time": now.isoformat(), "hours": hours, "through": hour.isoformat()}
+            return self.last_rollup
+
+    async def query(self, level: str, key: Optional[str], start: datetime, end: datetime,
+                    bucket: str = "hour") -> dict:
+        """level 為 table / floor / store，key 為 table_id / 樓層 / STORE_KEY"""
+        rollups = await self.store.occupancy_rollups(level, key, hour_start(start), end)
+        series, summary = summarize(rollups, bucket)
+        return {"series": series, "summary": summary}
+
+    # ---------- 背景 task ----------
+    async def ensure_storage(self):
+        """建立事件 collection（MongoDB 為 time-series）；要在 ensure_indexes 之前呼叫，否則會先被建成一般 collection"""
+        await self.store.ensure_occupancy_events(int(self.retention.total_seconds()))
+
+    def start(self, initial_tables=None, flush_interval: Optional[float] = None,
+              rollup_interval: Optional[float] = None):
+        """
+        在目前的 event loop 上啟動寫入與彙總的背景 task（於 startup 事件中呼叫）
+        - OCCUPANCY_FLUSH_INTERVAL：事件寫入間隔秒數（預設 2）
+        - OCCUPANCY_ROLLUP_INTERVAL：彙總間隔秒數（預設 60，<= 0 代表不彙總）
+        initial_tables：回傳目前桌位的 callable，第一次彙總時當作起點
+        """
+        if flush_interval is None:
+            flush_interval = float(os.getenv("OCCUPANCY_FLUSH_INTERVAL", 2))
+        if rollup_interval is None:
+            rollup_interval = float(os.getenv("OCCUPANCY_ROLLUP_INTERVAL", 60))
+
+        async def flush_loop():
+            while True:
+                await asyncio.sleep(flush_interval)
+                try:
+                    await self.flush()
+                except Exception:  # 資料庫暫時連不上時，事件留在佇列裡下一輪再寫
+                    pass
+
+        async def rollup_loop():
+            while True:
+                try:
+                    await self.flush()
+                    await self.rollup(initial_tables=await initial_tables() if initial_tables else None)
+                    await self.store.prune_occupancy_events(datetime.now() - self.retention)
+                except Exception as e:
+                    self.last_rollup = {"time": datetime.now().isoformat(), "error": str(e)}
+                await asyncio.sleep(rollup_interval)
+
+        tasks = [asyncio.create_task(flush_loop())]
+        if rollup_interval > 0:
+            tasks.append(asyncio.create_task(rollup_loop()))
+        return tasks
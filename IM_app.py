@@ -0,0 +1,53 @@
+"""
+合併部署：一個 ASGI 應用程式同時提供兩組路由
+
+- /tables、/background（IM_db_server，React 管理介面使用）
+- /seats、/health、/customer、/management（kaiwei/simple_local_server）
+- /stats、/stats/reconcile、/analytics/occupancy、/indexes、/metrics（IM_shared）
+- /img、/app（React 打包後的前端，見 IM_static）
+
+兩組路由共用同一個資料庫連線池、同一份桌位快取與 SSE 推播（見 IM_shared），
+任何一邊寫入，另一邊的快取與 /…/events 訂閱者都會同步看到，不需要等快取過期。
+JSON 回應依 Accept-Encoding 壓縮（見 IM_compress）；同時到達、內容相同的讀取只處理一次（見 IM_singleflight）。
+
+    uvicorn IM_app:app --host 0.0.0.0 --port 8002
+
+React 前端原本就連 8002；顧客頁 /customer 與管理頁 /management 也在同一個 port。
+"""
+
+import os
+import sys
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "kaiwei"))
+
+import IM_db_server
+import simple_local_server
+from IM_compress import CompressionMiddleware
+from IM_singleflight import SingleFlightMiddleware
+from IM_metrics import REGISTRY as metrics, MetricsMiddleware
+from IM_shared import ops_router, startup
+from IM_static import router as static_router
+
+app = FastAPI(title="Cafe Seat Management")
+app.add_middleware(SingleFlightMiddleware)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+app.include_router(IM_db_server.router)
+app.include_router(simple_local_server.router)
+app.include_router(ops_router)
+app.include_router(static_router)
+app.on_event("startup")(startup)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8002)
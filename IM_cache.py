@@ -0,0 +1,230 @@
+"""
+桌位資料的記憶體快取（write-through）
+
+啟動時把整個桌位 collection 讀進記憶體，之後：
+- GET 類路由直接從記憶體回傳，不再每次連到遠端 MongoDB
+- 寫入路由先寫 MongoDB，成功後再用 put() / remove() / clear() 同步更新快取
+- 超過 max_age 秒沒有整批重新載入時，下一次讀取會自動 reload 一次
+  （避免別的程序直接改資料庫後，這裡一直回傳舊資料）；
+  同時到達的讀取共用同一次 reload（見 IM_singleflight），不會各自查一次資料庫
+- 其他需要跟著桌位異動更新的東西（例如統計）可以用 add_listener() 掛上來
+- 每次內容變動 version 就 +1，etag() 直接拿來當 HTTP ETag，
+  前端輪詢時帶 If-None-Match，沒有變動就回 304，不用查資料庫也不用序列化
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from IM_singleflight import SingleFlight
+
+
+def cache_max_age_from_env(default: float = 30.0) -> Optional[float]:
+    """TABLE_CACHE_MAX_AGE=秒數；設成 0 或負數代表永不過期（只靠 write-through 與手動 refresh）"""
+    value = float(os.getenv("TABLE_CACHE_MAX_AGE", default))
+    return value if value > 0 else None
+
+
+class TableCache:
+    """
+    以 table_id 為 key，存放 format_table() 之後的桌位資料。
+    回傳的 dict 是快取本身持有的物件，呼叫端不要直接修改。
+    """
+
+    def __init__(self, store, formatter: Callable[[dict], dict],
+                 max_age: Optional[float] = None):
+        self.store = store
+        self.formatter = formatter
+        self.max_age = max_age
+        self._tables: Dict[str, dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._reloads = SingleFlight()
+        # load() 讀資料庫期間的 write-through 異動，讀完後重新套用（見 load）
+        self._loading = 0
+        self._journal: List[tuple] = []
+        # 重啟後 version 會從 0 開始，加上 instance 避免跟重啟前發出去的 ETag 撞在一起
+        self.instance = uuid.uuid4().hex[:8]
+        self.version = 0
+        # 讀取時不需要重新載入算 hit（/metrics 的 cache_hit_ratio）
+        self.hits = 0
+        self.misses = 0
+
+    def add_listener(self, listener):
+        """
+        listener 需要兩個方法：
+        - apply(old, new)：單筆異動，新增時 old 為 None、刪除時 new 為 None
+        - reset(tables)  ：整批重新載入 / 清空
+        都在快取的 lock 裡呼叫，順序和快取內容一致
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            listener.reset(list(self._tables.values()))
+
+    # ---------- 載入 / 失效 ----------
+    async def load(self) -> int:
+        """
+        從資料庫整批重新載入，回傳桌位數。
+        讀資料庫不在 lock 裡，期間的 put() / remove() / clear() 會記在 _journal，
+        讀完後依序套用到讀到的資料上（put 比較 rev，較新的為準），不會被較早讀到的資料蓋掉
+        """
+        with self._lock:
+            self._loading += 1
+            start = len(self._journal)
+        try:
+            tables = {}
+            # 一定讀 primary：快取是之後增量更新的基準，讀到落後的 secondary 會把剛寫入的變更蓋掉
+            for doc in await self.store.find_all(primary=True):
+                formatted = self.formatter(doc)
+                tables[formatted["table_id"]] = formatted
+            with self._lock:
+                for op, payload in self._journal[start:]:
+                    _replay(tables, op, payload)
+                self._tables = tables
+                self._loaded_at = time.monotonic()
+                self._notify_reset()
+        finally:
+            with self._lock:
+                self._loading -= 1
+                if not self._loading:
+                    self._journal = []
+        return len(tables)
+
+    @property
+    def age(self) -> Optional[float]:
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    async def _ensure_fresh(self):
+        age = self.age
+        if age is None or (self.max_age is not None and age > self.max_age):
+            self.misses += 1
+            await self._reloads.do("load", self.load)
+        else:
+            self.hits += 1
+
+    def _etag(self) -> str:
+        return f'"{self.instance}-{self.version}"'
+
+    async def etag(self) -> str:
+        await self._ensure_fresh()
+        return self._etag()
+
+    async def snapshot(self) -> Tuple[str, List[dict]]:
+        """同時取得 ETag 與全部桌位，兩者一定對應同一個 version"""
+        await self._ensure_fresh()
+        with self._lock:
+            return self._etag(), list(self._tables.values())
+
+    # ---------- 讀取 ----------
+    async def all(self) -> List[dict]:
+        await self._ensure_fresh()
+        with self._lock:
+            return list(self._tables.values())
+
+    async def get(self, table_id: str) -> Optional[dict]:
+        await self._ensure_fresh()
+        with self._lock:
+            return self._tables.get(table_id)
+
+    # ---------- write-through ----------
+    def put(self, table: dict):
+        with self._lock:
+            old = self._tables.get(table["table_id"])
+            self._tables[table["table_id"]] = table
+            self._record("put", table)
+            self.version += 1
+            for listener in self._listeners:
+                listener.apply(old, table)
+
+    def remove(self, table_id: str) -> Optional[dict]:
+        """移除並回傳快取裡原本的那筆（沒有時回傳 None）"""
+        with self._lock:
+            old = self._tables.pop(table_id, None)
+            self._record("remove", table_id)
+            if old is not None:
+                self.version += 1
+                for listener in self._listeners:
+                    listener.apply(old, None)
+            return old
+
+    def clear(self):
+        with self._lock:
+            self._tables = {}
+            self._record("reset", [])
+            self._notify_reset()
+
+    def _record(self, op: str, payload):
+        # 只在有 load() 正在讀資料庫時才需要記
+        if self._loading:
+            self._journal.append((op, payload))
+
+    def _notify_reset(self):
+        self.version += 1
+        tables = list(self._tables.values())
+        for listener in self._listeners:
+            listener.reset(tables)
+
+
+def _replay(tables: Dict[str, dict], op: str, payload):
+    """把 load() 期間的一筆 write-through 異動套用到讀到的資料上"""
+    if op == "put":
+        current = tables.get(payload["table_id"])
+        # 讀到的那筆比較新（別的程序在這之後又改過）時保留讀到的
+        if current is None or (current.get("rev") or 0) <= (payload.get("rev") or 0):
+            tables[payload["table_id"]] = payload
+    elif op == "remove":
+        tables.pop(payload, None)
+    else:  # "reset"：clear()
+        tables.clear()
+        tables.update((t["table_id"], t) for t in payload)
+
+
+def content_etag(doc: dict) -> str:
+    digest = hashlib.sha1(json.dumps(doc, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:16]}"'
+
+
+class BackgroundCache:
+    """
+    各樓層背景設定的快取：第一次讀取時向資料庫拿（同一個樓層同時只查一次），POST /background 時 write-through。
+    ETag 由內容雜湊而來，重啟後不變。
+    """
+
+    def __init__(self, store, max_age: Optional[float] = None):
+        self.store = store
+        self.max_age = max_age
+        self._entries: Dict[str, Tuple[float, str, dict]] = {}
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, floor_id: str) -> Optional[Tuple[str, dict]]:
+        """回傳 (etag, doc)；資料庫也沒有時回傳 None"""
+        with self._lock:
+            entry = self._entries.get(floor_id)
+        if entry and (self.max_age is None or time.monotonic() - entry[0] <= self.max_age):
+            self.hits += 1
+            return entry[1], entry[2]
+        self.misses += 1
+        doc = await self._loads.do(floor_id, lambda: self.store.get_background(floor_id))
+        if doc is None:
+            return None
+        return self.put(doc), doc
+
+    def put(self, doc: dict) -> str:
+        etag = content_etag(doc)
+        with self._lock:
+            self._entries[doc["floor_id"]] = (time.monotonic(), etag, doc)
+        return etag
+
+    def invalidate(self):
+        with self._lock:
+            self._entries = {}
@@ -0,0 +1,154 @@
+"""
+動態回應（JSON API）的壓縮
+
+GET /tables、/seats 的內容有大量重複的欄位名稱與中文標籤，壓縮後通常只剩 1/5 ~ 1/10，
+手機在行動網路上輪詢時差很多。
+
+- 依 Accept-Encoding 選擇 br / zstd / gzip（brotli、zstandard 為選用套件，沒裝時就不提供）
+- 小於 COMPRESS_MIN_SIZE（預設 1024 bytes）的回應不壓縮，省下的流量不值得花 CPU
+- CompressionMiddleware：一般路由的回應在送出前壓縮；SSE（text/event-stream）、
+  已經帶 Content-Encoding 的回應（例如 IM_static 預先壓縮的頁面）直接放行；
+  壓縮過的回應如果帶 strong ETag 就改成 weak ETag
+- 可以快取的列表回應（IM_json.EncodedListings）把壓縮後的 bytes 也一起存起來，
+  同一個版本的內容只壓縮一次，之後的輪詢直接回傳
+"""
+
+import gzip
+import os
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli 為選用套件
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard 為選用套件
+    zstandard = None
+
+MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+
+# 動態內容用中等壓縮等級：壓縮率接近最高等級，CPU 成本低很多
+COMPRESSORS = {}
+if brotli is not None:
+    COMPRESSORS["br"] = lambda body: brotli.compress(body, quality=5)
+if zstandard is not None:
+    _zstd = zstandard.ZstdCompressor(level=3)
+    COMPRESSORS["zstd"] = lambda body: _zstd.compress(body)
+COMPRESSORS["gzip"] = lambda body: gzip.compress(body, compresslevel=6, mtime=0)
+
+# 客戶端的 q 值相同時依這個順序挑選
+PREFERENCE = tuple(COMPRESSORS)
+
+_COMPRESSIBLE = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """解析 Accept-Encoding，回傳 {編碼: q 值}"""
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding: str, available=PREFERENCE) -> Optional[str]:
+    """從 available（依偏好排序）挑 q 值最高的編碼；都不接受時回傳 None"""
+    accepted = accepted_encodings(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return COMPRESSORS[encoding](body)
+
+
+def _add_vary(headers: list):
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[i] = (name, value + b", Accept-Encoding")
+            return
+    headers.append((b"vary", b"Accept-Encoding"))
+
+
+def _weaken_etag(headers: list):
+    # 壓縮後的 bytes 跟原始內容不同，strong ETag 改成 weak（見 IM_http.weak_etag）
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == b"etag" and not value.startswith(b"W/"):
+            headers[i] = (name, b"W/" + value)
+
+
+class CompressionMiddleware:
+    """
+    純 ASGI middleware：把整個回應收齊後再決定要不要壓縮。
+    body 分好幾段送出（串流回應）時不壓縮，照原樣轉送。
+    """
+
+    def __init__(self, app, minimum_size: int = MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept) if accept else None
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                headers = dict((k.lower(), v) for k, v in message.get("headers", []))
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if (b"content-encoding" in headers or not content_type.startswith(_COMPRESSIBLE)
+                        or content_type.startswith("text/event-stream")):
+                    passthrough = True
+                    return await send(message)
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # 串流回應：放棄壓縮，把先前攔下來的 start 與這段 body 照原樣送出
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            headers = list(start.get("headers", []))
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+                headers += [(b"content-encoding", encoding.encode()),
+                            (b"content-length", str(len(body)).encode())]
+                _add_vary(headers)
+                _weaken_etag(headers)
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
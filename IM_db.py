@@ -1,16 +1,10 @@
-import urllib.parse
-from pymongo import MongoClient
 import uuid
 from datetime import datetime
-# MongoDB 連線設定
-username = urllib.parse.quote_plus("user_01")
-password = urllib.parse.quote_plus("ll75dbilab@2025")
-host = "140.112.110.129:27017"
-database = "dify_db_bilab_2025_accounting"
-MONGO_URI = f"mongodb://{username}:{password}@{host}/{database}"
-
-client = MongoClient(MONGO_URI)
-db = client[database]
+from IM_mongo import create_mongo_client, mongo_settings_from_env
+# MongoDB 連線設定（MONGO_URI 等環境變數，見 IM_mongo）
+settings = mongo_settings_from_env()
+client = create_mongo_client(settings)
+db = client[settings.database]
 collection = db["im_final_project"]
 result = collection.delete_many({})
 print(f"已刪除 {result.deleted_count} 筆資料")
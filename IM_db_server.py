@@ -1,32 +1,31 @@
-from fastapi import FastAPI, HTTPException, Path
+from fastapi import APIRouter, FastAPI, HTTPException, Path, Query, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional
-from pymongo import MongoClient
-from pymongo.collection import ReturnDocument
-from bson import ObjectId
+from typing import List, Literal, Optional
+from collections import Counter
 from datetime import datetime
-import urllib.parse
 
-app = FastAPI(title="Cafe Table Management API")
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["GET", "POST", "DELETE", "PATCH", "OPTIONS"],
-    allow_headers=["*"],
+from IM_events import SSE_HEADERS
+from IM_http import etag_matches, not_modified, set_etag, weak_etag
+from IM_query import TableQuery
+from IM_compress import CompressionMiddleware
+from IM_singleflight import SingleFlightMiddleware
+from IM_json import dumps, json_response, listing_response
+from IM_layout import LAYOUT_BATCH_SIZE, diff_layout, export_layout, import_layout
+from IM_occupancy import OccupancyChange, check_in, check_out
+from IM_qrcode import DEFAULT_STYLE, QR_IMAGES, qr_etag, qrcode, table_url
+from IM_spatial import GEOMETRY_FIELDS, GridIndex, find_overlaps, table_rect
+from IM_storage import DuplicateTableError
+from IM_metrics import REGISTRY as metrics, MetricsMiddleware
+# 資料庫連線、快取、統計、推播和 /seats 路由共用一份（見 IM_shared）
+from IM_shared import (
+    store, format_table, table_cache, table_events, table_listings, bg_cache, spatial_index,
+    publish_upsert, reject_overlaps, startup, ops_router,
 )
 
-# MongoDB 連線設定
-username = urllib.parse.quote_plus("user_01")
-password = urllib.parse.quote_plus("ll75dbilab@2025")
-host = "140.112.110.129:27017"
-database = "dify_db_bilab_2025_accounting"
-MONGO_URI = f"mongodb://{username}:{password}@{host}/{database}"
-
-client = MongoClient(MONGO_URI)
-db = client[database]
-collection = db["im_final_project"]
-bg_collection = db["background_settings"]
+# /tables、/background 路由；單獨啟動時掛在下面的 app，合併部署時由 IM_app 掛上
+router = APIRouter()
 
 
 # ======== Pydantic Schemas ========
@@ -72,6 +71,8 @@ class TableUpdate(BaseModel):
     description: Optional[str]
     updateTime: Optional[datetime]
     available: Optional[bool]
+    # 前端會把讀到的整筆資料（含 rev）送回來；rev 由伺服器遞增，收到時忽略
+    rev: Optional[int] = None
 
 
     class Config:
@@ -79,6 +80,13 @@ class TableUpdate(BaseModel):
 
 class TableResponse(TableBase):
     id: str
+    rev: Optional[int] = None
+
+class TableChanges(BaseModel):
+    reset: bool
+    upserted: List[TableResponse]
+    deleted: List[str]
+    cursor: int
 
 class BackgroundSetting(BaseModel):
     floor_id: str
@@ -97,81 +105,247 @@ class BackgroundSetting(BaseModel):
 class BackgroundSettingResponse(BackgroundSetting):
     id: str
 
-# ======== Helper Function ========
-def format_table(table: dict) -> dict:
-    tags = table.get("tags", [])
-    if isinstance(tags, str):
-        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
-
-    return {
-        "id": str(table["_id"]),
-        "table_id": table["table_id"],
-        "floor": table["floor"],
-        "index": table["index"],
-        "name": table["name"],
-        "left": table["left"],
-        "top": table["top"],
-        "width": table["width"],
-        "height": table["height"],
-        "capacity": table["capacity"],
-        "occupied": table["occupied"],
-        "extraSeatLimit": table["extraSeatLimit"],
-        "tags": tags,
-        "description": table.get("description", ""),
-        "updateTime": table.get("updateTime"),
-        "available": table["available"]
-    }
-
 # --- API Routes ---
-@app.get("/tables", response_model=List[TableResponse])
-def get_all_tables():
-    return [format_table(t) for t in collection.find()]
-
-@app.post("/tables", response_model=TableResponse)
-def create_table(table: TableBase):
-    data = table.dict()
-    result = collection.insert_one(data)
-    data["_id"] = result.inserted_id
-    return format_table(data)
-
-@app.delete("/tables/clear")
-def clear_all_tables():
-    result = collection.delete_many({})
-    return {"message": f"Deleted {result.deleted_count} tables"}
-
-@app.patch("/tables/{table_id}", response_model=TableResponse)
-def update_table(table_id: str, table: TableUpdate):
-    updates = {k: v for k, v in table.dict(exclude_unset=True).items()}
-    result = collection.update_one({"table_id": table_id}, {"$set": updates})
-    if result.matched_count == 0:
+@router.get("/tables", response_model=List[TableResponse])
+async def get_all_tables(request: Request, query: TableQuery = Depends()):
+    etag = await table_cache.etag()
+    if etag_matches(request, etag):
+        return not_modified(weak_etag(etag))
+    etag, tables = await table_cache.snapshot()
+    return listing_response(request, table_listings, etag, query.key,
+                            lambda: query.apply(query.candidates(tables, spatial_index)))
+
+@router.get("/tables/changes", response_model=TableChanges)
+async def get_table_changes(since: int = 0):
+    changes = await store.changes_since(since)
+    changes["upserted"] = [format_table(t) for t in changes["upserted"]]
+    return json_response(dumps(changes))
+
+@router.post("/tables/cache/refresh")
+async def refresh_table_cache():
+    count = await table_cache.load()
+    return {"message": f"Reloaded {count} tables"}
+
+@router.get("/tables/events")
+async def stream_table_events(request: Request, floor: Optional[str] = None):
+    return StreamingResponse(
+        table_events.stream(request, floor),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@router.post("/tables", response_model=TableResponse)
+async def create_table(table: TableBase):
+    reject_overlaps(table.dict())
+    try:
+        formatted = format_table(await store.insert(table.dict()))
+    except DuplicateTableError:
+        raise HTTPException(status_code=409, detail=f"Table '{table.table_id}' already exists")
+    publish_upsert(formatted)
+    return formatted
+
+@router.delete("/tables/clear")
+async def clear_all_tables():
+    deleted_count = await store.clear()
+    table_cache.clear()
+    table_events.publish("clear")
+    return {"message": f"Deleted {deleted_count} tables"}
+
+@router.put("/tables/layout", response_model=List[TableResponse])
+async def replace_layout(tables: List[TableBase], response: Response):
+    """
+    儲存整份座位配置：依 table_id 跟資料庫現有的配置比對（IM_layout.diff_layout），
+    只新增 / 刪除有增減的桌位、只 $set 有變動的欄位，沒變的桌位不寫入，_id 也不會變。
+    整份配置在同一個 transaction 裡寫入（MongoDB 需要 replica set），失敗時原本的配置完全不變。
+    已經存在的桌位保留資料庫裡的 occupied / updateTime（營業中的入座人數不會被蓋掉）。
+    同樓層有桌位重疊時（判斷方式同前端編輯器，見 IM_spatial）整份不儲存，回 422。
+    回傳套用後的全部桌位；X-Layout-Diff 標頭為新增 / 更新 / 刪除的筆數
+    """
+    docs = [t.dict() for t in tables]
+    counts = Counter(d["table_id"] for d in docs)
+    duplicated = sorted(tid for tid, n in counts.items() if n > 1)
+    if duplicated:
+        raise HTTPException(status_code=422, detail=f"Duplicate table_id: {', '.join(duplicated)}")
+    overlaps = find_overlaps(docs)
+    if overlaps:
+        pairs = ", ".join(f"{a}/{b}" for a, b in overlaps[:20])
+        raise HTTPException(status_code=422, detail=f"Overlapping tables: {pairs}")
+
+    diff = diff_layout(await store.find_all(primary=True), docs)
+    try:
+        result = await store.apply_layout(diff)
+    except DuplicateTableError as e:
+        # 別的請求剛好新增了同一個 table_id；整份配置在同一個 transaction 裡，沒有任何變更寫入
+        raise HTTPException(status_code=409, detail=f"Table '{e}' already exists")
+    for doc in result["upserted"]:
+        publish_upsert(format_table(doc))
+    for doc in result["deleted"]:
+        table_cache.remove(doc["table_id"])
+        table_events.publish("delete", doc["table_id"], doc.get("floor"))
+    response.headers["X-Layout-Diff"] = (
+        f"inserted={len(diff.inserts)}, updated={len(diff.updates)}, deleted={len(diff.deletes)}"
+    )
+    _, current = await table_cache.snapshot()
+    return current
+
+@router.patch("/tables/{table_id}", response_model=TableResponse)
+async def update_table(table_id: str, table: TableUpdate):
+    updates = {k: v for k, v in table.dict(exclude_unset=True).items() if k != "rev"}
+    if updates.keys() & GEOMETRY_FIELDS:
+        current = await table_cache.get(table_id)
+        if current is not None:
+            reject_overlaps({**current, **updates}, ignore=(table_id,))
+    try:
+        updated = await store.update(table_id, updates)
+    except DuplicateTableError as e:
+        raise HTTPException(status_code=409, detail=f"Table '{e}' already exists")
+    if updated is None:
         raise HTTPException(status_code=404, detail="Table not found")
-    updated = collection.find_one({"table_id": table_id})
-    return format_table(updated)
+    updated = format_table(updated)
+    if updated["table_id"] != table_id:
+        # 改了 table_id：訂閱者要先刪掉舊的那張（舊的樓層以快取裡的為準）
+        old = table_cache.remove(table_id)
+        table_events.publish("delete", table_id, (old or updated)["floor"])
+    publish_upsert(updated)
+    return updated
 
-@app.delete("/tables/{table_id}")
-def delete_table(table_id: str):
-    result = collection.delete_one({"table_id": table_id})
-    if result.deleted_count == 0:
+@router.post("/tables/{table_id}/checkin", response_model=TableResponse)
+async def checkin_table(table_id: str, change: OccupancyChange):
+    updated = format_table(await check_in(store, table_id, change.guests, change.useExtraSeats))
+    publish_upsert(updated)
+    return updated
+
+@router.post("/tables/{table_id}/checkout", response_model=TableResponse)
+async def checkout_table(table_id: str, change: OccupancyChange):
+    updated = format_table(await check_out(store, table_id, change.guests))
+    publish_upsert(updated)
+    return updated
+
+@router.get("/tables/{table_id}/qr")
+async def get_table_qr(
+    table_id: str,
+    request: Request,
+    box_size: int = Query(DEFAULT_STYLE.box_size, ge=1, le=40),
+    border: int = Query(DEFAULT_STYLE.border, ge=0, le=16),
+):
+    """
+    桌位的 QR code（PNG），內容為 QR_BASE_URL?table_id=…（見 IM_qrcode）
+    - 產生過的圖片留在 LRU 快取裡，重複列印時不用重新產生
+    - ETag 為網址與圖片設定的雜湊，帶相同的 If-None-Match 時回 304
+    """
+    if qrcode is None:
+        raise HTTPException(status_code=503, detail="QR code renderer (qrcode[pil]) is not installed")
+    if await table_cache.get(table_id) is None:
         raise HTTPException(status_code=404, detail=f"Table '{table_id}' not found")
+    url = table_url(table_id)
+    style = DEFAULT_STYLE._replace(box_size=box_size, border=border)
+    if etag_matches(request, qr_etag(url, style)):
+        return not_modified(qr_etag(url, style))
+    etag, png = await QR_IMAGES.get(url, style)
+    response = Response(png, media_type="image/png")
+    set_etag(response, etag)
+    return response
+
+@router.delete("/tables/{table_id}")
+async def delete_table(table_id: str):
+    deleted = await store.delete(table_id)
+    if deleted is None:
+        raise HTTPException(status_code=404, detail=f"Table '{table_id}' not found")
+    table_cache.remove(table_id)
+    table_events.publish("delete", table_id, deleted.get("floor"))
     return {"message": f"Table '{table_id}' deleted successfully"}
 
-@app.post("/background", response_model=BackgroundSettingResponse)
-def create_or_update_bg_setting(setting: BackgroundSetting):
-    result = bg_collection.find_one_and_replace(
-        {"floor_id": setting.floor_id},
-        setting.dict(),
-        upsert=True,
-        return_document=ReturnDocument.AFTER
-    )
-    return result
+@router.post("/background", response_model=BackgroundSettingResponse)
+async def create_or_update_bg_setting(setting: BackgroundSetting):
+    result = await store.save_background(setting.dict())
+    bg_cache.put(result)
+    return {**result, "id": str(result["_id"])}
 
-@app.get("/background/{floor_id}", response_model=BackgroundSettingResponse)
-def get_bg_setting(floor_id: str):
-    doc = bg_collection.find_one({"floor_id": floor_id})
-    if not doc:
+@router.get("/background/{floor_id}", response_model=BackgroundSettingResponse)
+async def get_bg_setting(floor_id: str, request: Request, response: Response):
+    found = await bg_cache.get(floor_id)
+    if not found:
         raise HTTPException(status_code=404, detail="Not found")
-    doc["id"] = str(doc["_id"])
-    return doc
+    etag, doc = found
+    if etag_matches(request, etag):
+        return not_modified(weak_etag(etag))
+    set_etag(response, weak_etag(etag))
+    return {**doc, "id": str(doc["_id"])}
+
+# --- 配置匯入 / 匯出（table_data.csv，見 IM_layout）---
+@router.post("/layout/import")
+async def import_layout_csv(request: Request, mode: Literal["merge", "replace"] = "merge"):
+    """
+    串流匯入 table_data.csv（request body 直接是檔案內容，例如 fetch(url, {method: "POST", body: file})）
+    - 每 LAYOUT_BATCH_SIZE 列寫入一次；有問題的列帶行號列在 errors，其他列照常匯入
+    - mode=merge：依 table_id 新增或覆蓋；mode=replace：另外刪掉檔案裡沒有的桌位（有任何錯誤時不刪）
+    - 跟檔案裡前面的桌位重疊的列視為錯誤，不匯入
+    - 檔案裡的商家設定與背景裁切寫進 1F 的背景設定
+    整個匯入不是單一 transaction：中途失敗時已寫入的批次會保留
+    """
+    grids = {}
+
+    def validate(row: dict) -> dict:
+        # 跟檔案裡前面的桌位重疊的列視為錯誤（不跟資料庫裡、檔案沒有的桌位比對）
+        doc = TableBase(**row).dict()
+        grid = grids.setdefault(doc["floor"], GridIndex())
+        rect = table_rect(doc)
+        hits = sorted(k for k in grid.overlapping(rect) if k != doc["table_id"])
+        if hits:
+            raise ValueError(f"overlaps {', '.join(hits)}")
+        if doc["table_id"] not in grid:
+            grid.insert(doc["table_id"], rect)
+        return doc
+
+    try:
+        report = await import_layout(request.stream(), store, validate, replace=(mode == "replace"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # 中途失敗時已經寫入的批次也要反映到快取與訂閱者
+        await table_cache.load()
+        table_events.publish("reload")
+
+    background = report.pop("background")
+    if background:
+        found = await bg_cache.get("1F")
+        current = {k: v for k, v in found[1].items() if k != "_id"} if found else {}
+        defaults = {"floor_id": "1F", "cropX": 0, "cropY": 0, "cropWidth": 0, "cropHeight": 0,
+                    "cropZoom": 1.0, "rotation": 0, "bgHidden": False, "gridHidden": False, "seatIndex": False}
+        try:
+            setting = BackgroundSetting(**{**defaults, **current, **background})
+        except ValueError as e:
+            report["background"] = f"not saved: {e}"
+        else:
+            bg_cache.put(await store.save_background(setting.dict()))
+            report["background"] = "saved"
+    return report
+
+@router.get("/layout/export")
+async def export_layout_csv():
+    """
+    匯出目前的配置（table_data.csv 格式），從資料庫每次取 LAYOUT_BATCH_SIZE 筆邊讀邊送
+    """
+    found = await bg_cache.get("1F")
+    return StreamingResponse(
+        export_layout(store, found[1] if found else None, LAYOUT_BATCH_SIZE),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="table_data.csv"'},
+    )
+
+app = FastAPI(title="Cafe Table Management API")
+app.add_middleware(SingleFlightMiddleware)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["GET", "POST", "DELETE", "PATCH", "PUT", "OPTIONS"],
+    allow_headers=["*"],
+)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+app.include_router(router)
+app.include_router(ops_router)
+app.on_event("startup")(startup)
 
 if __name__ == "__main__":
     import uvicorn
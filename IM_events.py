@@ -0,0 +1,126 @@
+"""
+桌位異動事件廣播（Server-Sent Events）
+
+寫入路由（新增 / 更新 / 刪除 / 清空桌位）呼叫 `publish()`，
+每個連上 `/tables/events` 或 `/seats/events` 的瀏覽器各自有一個 queue，
+事件送進 queue 後由 `stream()` 轉成 SSE 格式推給前端。
+沒有任何異動時伺服器只會每隔一段時間送一行 keep-alive 註解，不會碰資料庫。
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+from datetime import datetime
+from typing import Optional
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, floor: Optional[str], maxsize: int):
+        self.loop = loop
+        self.floor = floor
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def wants(self, floor: Optional[str]) -> bool:
+        # floor 為 None 的事件（例如清空全部）要送給所有人
+        return self.floor is None or floor is None or self.floor == floor
+
+    def offer(self, event: dict):
+        # 只在 event loop 執行緒裡呼叫；前端太慢時丟掉最舊的事件，避免記憶體無限成長
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(event)
+
+
+class TableEventBroker:
+    """
+    把桌位異動事件分送給所有訂閱中的 SSE 連線。
+    - publish() 可以從 threadpool（一般 def 路由）或 event loop 裡呼叫
+    - 每個事件都有遞增的 id，前端斷線重連時瀏覽器會自動帶 Last-Event-ID
+    """
+
+    def __init__(self, queue_size: int = 256, heartbeat: float = 15.0):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, floor: Optional[str] = None) -> _Subscriber:
+        sub = _Subscriber(asyncio.get_running_loop(), floor, self.queue_size)
+        with self._lock:
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: _Subscriber):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def publish(self, event_type: str, table_id: Optional[str] = None,
+                floor: Optional[str] = None, table: Optional[dict] = None):
+        """
+        event_type:
+        - "upsert": 新增或更新，table 為 format_table() 後的完整資料
+        - "delete": 刪除單一桌位
+        - "clear" : 全部桌位被清空
+        - "reload": 整份配置被替換，前端應該整批重新載入
+        """
+        with self._lock:
+            targets = [s for s in self._subscribers if s.wants(floor)]
+        if not targets:
+            return
+
+        event = {
+            "id": next(self._seq),
+            "type": event_type,
+            "table_id": table_id,
+            "floor": floor,
+            "table": table,
+        }
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, event)
+            except RuntimeError:
+                # event loop 已經關閉（連線中斷但還沒 unsubscribe）
+                self.unsubscribe(sub)
+
+    async def stream(self, request, floor: Optional[str] = None):
+        """給 StreamingResponse 用的 async generator，輸出 text/event-stream 內容"""
+        sub = self.subscribe(floor)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            self.unsubscribe(sub)
+
+
+def format_sse(event: dict) -> str:
+    data = json.dumps(event, ensure_ascii=False, default=_json_default)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # 避免 nginx 之類的 reverse proxy 把事件攢起來
+}
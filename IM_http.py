@@ -0,0 +1,38 @@
+"""
+HTTP 條件式請求（ETag / If-None-Match）的小工具
+"""
+
+from fastapi import Request, Response
+
+# no-cache：瀏覽器可以留著回應，但每次使用前都要帶 If-None-Match 回來確認
+REVALIDATE = "no-cache"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match 比對用 weak comparison：忽略 W/ 前綴
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+
+def weak_etag(etag: str) -> str:
+    """
+    依 Accept-Encoding 壓縮的回應：gzip 與原始內容的 bytes 不同，不能共用 strong ETag，
+    改成共用同一個 weak ETag（W/ 前綴，同 IM_static）
+    """
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+def not_modified(etag: str) -> Response:
+    # 304 要帶跟 200 一樣的 Vary，代理伺服器才不會把不同編碼的版本混在一起
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE,
+                                              "Vary": "Accept-Encoding"})
+
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE
@@ -0,0 +1,99 @@
+"""
+MongoDB index 登記表
+
+所有熱門查詢需要的 index 都登記在 INDEXES，啟動時由 ensure_indexes() 建立並比對：
+- missing   ：登記了但資料庫沒有 → 建立
+- mismatched：同名 index 的欄位 / unique 設定和登記不同 → 只回報，不自動刪除重建
+- extra     ：資料庫有但沒有登記（_id_ 除外）→ 只回報
+- failed    ：建立失敗（例如既有資料的 table_id 重複，unique index 建不起來）
+
+QUERIES 列出會打到資料庫的查詢條件，find_collscans() 用 explain() 確認它們都有用到 index，
+benchmarks/index_check.py 會在出現 COLLSCAN 時回傳非 0。
+"""
+
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class IndexSpec(NamedTuple):
+    name: str
+    keys: List[Tuple[str, int]]
+    unique: bool = False
+
+
+# key 為 store 上的 collection 屬性名稱（見 IM_storage.MongoTableStore）
+INDEXES: Dict[str, List[IndexSpec]] = {
+    "tables": [
+        IndexSpec("table_id_unique", [("table_id", 1)], unique=True),
+        IndexSpec("floor_available_capacity", [("floor", 1), ("available", 1), ("capacity", 1)]),
+        IndexSpec("available_capacity", [("available", 1), ("capacity", 1)]),
+        IndexSpec("rev", [("rev", 1)]),
+    ],
+    "tombstones": [
+        IndexSpec("rev", [("rev", 1)]),
+    ],
+    "backgrounds": [
+        IndexSpec("floor_id_unique", [("floor_id", 1)], unique=True),
+    ],
+    # 入座歷史（見 IM_analytics）：事件依時間區間讀取，rollup 依 (層級, 對象, 小時) 查詢
+    "occupancy_events": [
+        IndexSpec("ts", [("ts", 1)]),
+    ],
+    "occupancy_rollups": [
+        IndexSpec("level_key_hour_unique", [("level", 1), ("key", 1), ("hour", 1)], unique=True),
+    ],
+}
+
+QUERIES: List[Tuple[str, dict]] = [
+    ("tables", {"table_id": "t_01"}),
+    ("tables", {"available": True, "capacity": {"$gt": 0}}),
+    ("tables", {"floor": "1F", "available": True, "capacity": {"$gt": 0}}),
+    ("tables", {"floor": "1F"}),
+    ("tables", {"rev": {"$gt": 0}}),
+    ("tombstones", {"rev": {"$gt": 0}}),
+    ("backgrounds", {"floor_id": "1F"}),
+    ("occupancy_rollups", {"level": "floor", "key": "1F", "hour": {"$gte": "2025-01-01T00:00:00"}}),
+]
+
+
+def _matches(spec: IndexSpec, info: dict) -> bool:
+    return [tuple(k) for k in info["key"]] == list(spec.keys) and bool(info.get("unique")) == spec.unique
+
+
+async def ensure_indexes(store) -> dict:
+    """建立缺少的 index 並回傳比對結果 {"created", "mismatched", "extra", "failed"}"""
+    report = {"created": [], "mismatched": [], "extra": [], "failed": []}
+    for target, specs in INDEXES.items():
+        existing = await store.index_information(target)
+        for spec in specs:
+            label = f"{target}.{spec.name}"
+            if spec.name not in existing:
+                try:
+                    await store.create_index(target, spec)
+                    report["created"].append(label)
+                except Exception as e:
+                    report["failed"].append({"index": label, "error": str(e)})
+            elif not _matches(spec, existing[spec.name]):
+                report["mismatched"].append(label)
+        registered = {spec.name for spec in specs} | {"_id_"}
+        report["extra"] += [f"{target}.{name}" for name in existing if name not in registered]
+    return report
+
+
+def _stages(plan: dict):
+    yield plan.get("stage")
+    for child in plan.get("inputStages", []) + [plan.get("inputStage") or {}]:
+        if child:
+            yield from _stages(child)
+
+
+async def find_collscans(store) -> List[dict]:
+    """回傳會退化成全表掃描（COLLSCAN）的登記查詢；空 list 代表全部都有用到 index"""
+    problems = []
+    for target, query in QUERIES:
+        plan = await store.explain_find(target, query)
+        winning = plan["queryPlanner"]["winningPlan"]
+        # 新版 MongoDB 會把 plan 包在 queryPlan 底下
+        stages = set(_stages(winning.get("queryPlan", winning)))
+        if "COLLSCAN" in stages:
+            problems.append({"collection": target, "filter": query})
+    return problems
@@ -0,0 +1,132 @@
+"""
+列表回應的快速 JSON 序列化
+
+GET /tables、/seats 一次回傳幾百筆桌位，原本每次都要：
+format_table() → response_model 逐筆驗證 → jsonable_encoder → json.dumps，
+前端每幾秒輪詢一次，CPU 幾乎都花在這裡。現在：
+- 快取裡的資料都是 format_table() 產生的，格式已經確定，不再經過 response_model 驗證
+  （response_model 仍留在路由上，只用來產生 /docs）
+- 用 orjson 直接編碼成 bytes（沒有安裝時退回標準庫 json，輸出格式相同）
+- 編碼結果依「快取 version + 查詢參數」保存，內容沒變之前同樣的查詢直接回傳同一份 bytes
+- 壓縮後的 bytes（gzip / br / zstd，見 IM_compress）跟著同一筆快取保存，每個版本只壓縮一次
+
+比較結果見 benchmarks/serialization_benchmark.py。
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+from IM_compress import MIN_SIZE, choose_encoding, compress
+from IM_http import set_etag, weak_etag
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson 為選用套件
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(obj) -> bytes:
+    """編碼成 UTF-8 JSON bytes（datetime 轉成 ISO 8601 字串，和 FastAPI 預設輸出一致）"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, default=_default, ensure_ascii=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+class JSONBytesResponse(Response):
+    """內容已經是編碼好的 JSON bytes，直接送出"""
+    media_type = "application/json"
+
+
+def json_response(body: bytes, etag: Optional[str] = None,
+                  encoding: Optional[str] = None) -> JSONBytesResponse:
+    response = JSONBytesResponse(content=body)
+    if etag is not None:
+        # 壓縮與否共用同一個 ETag，所以一律是 weak ETag
+        set_etag(response, weak_etag(etag))
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    # 同一個網址依 Accept-Encoding 可能回傳不同的 bytes，代理伺服器要分開快取
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+def listing_response(request: Request, listings: "EncodedListings", etag: str,
+                     key: Hashable, build: Callable[[], object]) -> JSONBytesResponse:
+    """依 Accept-Encoding 從 listings 取出（必要時產生）對應編碼的列表回應"""
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    body, encoding = listings.get_encoded(etag, key, build, encoding)
+    return json_response(body, etag, encoding)
+
+
+class EncodedListings:
+    """
+    保存編碼好的列表回應，key 為 (ETag, 查詢參數)。
+    ETag 一變（快取內容有異動）就整份丟掉；同一個版本最多保存 max_entries 種查詢，
+    超過時丟掉最久沒用到的。每種查詢底下依傳輸編碼保存：None 為原始 JSON，
+    其他為壓縮後的 bytes（第一次有客戶端要求該編碼時才壓縮）。
+    """
+
+    def __init__(self, max_entries: int = 64, min_compress_size: int = MIN_SIZE):
+        self.max_entries = max_entries
+        self.min_compress_size = min_compress_size
+        self._etag: Optional[str] = None
+        self._entries: "OrderedDict[Hashable, Dict[Optional[str], bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag: str, key: Hashable, build: Callable[[], object]) -> bytes:
+        """取得 (etag, key) 的編碼結果；沒有時呼叫 build() 產生資料並編碼"""
+        return self.get_encoded(etag, key, build, None)[0]
+
+    def get_encoded(self, etag: str, key: Hashable, build: Callable[[], object],
+                    encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """
+        取得 (etag, key) 以 encoding 壓縮的結果，回傳 (bytes, 實際使用的編碼)；
+        原始 JSON 小於 min_compress_size 時不壓縮，編碼為 None
+        """
+        with self._lock:
+            variants = self._entries.get(key) if etag == self._etag else None
+            if variants is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                body = variants[None]
+                if encoding is None or len(body) < self.min_compress_size:
+                    return body, None
+                if encoding in variants:
+                    return variants[encoding], encoding
+        if variants is None:
+            body = dumps(build())
+            with self._lock:
+                self.misses += 1
+                if etag != self._etag:
+                    self._etag = etag
+                    self._entries.clear()
+                variants = self._entries.setdefault(key, {None: body})
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            if encoding is None or len(body) < self.min_compress_size:
+                return body, None
+        compressed = compress(body, encoding)
+        with self._lock:
+            # 只有在這段期間內容沒有換版本時才存回去（variants 仍是同一份 dict 即可安全寫入）
+            variants[encoding] = compressed
+        return compressed, encoding
+
+    def clear(self):
+        with self._lock:
+            self._etag = None
+            self._entries.clear()
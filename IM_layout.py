@@ -0,0 +1,339 @@
+"""
+桌位配置的串流匯入 / 匯出（前端「備份桌位資料」的 table_data.csv 格式）
+
+檔案由空白行分成三段，每段第一列是表頭：
+    topbar-title,bgHidden,gridHidden,seatIndexShown     ← 商家設定（一列）
+    cropX,cropY,cropWidth,cropHeight,cropZoom          ← 背景裁切（一列）
+    table_id,index,name,left,top,…,available,floor      ← 桌位（多列）
+
+原本整個檔案在瀏覽器裡解析，再整份送回伺服器；上千張桌位、多個樓層時很吃記憶體。現在：
+- 匯入（POST /layout/import）：一邊接收 request body 一邊解析，每 LAYOUT_BATCH_SIZE 列
+  用一次 bulk_write 寫入（store.upsert_many），記憶體裡只有一批；每一列的錯誤（格式、
+  欄位驗證、檔案內 table_id 重複、資料庫寫入失敗）都帶行號回報，不影響其他列
+- 匯出（GET /layout/export）：從資料庫 cursor 依 table_id 每次取 LAYOUT_BATCH_SIZE 筆，
+  邊讀邊送出（store.iter_tables）
+
+欄位轉換與前端 Navbar.jsx 的匯入 / 匯出一致：tags 以逗號串在一格裡、available 為 true/false、
+name / tags / description 一律加引號。
+
+編輯器儲存整份配置（PUT /tables/layout）用 diff_layout：依 table_id 跟資料庫現有的配置比對，
+只新增、刪除真的有增減的桌位，其餘只 $set 有變動的欄位；occupied / updateTime 是營業中的即時狀態，
+已經存在的桌位不會被編輯器送來的舊值蓋掉。
+"""
+
+import codecs
+import csv
+import os
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+LAYOUT_BATCH_SIZE = int(os.getenv("LAYOUT_BATCH_SIZE", 500))
+# 錯誤很多時只列出前面這幾筆，其餘只計數
+MAX_REPORTED_ERRORS = 100
+# 單一列（含引號內換行）的上限，避免沒有換行的 body 一直累積
+MAX_RECORD_CHARS = 1 << 20
+
+SETTINGS_HEADER = ["topbar-title", "bgHidden", "gridHidden", "seatIndexShown"]
+CROP_HEADER = ["cropX", "cropY", "cropWidth", "cropHeight", "cropZoom"]
+TABLE_HEADER = [
+    "table_id", "index", "name", "left", "top", "width", "height",
+    "capacity", "occupied", "extraSeatLimit", "tags", "description",
+    "updateTime", "available", "floor",
+]
+_NUMBER_FIELDS = ("index", "left", "top", "width", "height", "capacity", "occupied", "extraSeatLimit")
+# 營業中由入座 / 離座更新的欄位，套用配置時保留資料庫的值
+LIVE_FIELDS = ("occupied", "updateTime")
+
+
+# ---------- 解析 ----------
+
+async def _records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """把 bytes 串流切成 CSV 記錄（引號內的換行不算），回傳 (起始行號, 記錄內容)"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    record: List[str] = []
+    quotes = 0
+    line_no = start = 0
+
+    def feed(line: str):
+        nonlocal quotes, line_no, start
+        line_no += 1
+        if not record:
+            start = line_no
+        record.append(line.removesuffix("\r"))
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            text = "\n".join(record)
+            record.clear()
+            quotes = 0
+            return start, text
+        if sum(len(part) for part in record) > MAX_RECORD_CHARS:
+            raise ValueError(f"line {start}: record too long (unterminated quote?)")
+        return None
+
+    async for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        *lines, pending = text.split("\n")
+        if len(pending) > MAX_RECORD_CHARS:
+            raise ValueError(f"line {line_no + 1}: line too long")
+        for line in lines:
+            done = feed(line)
+            if done:
+                yield done
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        done = feed(pending)
+        if done:
+            yield done
+    if record:
+        yield start, "\n".join(record)
+
+
+async def parse_layout(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    """
+    逐列解析 table_data.csv，產生：
+    ("settings", 行號, dict)、("crop", 行號, dict)、("table", 行號, dict)、("error", 行號, 訊息)
+    各段依表頭辨識，不依賴固定的行號
+    """
+    header: Optional[List[str]] = None
+    async for line, record in _records(chunks):
+        if not record.strip():
+            header = None
+            continue
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            yield "error", line, str(e)
+            continue
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        if len(values) != len(header):
+            yield "error", line, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        row = dict(zip(header, values))
+        if header[0] == "table_id":
+            yield "table", line, row
+        elif header[0] == "topbar-title":
+            yield "settings", line, row
+        elif header[0] == "cropX":
+            yield "crop", line, row
+        else:
+            yield "error", line, f"unknown section header: {header[0]}"
+
+
+def _number(value: str):
+    # 和前端一樣：空白當 0；非數字則回報錯誤（前端會默默變成 0）
+    value = value.strip()
+    if not value:
+        return 0
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def row_to_table(row: Dict[str, str]) -> dict:
+    """桌位列轉成 TableBase 的欄位（數字、布林、tags、updateTime），欄位驗證交給呼叫端"""
+    table: dict = {}
+    for field, value in row.items():
+        if field in _NUMBER_FIELDS:
+            try:
+                table[field] = _number(value)
+            except ValueError:
+                raise ValueError(f"{field}: not a number: {value!r}")
+        elif field == "available":
+            table[field] = value.strip().lower() == "true"
+        elif field == "tags":
+            table[field] = [tag.strip() for tag in value.split(",") if tag.strip()]
+        elif field == "updateTime":
+            table[field] = value.strip() or None
+        else:
+            table[field] = value
+    table["floor"] = table.get("floor") or "1F"
+    table.setdefault("description", "")
+    return table
+
+
+def settings_to_background(settings: Optional[dict], crop: Optional[dict]) -> dict:
+    """商家設定 / 背景裁切兩段轉成 POST /background 的欄位（只包含檔案裡有的段落）"""
+    background: dict = {}
+    if settings:
+        background["title"] = settings.get("topbar-title") or "Seats Viewer"
+        for field, key in (("bgHidden", "bgHidden"), ("gridHidden", "gridHidden"), ("seatIndexShown", "seatIndex")):
+            background[key] = settings.get(field, "").strip().lower() == "true"
+    if crop:
+        for field in CROP_HEADER:
+            try:
+                background[field] = float(crop.get(field) or 0)
+            except ValueError:
+                background[field] = 0.0
+        for field in ("cropX", "cropY", "cropWidth", "cropHeight"):
+            background[field] = round(background[field])
+    return background
+
+
+def _error_message(exc: Exception) -> str:
+    # pydantic 的 ValidationError 也是 ValueError，整理成 "欄位: 訊息"
+    if hasattr(exc, "errors"):
+        return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in exc.errors())
+    return str(exc)
+
+
+async def import_layout(chunks: AsyncIterator[bytes], store, validate: Callable[[dict], dict],
+                        replace: bool = False, batch_size: int = LAYOUT_BATCH_SIZE) -> dict:
+    """
+    串流匯入，回傳
+    {"inserted", "updated", "deleted", "errorCount", "errors": [{"line", "table_id", "error"}],
+     "background": 商家設定與背景裁切（沒有這兩段時為空 dict）}
+    - validate(dict) -> dict：驗證並回傳要寫入的 document，失敗時丟 ValueError
+    - replace=True：匯入完成後刪掉檔案裡沒有的桌位；有任何一列失敗時不刪，避免誤刪
+    """
+    report = {"inserted": 0, "updated": 0, "deleted": 0, "errorCount": 0, "errors": []}
+    sections: Dict[str, dict] = {}
+    seen: Set[str] = set()
+    batch: List[dict] = []
+    lines: List[int] = []
+
+    def error(line: int, table_id, message: str):
+        report["errorCount"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line, "table_id": table_id, "error": message})
+
+    async def flush():
+        result = await store.upsert_many(batch)
+        report["inserted"] += result["inserted"]
+        report["updated"] += result["updated"]
+        for err in result["errors"]:
+            error(lines[err["index"]], err["table_id"], err["error"])
+        batch.clear()
+        lines.clear()
+
+    async for kind, line, payload in parse_layout(chunks):
+        if kind == "error":
+            error(line, None, payload)
+        elif kind != "table":
+            sections[kind] = payload
+        else:
+            table_id = payload.get("table_id") or None
+            try:
+                doc = validate(row_to_table(payload))
+            except ValueError as e:
+                error(line, table_id, _error_message(e))
+                continue
+            if doc["table_id"] in seen:
+                error(line, doc["table_id"], "duplicate table_id in file")
+                continue
+            seen.add(doc["table_id"])
+            batch.append(doc)
+            lines.append(line)
+            if len(batch) >= batch_size:
+                await flush()
+    if batch:
+        await flush()
+
+    if replace and not report["errorCount"]:
+        report["deleted"] = len(await store.delete_except(seen))
+    report["background"] = settings_to_background(sections.get("settings"), sections.get("crop"))
+    return report
+
+
+# ---------- 匯出 ----------
+
+def _quoted(value) -> str:
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _plain(value) -> str:
+    # 不一定加引號的欄位：含有逗號、引號或換行時才加
+    text = "" if value is None else str(value)
+    return _quoted(text) if any(c in text for c in ',"\r\n') else text
+
+
+def _num(value) -> str:
+    # 50.0 輸出成 50（和前端 JavaScript 的數字格式一致）
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "" if value is None else str(value)
+
+
+def _bool(value) -> str:
+    return "true" if value else "false"
+
+
+def table_to_csv(table: dict) -> str:
+    tags = table.get("tags") or []
+    if not isinstance(tags, str):
+        tags = ",".join(tags)
+    update_time = table.get("updateTime")
+    if isinstance(update_time, datetime):
+        update_time = update_time.isoformat()
+    return ",".join([
+        _plain(table["table_id"]), _num(table.get("index")), _quoted(table.get("name") or ""),
+        _num(table.get("left")), _num(table.get("top")), _num(table.get("width")), _num(table.get("height")),
+        _num(table.get("capacity")), _num(table.get("occupied")), _num(table.get("extraSeatLimit")),
+        _quoted(tags), _quoted(table.get("description") or ""),
+        _plain(update_time or ""), _bool(table.get("available")), _plain(table.get("floor") or "1F"),
+    ])
+
+
+def _header_csv(background: Optional[dict]) -> str:
+    bg = background or {}
+    settings = [
+        _quoted(bg.get("title") or "Seats Viewer"),
+        _bool(bg.get("bgHidden")), _bool(bg.get("gridHidden")), _bool(bg.get("seatIndex")),
+    ]
+    crop = [_num(bg.get(field, "")) for field in CROP_HEADER]
+    return "\r\n".join([
+        ",".join(SETTINGS_HEADER), ",".join(settings), "",
+        ",".join(CROP_HEADER), ",".join(crop), "",
+        ",".join(TABLE_HEADER),
+    ])
+
+
+async def export_layout(store, background: Optional[dict],
+                        batch_size: int = LAYOUT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """依序產生 CSV 的 bytes：先是商家設定與背景裁切，接著每批桌位一段"""
+    yield _header_csv(background).encode("utf-8")
+    async for batch in store.iter_tables(batch_size):
+        yield "".join("\r\n" + table_to_csv(table) for table in batch).encode("utf-8")
+
+
+# ---------- 套用配置 ----------
+
+class LayoutDiff(NamedTuple):
+    inserts: List[dict]
+    updates: List[Tuple[str, dict]]  # (table_id, 要 $set 的欄位)
+    deletes: List[str]
+
+
+def diff_layout(current: Iterable[dict], submitted: Iterable[dict]) -> LayoutDiff:
+    """
+    以 table_id 比對現有配置與送來的配置：
+    - 只在 submitted 的桌位 → inserts（整筆，包含 occupied）
+    - 兩邊都有 → 只列出值不同的欄位（LIVE_FIELDS 除外），沒有差異的桌位不寫入
+    - 只在 current 的桌位 → deletes
+    """
+    existing = {doc["table_id"]: doc for doc in current}
+    inserts, updates = [], []
+    seen = set()
+    for doc in submitted:
+        table_id = doc["table_id"]
+        seen.add(table_id)
+        old = existing.get(table_id)
+        if old is None:
+            inserts.append(doc)
+            continue
+        changed = {
+            field: value for field, value in doc.items()
+            if field not in LIVE_FIELDS and field != "table_id" and _differs(old.get(field), value)
+        }
+        if changed:
+            updates.append((table_id, changed))
+    deletes = [table_id for table_id in existing if table_id not in seen]
+    return LayoutDiff(inserts, updates, deletes)
+
+
+def _differs(old, new) -> bool:
+    # 舊資料的 tags 可能存成逗號字串
+    if isinstance(old, str) and isinstance(new, list):
+        old = [tag.strip() for tag in old.split(",") if tag.strip()]
+    return old != new
@@ -0,0 +1,219 @@
+"""
+Prometheus 文字格式的 /metrics
+
+不依賴 prometheus_client，只做這個專案需要的幾種指標：
+- http_requests_total / http_request_duration_seconds：依 method、路由樣板（例如 /seats/{table_id}）、
+  狀態碼分開的請求數與延遲 histogram（MetricsMiddleware）
+- http_requests_in_flight：目前處理中的請求數（SSE 連線也算在內）
+- mongodb_commands_total / mongodb_command_duration_seconds：依 collection、command 分開的
+  MongoDB 操作數與延遲（MongoCommandMetrics，掛在 MongoClient 的 event_listeners）
+- cache_hits_total / cache_misses_total / cache_hit_ratio：register_cache() 登記的快取
+- threadpool_*：AnyIO 預設 threadpool（sync driver、run_in_threadpool）的使用量與排隊數
+
+每個請求只多做兩次 perf_counter、一次 dict 查詢和一次 bisect，全部是純 Python 的
+小操作（約 1~2 µs），可以一直開著。
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+import anyio.to_thread
+from fastapi import Response
+from pymongo import monitoring
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 秒；涵蓋記憶體快取（< 1 ms）到遠端 MongoDB 的往返時間
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """單一組 label 的 histogram：各 bucket 的次數（非累計）、總和、次數"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(**labels) -> str:
+    def escape(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{k}="{escape(v)}"' for k, v in labels.items())
+
+
+def _render_histograms(lines: List[str], name: str, help_text: str,
+                       histograms: Dict[tuple, Histogram], label_names: Tuple[str, ...]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for key, h in sorted(histograms.items()):
+        base = _labels(**dict(zip(label_names, key)))
+        cumulative = 0
+        for bound, n in zip(h.buckets, h.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{base},le="+Inf"}} {h.count}')
+        lines.append(f"{name}_sum{{{base}}} {h.sum}")
+        lines.append(f"{name}_count{{{base}}} {h.count}")
+
+
+def _render_counters(lines: List[str], name: str, help_text: str,
+                     histograms: Dict[tuple, Histogram], label_names: Tuple[str, ...]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for key, h in sorted(histograms.items()):
+        lines.append(f"{name}{{{_labels(**dict(zip(label_names, key)))}}} {h.count}")
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    pymongo 的 command listener：started 時記下 collection，succeeded / failed 時記錄延遲。
+    sync driver 的命令在 threadpool 執行，所以用 lock 保護。
+    """
+
+    def __init__(self):
+        self._pending: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        self.latency: Dict[Tuple[str, str, str], Histogram] = {}
+
+    @staticmethod
+    def _key(event) -> tuple:
+        return event.request_id, event.connection_id
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""  # 例如 ping、hello 這類沒有 collection 的命令
+        with self._lock:
+            self._pending[self._key(event)] = collection
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._pending.pop(self._key(event), "")
+            key = (collection, event.command_name, outcome)
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram()
+            histogram.observe(event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+class Metrics:
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests: Dict[Tuple[str, str, str], Histogram] = {}
+        self.mongo = MongoCommandMetrics()
+        self._caches: Dict[str, object] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route, str(status))
+        histogram = self.requests.get(key)
+        if histogram is None:
+            histogram = self.requests[key] = Histogram()
+        histogram.observe(seconds)
+
+    def register_cache(self, name: str, cache):
+        """cache 需要有 hits、misses 兩個整數屬性"""
+        self._caches[name] = cache
+
+    def render(self) -> str:
+        lines: List[str] = []
+        request_labels = ("method", "route", "status")
+        _render_counters(lines, "http_requests_total", "HTTP requests by route template and status.",
+                         self.requests, request_labels)
+        _render_histograms(lines, "http_request_duration_seconds", "HTTP request latency.",
+                           self.requests, request_labels)
+        lines.append("# HELP http_requests_in_flight HTTP requests currently being served.")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        lines.append(f"http_requests_in_flight {self.in_flight}")
+
+        with self.mongo._lock:
+            mongo = {k: h for k, h in self.mongo.latency.items()}
+        mongo_labels = ("collection", "command", "outcome")
+        _render_counters(lines, "mongodb_commands_total", "MongoDB commands by collection and command.",
+                         mongo, mongo_labels)
+        _render_histograms(lines, "mongodb_command_duration_seconds", "MongoDB command latency.",
+                           mongo, mongo_labels)
+
+        caches = sorted(self._caches.items())
+        for name, kind, help_text in (
+            ("cache_hits_total", "counter", "Reads served from the cache."),
+            ("cache_misses_total", "counter", "Reads that had to load or encode."),
+            ("cache_hit_ratio", "gauge", "hits / (hits + misses) since start."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for cache_name, cache in caches:
+                hits, misses = cache.hits, cache.misses
+                value = {"cache_hits_total": hits, "cache_misses_total": misses,
+                         "cache_hit_ratio": hits / (hits + misses) if hits + misses else 0.0}[name]
+                lines.append(f'{name}{{{_labels(cache=cache_name)}}} {value}')
+
+        stats = anyio.to_thread.current_default_thread_limiter().statistics()
+        for name, value, help_text in (
+            ("threadpool_threads_max", stats.total_tokens, "Threadpool capacity."),
+            ("threadpool_threads_busy", stats.borrowed_tokens, "Threads currently running blocking calls."),
+            ("threadpool_tasks_waiting", stats.tasks_waiting, "Blocking calls queued for a free thread."),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def response(self) -> Response:
+        return Response(self.render(), media_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """
+    純 ASGI middleware（不用 BaseHTTPMiddleware，避免每個請求多開 task）。
+    路由樣板取自 FastAPI 比對成功後放進 scope 的 route；沒有對到任何路由的請求記成 "unmatched"，
+    避免隨意的網址讓 label 數量無限增加。
+    """
+
+    def __init__(self, app, metrics: "Metrics"):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        metrics = self.metrics
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight -= 1
+            route = scope.get("route")
+            metrics.observe_request(scope["method"], getattr(route, "path", "unmatched"),
+                                    status, time.perf_counter() - started)
+
+
+# 整個程序共用一份，MongoClient 建立時掛上 REGISTRY.mongo
+REGISTRY = Metrics()
@@ -0,0 +1,38 @@
+"""
+入座 / 離座的原子操作
+
+以前前端自己算 occupied + 人數 再 PATCH 絕對值回來，兩組客人同時掃 QR code 時會互相覆蓋。
+這裡改成由資料庫用單一個條件式 $inc 完成（查詢內容見 IM_storage.MongoTableStore）：
+- 入座：只有 occupied + n <= capacity (+ extraSeatLimit) 時才會加上去
+- 離座：只有 occupied >= n 時才會扣掉
+條件不成立時不會有任何寫入，這裡再分辨是 404（桌子不存在）還是 409（座位數不符）。
+"""
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+
+class OccupancyChange(BaseModel):
+    guests: int = Field(1, gt=0)
+    # 是否允許使用加椅（extraSeatLimit）；顧客沒有選加椅時只能坐到 capacity
+    useExtraSeats: bool = True
+
+
+async def check_in(store, table_id: str, guests: int, use_extra_seats: bool = True) -> dict:
+    updated = await store.check_in(table_id, guests, use_extra_seats)
+    if updated is None:
+        await _raise_not_applied(store, table_id, "Not enough free seats")
+    return updated
+
+
+async def check_out(store, table_id: str, guests: int) -> dict:
+    updated = await store.check_out(table_id, guests)
+    if updated is None:
+        await _raise_not_applied(store, table_id, "Fewer guests seated than requested")
+    return updated
+
+
+async def _raise_not_applied(store, table_id: str, reason: str):
+    if not await store.exists(table_id):
+        raise HTTPException(status_code=404, detail=f"Table '{table_id}' not found")
+    raise HTTPException(status_code=409, detail=reason)
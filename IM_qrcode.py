@@ -0,0 +1,305 @@
+"""
+桌位 QR code：批次產生、增量更新、列印用的整頁排版，以及 GET /tables/{table_id}/qr 的 LRU 快取
+
+原本 guanru/qrcode.py 寫死網址與 ["A", "B", "C"]，一張一張產生 PNG；現在：
+- 桌位清單從資料庫（create_table_store）或前端匯出的 table_data.csv 讀取
+- 網址為 QR_BASE_URL（預設 http://localhost:8002/customer）加上 ?table_id=…
+- 內容雜湊 = 網址 + 圖片設定（QRStyle）+ RENDER_VERSION；跟 manifest（qr_manifest.json）
+  記錄的雜湊相同、而且 PNG 還在的桌位直接跳過，其餘丟到 process pool 平行產生
+- 全部 PNG 依樓層、index 排進 A4 頁面（qr_sheets.pdf），排版內容沒變時不重做
+- API 端點用 QRImageCache：以內容雜湊為 key 的 LRU，雜湊同時當作 ETag
+
+需要安裝 qrcode[pil]（Pillow 用來排版）；沒有安裝時 API 回 503，批次工具直接報錯。
+"""
+
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    import qrcode
+    from qrcode.constants import ERROR_CORRECT_H, ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q
+except ImportError:  # pragma: no cover - qrcode 為選用套件
+    qrcode = None
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # pragma: no cover - Pillow 為選用套件（qrcode[pil] 會一起安裝）
+    Image = None
+
+QR_BASE_URL = os.getenv("QR_BASE_URL", "http://localhost:8002/customer")
+# 排版用的字型（TTF / OTF）；沒有指定時用 Pillow 內建字型，桌名只能顯示英數字
+QR_FONT = os.getenv("QR_FONT")
+
+# 產生方式（函式庫版本以外）有改動時遞增，讓所有桌位重新產生
+RENDER_VERSION = 1
+MANIFEST_NAME = "qr_manifest.json"
+SHEETS_NAME = "qr_sheets.pdf"
+
+# A4、300 dpi
+PAGE_SIZE = (2480, 3508)
+PAGE_MARGIN = 150
+PAGE_DPI = 300
+
+
+class QRStyle(NamedTuple):
+    box_size: int = 10
+    border: int = 4
+    error_correction: str = "M"
+    fill_color: str = "black"
+    back_color: str = "white"
+
+
+DEFAULT_STYLE = QRStyle()
+
+
+def table_url(table_id: str, base_url: str = QR_BASE_URL) -> str:
+    return f"{base_url}?table_id={quote(str(table_id), safe='')}"
+
+
+def content_hash(url: str, style: QRStyle) -> str:
+    payload = json.dumps([RENDER_VERSION, url, list(style)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def qr_etag(url: str, style: QRStyle) -> str:
+    return f'"{content_hash(url, style)[:20]}"'
+
+
+def render_png(url: str, style: QRStyle = DEFAULT_STYLE) -> bytes:
+    """產生一張 QR code PNG（process pool 的工作函式，必須是模組層級的函式）"""
+    if qrcode is None:
+        raise RuntimeError("QR code 需要安裝 qrcode[pil]：pip install 'qrcode[pil]'")
+    levels = {"L": ERROR_CORRECT_L, "M": ERROR_CORRECT_M, "Q": ERROR_CORRECT_Q, "H": ERROR_CORRECT_H}
+    qr = qrcode.QRCode(error_correction=levels[style.error_correction],
+                       box_size=style.box_size, border=style.border)
+    qr.add_data(url)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color=style.fill_color, back_color=style.back_color)
+    buf = io.BytesIO()
+    img.save(buf)
+    return buf.getvalue()
+
+
+# ---------- 桌位清單 ----------
+
+def tables_from_csv(path: str) -> List[dict]:
+    """
+    讀取前端匯出的 table_data.csv：檔案前面是標題列設定與背景裁切兩段，
+    桌位在 table_id 開頭的那一段
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        lines = iter(f)
+        for line in lines:
+            if line.startswith("table_id,"):
+                reader = csv.DictReader(itertools.chain([line], lines))
+                return [row for row in reader if row.get("table_id")]
+    return []
+
+
+async def tables_from_store(store=None) -> List[dict]:
+    if store is None:
+        from IM_storage import create_table_store
+        store = create_table_store()
+    return await store.find_all()
+
+
+def _sort_key(table: dict):
+    try:
+        index = int(table.get("index") or 0)
+    except (TypeError, ValueError):
+        index = 0
+    return str(table.get("floor", "")), index, str(table["table_id"])
+
+
+def _file_name(table_id: str) -> str:
+    return re.sub(r"[^\w.-]", "_", str(table_id)) + ".png"
+
+
+def _label(table: dict) -> str:
+    name = str(table.get("name") or table["table_id"])
+    floor = table.get("floor")
+    return f"{floor} {name}" if floor else name
+
+
+# ---------- 批次產生 ----------
+
+def _load_manifest(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def generate(tables: Iterable[dict], out_dir: str, base_url: str = QR_BASE_URL,
+             style: QRStyle = DEFAULT_STYLE, workers: Optional[int] = None,
+             force: bool = False, sheets: bool = True, columns: int = 4, rows: int = 5) -> dict:
+    """
+    產生 out_dir 底下每張桌位的 PNG 與 manifest，回傳
+    {"rendered": [...], "skipped": [...], "removed": [...], "sheets": 路徑或 None}
+    - 內容雜湊跟 manifest 相同且檔案存在的桌位跳過（force=True 時全部重做）
+    - 已經不在清單裡的桌位，刪掉它的 PNG
+    - workers：process 數，預設為 CPU 數；要產生的張數很少時直接在本程序產生
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    old_manifest = _load_manifest(manifest_path)
+    previous = old_manifest.get("tables", {})
+
+    entries: Dict[str, dict] = {}
+    todo: List[Tuple[str, str]] = []
+    for table in sorted(tables, key=_sort_key):
+        table_id = str(table["table_id"])
+        url = table_url(table_id, base_url)
+        entry = {
+            "url": url,
+            "hash": content_hash(url, style),
+            "file": _file_name(table_id),
+            "label": _label(table),
+        }
+        entries[table_id] = entry
+        old = previous.get(table_id)
+        if (force or old is None or old.get("hash") != entry["hash"]
+                or not os.path.exists(os.path.join(out_dir, entry["file"]))):
+            todo.append((table_id, url))
+
+    removed = []
+    for table_id, old in previous.items():
+        if table_id not in entries and old.get("file"):
+            removed.append(table_id)
+            try:
+                os.remove(os.path.join(out_dir, old["file"]))
+            except OSError:
+                pass
+
+    urls = [url for _, url in todo]
+    if len(todo) >= 8 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(urls) // ((workers or os.cpu_count() or 1) * 4))
+            images = list(pool.map(render_png, urls, itertools.repeat(style), chunksize=chunksize))
+    else:
+        images = [render_png(url, style) for url in urls]
+    for (table_id, _), png in zip(todo, images):
+        _write_atomic(os.path.join(out_dir, entries[table_id]["file"]), png)
+
+    manifest = {"version": RENDER_VERSION, "base_url": base_url, "style": style._asdict(),
+                "tables": entries}
+    sheets_path = None
+    if sheets:
+        layout = [columns, rows, QR_FONT] + [[e["hash"], e["label"]] for e in entries.values()]
+        sheets_hash = hashlib.sha256(json.dumps(layout, ensure_ascii=False).encode("utf-8")).hexdigest()
+        sheets_path = os.path.join(out_dir, SHEETS_NAME)
+        if force or old_manifest.get("sheets_hash") != sheets_hash or not os.path.exists(sheets_path):
+            build_sheets(list(entries.values()), out_dir, sheets_path, columns, rows)
+        manifest["sheets_hash"] = sheets_hash
+    _write_atomic(manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    rendered = [table_id for table_id, _ in todo]
+    skipped = set(entries) - set(rendered)
+    return {
+        "rendered": rendered,
+        "skipped": [table_id for table_id in entries if table_id in skipped],
+        "removed": removed,
+        "sheets": sheets_path,
+    }
+
+
+def _font(size: int):
+    if QR_FONT:
+        return ImageFont.truetype(QR_FONT, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1 的內建字型不能調整大小
+        return ImageFont.load_default()
+
+
+def build_sheets(entries: List[dict], out_dir: str, path: str, columns: int = 4, rows: int = 5) -> int:
+    """把 entries（依序）排成 columns x rows 的 A4 頁面，存成多頁 PDF，回傳頁數"""
+    if Image is None:
+        raise RuntimeError("排版需要安裝 Pillow：pip install 'qrcode[pil]'")
+    width, height = PAGE_SIZE
+    cell_w = (width - 2 * PAGE_MARGIN) // columns
+    cell_h = (height - 2 * PAGE_MARGIN) // rows
+    label_h = cell_h // 6
+    qr_size = min(cell_w, cell_h - label_h) - 40
+    font = _font(label_h // 2)
+
+    pages = []
+    per_page = columns * rows
+    for start in range(0, len(entries), per_page):
+        page = Image.new("RGB", PAGE_SIZE, "white")
+        draw = ImageDraw.Draw(page)
+        for i, entry in enumerate(entries[start:start + per_page]):
+            x = PAGE_MARGIN + (i % columns) * cell_w
+            y = PAGE_MARGIN + (i // columns) * cell_h
+            with Image.open(os.path.join(out_dir, entry["file"])) as img:
+                # QR code 放大縮小都要用 NEAREST，否則模組邊緣會糊掉
+                qr = img.convert("RGB").resize((qr_size, qr_size), Image.NEAREST)
+            page.paste(qr, (x + (cell_w - qr_size) // 2, y + 20))
+            draw.text((x + cell_w // 2, y + 20 + qr_size + label_h // 2), entry["label"],
+                      fill="black", font=font, anchor="mm")
+        pages.append(page)
+    if pages:
+        pages[0].save(path, save_all=True, append_images=pages[1:], resolution=PAGE_DPI)
+    return len(pages)
+
+
+# ---------- API 用的快取 ----------
+
+class QRImageCache:
+    """
+    GET /tables/{table_id}/qr 產生的 PNG，以內容雜湊為 key 的 LRU。
+    產生圖片是 CPU 工作，放到 threadpool 執行，不卡住 event loop。
+    """
+
+    def __init__(self, max_entries: int = int(os.getenv("QR_CACHE_SIZE", 512))):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, url: str, style: QRStyle = DEFAULT_STYLE) -> Tuple[str, bytes]:
+        """回傳 (ETag, PNG bytes)"""
+        key = content_hash(url, style)
+        etag = qr_etag(url, style)
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return etag, png
+        png = await run_in_threadpool(render_png, url, style)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = png
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag, png
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 整個程序共用一份
+QR_IMAGES = QRImageCache()
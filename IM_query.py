@@ -0,0 +1,114 @@
+"""
+GET /tables、GET /seats 的伺服器端篩選與排序
+
+原本前端拿到全部桌位後才自己濾掉 s_ 開頭、capacity <= 0 的項目並用 localeCompare 排序，
+現在可以直接帶參數，只回傳畫面要顯示的部分：
+- floor=1F            只看某一層
+- kind=table | seat   table：可入座的桌子（capacity > 0 且不是 s_ 開頭）；seat：s_ 開頭的項目
+- min_free_seats=3    capacity + extraSeatLimit - occupied 至少要有幾個空位
+- tags=插座,窗邊       必須同時有這些標籤
+- sort=name,-free     依欄位排序，前面加 - 代表由大到小
+                      可用欄位：name、index、floor、free、capacity、occupied、updateTime
+- bbox=0,0,50,50      只回傳跟這個範圍（x1,y1,x2,y2，座標同 left / top）有交集的桌位，
+                      畫面只顯示一部分時用；路由可以先用空間索引取出候選（見 IM_spatial）
+
+讀取都從記憶體快取（IM_cache.TableCache）拿，篩選也在記憶體裡做，不會打到資料庫。
+name / floor 的排序和前端 localeCompare 的結果一致：不分大小寫，數字依數值大小比較（A2 < A10）。
+"""
+
+import re
+from typing import List, Optional
+
+from fastapi import HTTPException, Query
+
+from IM_spatial import parse_bbox, rects_intersect, table_rect
+from IM_stats import is_seatable
+
+SORT_FIELDS = ("name", "index", "floor", "free", "capacity", "occupied", "updateTime")
+_DIGITS = re.compile(r"(\d+)")
+
+
+def free_seats(table: dict) -> int:
+    return table["capacity"] + table["extraSeatLimit"] - table["occupied"]
+
+
+def natural_key(value) -> tuple:
+    parts = _DIGITS.split(str(value).casefold())
+    return tuple((0, int(p), "") if p.isdigit() else (1, 0, p) for p in parts if p)
+
+
+def _sort_value(table: dict, field: str):
+    if field == "free":
+        return free_seats(table)
+    if field in ("name", "floor"):
+        return natural_key(table[field])
+    if field == "updateTime":
+        # 沒有 updateTime 的排在最前面
+        value = table.get("updateTime")
+        return (value is not None, str(value or ""))
+    return table[field]
+
+
+class TableQuery:
+    """當作 FastAPI 的 Depends() 使用，把 query string 解析成篩選條件"""
+
+    def __init__(
+        self,
+        floor: Optional[str] = None,
+        kind: Optional[str] = Query(None, pattern="^(table|seat)$"),
+        min_free_seats: Optional[int] = Query(None, ge=0),
+        tags: Optional[str] = None,
+        sort: Optional[str] = None,
+        bbox: Optional[str] = None,
+    ):
+        self.floor = floor
+        self.kind = kind
+        self.min_free_seats = min_free_seats
+        self.tags = [t.strip() for t in tags.split(",") if t.strip()] if tags else []
+        self.sort = []
+        for item in (sort or "").split(","):
+            item = item.strip()
+            if not item:
+                continue
+            field = item.lstrip("-")
+            if field not in SORT_FIELDS:
+                raise HTTPException(status_code=422, detail=f"Unknown sort field: {field}")
+            self.sort.append((field, item.startswith("-")))
+        try:
+            self.bbox = parse_bbox(bbox) if bbox else None
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    @property
+    def key(self) -> tuple:
+        """代表這組查詢參數的 key（IM_json.EncodedListings 依此保存編碼結果）"""
+        return (self.floor, self.kind, self.min_free_seats, tuple(self.tags), tuple(self.sort),
+                self.bbox)
+
+    def matches(self, table: dict) -> bool:
+        if self.floor is not None and table["floor"] != self.floor:
+            return False
+        if self.kind == "table" and not is_seatable(table):
+            return False
+        if self.kind == "seat" and not table["table_id"].startswith("s_"):
+            return False
+        if self.min_free_seats is not None and free_seats(table) < self.min_free_seats:
+            return False
+        if self.tags and not set(self.tags).issubset(table.get("tags") or []):
+            return False
+        if self.bbox is not None and not rects_intersect(table_rect(table), self.bbox):
+            return False
+        return True
+
+    def candidates(self, tables: List[dict], spatial_index) -> List[dict]:
+        """有 bbox 時改從空間索引（IM_spatial.SpatialIndex）取出範圍內的桌位，不用掃過全部"""
+        if self.bbox is None:
+            return tables
+        return spatial_index.search(self.bbox, self.floor)
+
+    def apply(self, tables: List[dict]) -> List[dict]:
+        result = [t for t in tables if self.matches(t)]
+        # 由最後一個排序欄位開始做 stable sort，達到多欄位排序
+        for field, descending in reversed(self.sort):
+            result.sort(key=lambda t: _sort_value(t, field), reverse=descending)
+        return result
@@ -0,0 +1,128 @@
+"""
+座位推薦：GET /seats/recommend?party=4&tags=插座,窗邊&floor=1F
+
+原本顧客要在下拉選單裡一張一張找坐得下的桌子；現在依「適合程度」排序回傳前幾張：
+1. 符合的偏好標籤越多越前面（標籤是偏好，不是必要條件）
+2. 同樣符合數時，浪費的座位（空位 - 人數）越少越前面
+3. 再依桌名（同 IM_query 的 natural_key）
+
+空位 = capacity + extraSeatLimit - occupied；只推薦 available、可入座（同 IM_stats）且坐得下的桌子。
+
+SeatIndex 掛在 TableCache 上（跟 IM_stats 一樣），入座 / 離座時只更新那張桌子的位置：
+每個 (樓層, 標籤組合) 一個依空位數排序的 list，一張桌子放進「所在樓層 / 全部樓層」x
+「自己標籤的每個子集合（最多 MAX_PREFERENCE_TAGS 個）」的 bucket。
+查詢時對要求標籤的每個子集合做一次二分搜尋，從「剛好坐得下」的位置往後取，
+成本是 O(2^標籤數 x (log n + limit))，跟桌數幾乎無關，不用掃過所有桌子。
+"""
+
+import bisect
+import itertools
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from IM_query import free_seats, natural_key
+from IM_stats import is_seatable
+
+ALL_FLOORS = None
+# 偏好標籤最多幾個（bucket 數隨標籤數指數成長）
+MAX_PREFERENCE_TAGS = 3
+
+_Entry = Tuple[int, tuple, str]  # (空位, 桌名排序 key, table_id)
+_Bucket = Tuple[Optional[str], FrozenSet[str]]
+
+
+def _subsets(tags, max_size: int):
+    tags = sorted(set(tags))
+    for size in range(min(len(tags), max_size) + 1):
+        for combo in itertools.combinations(tags, size):
+            yield frozenset(combo)
+
+
+class SeatIndex:
+    """TableCache listener：依空位數與標籤分 bucket 的桌位索引"""
+
+    def __init__(self):
+        self._buckets: Dict[_Bucket, List[_Entry]] = {}
+        # table_id → (entry, 放進去的 bucket, 桌位資料)
+        self._tables: Dict[str, Tuple[_Entry, List[_Bucket], dict]] = {}
+        self._lock = threading.Lock()
+
+    # ---------- TableCache listener ----------
+    def reset(self, tables):
+        with self._lock:
+            self._buckets = {}
+            self._tables = {}
+            for table in tables:
+                self._add(table)
+
+    def apply(self, old: Optional[dict], new: Optional[dict]):
+        with self._lock:
+            if old is not None:
+                self._remove(old["table_id"])
+            if new is not None:
+                self._add(new)
+
+    def _add(self, table: dict):
+        if not table.get("available") or not is_seatable(table):
+            return
+        free = free_seats(table)
+        if free <= 0:
+            return
+        entry = (free, natural_key(table["name"]), table["table_id"])
+        buckets = [(floor, tags) for floor in (table["floor"], ALL_FLOORS)
+                   for tags in _subsets(table.get("tags") or (), MAX_PREFERENCE_TAGS)]
+        for bucket in buckets:
+            bisect.insort(self._buckets.setdefault(bucket, []), entry)
+        self._tables[table["table_id"]] = (entry, buckets, table)
+
+    def _remove(self, table_id: str):
+        indexed = self._tables.pop(table_id, None)
+        if indexed is None:
+            return
+        entry, buckets, _ = indexed
+        for bucket in buckets:
+            entries = self._buckets[bucket]
+            del entries[bisect.bisect_left(entries, entry)]
+            if not entries:
+                del self._buckets[bucket]
+
+    # ---------- 查詢 ----------
+    def recommend(self, party: int, tags: List[str] = (), floor: Optional[str] = None,
+                  limit: int = 5) -> List[dict]:
+        """
+        回傳最多 limit 筆 {"table", "freeSeats", "wastedSeats", "matchedTags"}，最適合的在前面。
+        tags 超過 MAX_PREFERENCE_TAGS 個時只看前面幾個
+        """
+        wanted = list(dict.fromkeys(tags))[:MAX_PREFERENCE_TAGS]
+        results: List[dict] = []
+        seen = set()
+        with self._lock:
+            # 符合的標籤數由多到少；較多標籤的 bucket 先取，同一張桌子第一次出現時就是它的實際符合數
+            for size in range(len(wanted), -1, -1):
+                candidates = []
+                for combo in itertools.combinations(wanted, size):
+                    entries = self._buckets.get((floor, frozenset(combo)), [])
+                    start = bisect.bisect_left(entries, (party,))
+                    taken = 0
+                    # seen 裡的桌子最多 limit 張，每個 bucket 最多看 2 x limit 筆就夠
+                    for entry in itertools.islice(entries, start, None):
+                        if entry[2] in seen:
+                            continue
+                        candidates.append(entry)
+                        taken += 1
+                        if taken >= limit - len(results):
+                            break
+                for entry in sorted(set(candidates)):
+                    if len(results) >= limit:
+                        break
+                    seen.add(entry[2])
+                    table = self._tables[entry[2]][2]
+                    results.append({
+                        "table": table,
+                        "freeSeats": entry[0],
+                        "wastedSeats": entry[0] - party,
+                        "matchedTags": [t for t in wanted if t in (table.get("tags") or ())],
+                    })
+                if len(results) >= limit:
+                    break
+        return results
@@ -0,0 +1,211 @@
+"""
+/tables（IM_db_server）與 /seats（kaiwei/simple_local_server）共用的資料層
+
+兩組路由操作的是同一個桌位 collection，所以在同一個程序裡只建立一份：
+- store          ：資料庫連線（一個連線池）
+- table_cache    ：桌位記憶體快取；任何一組路由寫入後都會更新同一份，不會互相讓對方的快取過期
+- table_stats    ：入座統計（掛在 table_cache 上）
+- spatial_index  ：桌位的空間索引，bbox 查詢與重疊檢查用（掛在 table_cache 上，見 IM_spatial）
+- seat_index     ：座位推薦用的索引（掛在 table_cache 上，見 IM_recommend）
+- occupancy_log  ：入座歷史的事件紀錄與每小時彙總（掛在 table_cache 上，見 IM_analytics）
+- table_events   ：SSE 推播，/tables/events 與 /seats/events 收到的是同一串事件
+- table_listings ：列表回應編碼好的 bytes
+- bg_cache       ：背景設定快取
+
+兩個 server 可以各自單獨啟動（各自一個程序，資料層仍然各有一份），
+也可以用 IM_app 把兩組路由掛在同一個 ASGI 應用程式上。
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from IM_analytics import STORE_KEY, OccupancyLog
+from IM_cache import TableCache, BackgroundCache, cache_max_age_from_env
+from IM_events import TableEventBroker
+from IM_indexes import ensure_indexes
+from IM_json import EncodedListings
+from IM_metrics import REGISTRY as metrics
+from IM_qrcode import QR_IMAGES
+from IM_recommend import SeatIndex
+from IM_singleflight import REQUESTS as singleflight_requests
+from IM_spatial import SpatialIndex
+from IM_stats import OccupancyStats
+from IM_storage import create_table_store
+
+logger = logging.getLogger(__name__)
+
+
+def format_table(table: dict) -> dict:
+    """
+    把資料庫拿到的 document 轉成前端要的 JSON schema
+    - tags: 如果存成字串，就拆成 list；如果已經是 list，就直接回傳。
+    - id: 將原本的 _id 轉成字串
+    """
+    tags = table.get("tags", [])
+    if isinstance(tags, str):
+        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
+
+    return {
+        "id": str(table["_id"]),
+        "table_id": table["table_id"],
+        "floor": table["floor"],
+        "index": table["index"],
+        "name": table["name"],
+        "left": table["left"],
+        "top": table["top"],
+        "width": table["width"],
+        "height": table["height"],
+        "capacity": table["capacity"],
+        "occupied": table["occupied"],
+        "extraSeatLimit": table["extraSeatLimit"],
+        "tags": tags,
+        "description": table.get("description", ""),
+        "updateTime": table.get("updateTime"),
+        "available": table["available"],
+        "rev": table.get("rev")
+    }
+
+
+# STORAGE_ENGINE=mongo（預設）或 sqlite（內嵌 SQLite，SQLITE_PATH 指定檔案）
+# MONGO_DRIVER=sync（預設，pymongo + threadpool）或 async（PyMongo AsyncMongoClient）
+# MongoDB 的連線池、timeout、壓縮、read preference 由環境變數設定（見 IM_mongo）
+store = create_table_store()
+
+table_events = TableEventBroker()
+table_cache = TableCache(store, format_table, max_age=cache_max_age_from_env())
+table_stats = OccupancyStats(store)
+table_cache.add_listener(table_stats)
+spatial_index = SpatialIndex()
+table_cache.add_listener(spatial_index)
+seat_index = SeatIndex()
+table_cache.add_listener(seat_index)
+occupancy_log = OccupancyLog(store)
+table_cache.add_listener(occupancy_log)
+table_listings = EncodedListings()
+bg_cache = BackgroundCache(store, max_age=cache_max_age_from_env())
+
+metrics.register_cache("tables", table_cache)
+metrics.register_cache("table_listings", table_listings)
+metrics.register_cache("backgrounds", bg_cache)
+metrics.register_cache("qr_images", QR_IMAGES)
+metrics.register_cache("singleflight", singleflight_requests)
+
+
+def publish_upsert(table: dict):
+    # 寫入成功後：更新快取（連帶更新統計）並推播給 SSE 訂閱者
+    table_cache.put(table)
+    table_events.publish("upsert", table["table_id"], table["floor"], table)
+
+
+def reject_overlaps(table: dict, ignore=()):
+    """
+    新增 / 修改後的桌位跟同樓層其他桌位重疊時回 409（判斷方式同前端編輯器，見 IM_spatial）
+    - ignore：修改時自己原本的 table_id
+    以寫入前的快取為準；兩個請求同時把桌子移到同一個位置時不保證擋得住
+    """
+    hits = spatial_index.collisions(table, ignore)
+    if hits:
+        raise HTTPException(status_code=409, detail=f"Table '{table['table_id']}' overlaps: {', '.join(hits)}")
+
+
+# 啟動時建立 / 比對 IM_indexes 登記的 index，結果放在 GET /indexes
+index_report = {}
+_started = False
+
+
+async def startup():
+    """建立 index、載入快取、啟動統計對帳；掛了幾個 startup handler 都只做一次"""
+    global _started
+    if _started:
+        return
+    _started = True
+    await occupancy_log.ensure_storage()
+    index_report.update(await ensure_indexes(store))
+    if index_report["mismatched"] or index_report["failed"]:
+        logger.warning("index drift: mismatched=%s failed=%s",
+                       index_report["mismatched"], index_report["failed"])
+    await table_cache.load()
+    table_stats.start_reconciler()
+    occupancy_log.start(initial_tables=table_cache.all)
+
+
+# ---------- 兩組路由共用的維運端點 ----------
+ops_router = APIRouter()
+
+
+@ops_router.get("/stats")
+async def get_stats():
+    """
+    入座統計：全店 (store) 與各樓層 (floors) 的桌數、座位數、已入座人數、使用率
+    - 每次桌位異動時 O(1) 更新，背景每 STATS_RECONCILE_INTERVAL 秒跟資料庫對帳一次
+    - lastReconcile：最近一次對帳的時間、差異 (drift) 與是否已修正
+    """
+    return table_stats.snapshot()
+
+
+@ops_router.post("/stats/reconcile")
+async def reconcile_stats():
+    """
+    立即跟資料庫對帳一次，回傳差異
+    """
+    return await table_stats.reconcile()
+
+
+def _local(value: datetime) -> datetime:
+    # 歷史資料以伺服器本地時間（不帶時區）記錄，帶時區的參數先換成本地時間
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+
+@ops_router.get("/analytics/occupancy")
+async def get_occupancy_analytics(
+    floor: Optional[str] = None,
+    table_id: Optional[str] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: Literal["hour", "day", "week"] = "hour",
+):
+    """
+    入座歷史（由每小時的 rollup 計算，見 IM_analytics）
+    - 對象：table_id 指定桌子、floor 指定樓層，都沒有時為全店
+    - from / to：時間區間（預設最近 24 小時），bucket：hour / day / week
+    - series 每一點：avgUtilization（時間加權平均使用率）、avgOccupied、peakUtilization、peakOccupied、arrivals；
+      summary 為整段期間的合計
+    - 最近幾秒的入座變化要等下一次彙總（OCCUPANCY_ROLLUP_INTERVAL）才會出現
+    """
+    end = _local(end) if end else datetime.now()
+    start = _local(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="'from' must be earlier than 'to'")
+    if table_id:
+        level, key = "table", table_id
+    elif floor:
+        level, key = "floor", floor
+    else:
+        level, key = "store", STORE_KEY
+    result = await occupancy_log.query(level, key, start, end, bucket)
+    return {
+        "level": level, "key": key, "bucket": bucket,
+        "from": start.isoformat(), "to": end.isoformat(),
+        **result,
+        "lastRollup": occupancy_log.last_rollup,
+    }
+
+
+@ops_router.get("/indexes")
+async def get_index_report():
+    """
+    啟動時的 index 檢查結果：created / mismatched / extra / failed
+    """
+    return index_report
+
+
+@ops_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus 文字格式：各路由的請求數與延遲 histogram、處理中的請求數、
+    MongoDB 各 collection / command 的操作數與延遲、快取命中率、threadpool 使用量（見 IM_metrics）
+    """
+    return metrics.response()
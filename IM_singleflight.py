@@ -0,0 +1,155 @@
+"""
+相同讀取請求的合併（single-flight）
+
+交班或一群客人一起掃 QR code 時，同一瞬間會湧進幾十個一模一樣的 GET /seats、/seats/changes；
+每一個都各自查一次資料庫、各自序列化同樣的結果。現在：
+- SingleFlight：同一個 key 同時只執行一次，其他呼叫等待同一個結果（例外也一起收到）；
+  另外可以把結果保留 window 秒（micro-cache），這段期間的呼叫直接拿
+- SingleFlightMiddleware：純 ASGI middleware，以「路徑 + 排序過的 query string +
+  協商出來的壓縮編碼 + If-None-Match」當 key，只合併 SINGLEFLIGHT_PATHS 列出的 GET 路由；
+  第一個請求真的交給路由處理，收齊回應後原樣轉給其他等待中的請求
+- TableCache 過期自動 reload 時也用 SingleFlight，一批同時到的讀取只查一次資料庫
+
+高峰時的資料庫負載因此跟「不同的查詢數」成正比，而不是跟連線的客人數成正比。
+
+micro-cache 預設關閉（SINGLEFLIGHT_WINDOW_MS=0，只合併同時在處理中的請求）。
+打開時，同一個程序收到任何非 GET 請求都會清掉暫存的回應；
+別的程序（或直接改資料庫）寫入的資料，最多晚 window 才看得到。
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from IM_compress import choose_encoding
+
+# 預設合併的路由：回應只取決於路徑、query string 與上面幾個 header 的 JSON 讀取
+DEFAULT_PATHS = (
+    "/tables", "/tables/changes",
+    "/seats", "/seats/available", "/seats/changes", "/seats/recommend",
+    "/stats", "/health", "/analytics/occupancy",
+)
+
+
+def _paths_from_env() -> Tuple[str, ...]:
+    value = os.getenv("SINGLEFLIGHT_PATHS")
+    if value is None:
+        return DEFAULT_PATHS
+    return tuple(p.strip() for p in value.split(",") if p.strip())
+
+
+class SingleFlight:
+    """
+    同一個 key 同時只執行一次 fn()。
+    fn 在獨立的 task 裡執行：發起的那個請求被取消（例如客戶端斷線）時，
+    其他等待中的請求照樣拿得到結果。
+    hits：拿到別人的結果（或 micro-cache）的次數；misses：實際執行的次數（/metrics 的 cache_hit_ratio）
+    """
+
+    def __init__(self, window: float = 0.0):
+        self.window = window
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._recent: Dict[Hashable, Tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self.window > 0:
+            recent = self._recent.get(key)
+            if recent is not None:
+                if time.monotonic() < recent[0]:
+                    self.hits += 1
+                    return recent[1]
+                del self._recent[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            task = self._inflight[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled():
+            return
+        # 先取出例外，所有等待者都被取消時才不會出現 "exception was never retrieved"
+        if task.exception() is None and self.window > 0:
+            self._recent[key] = (time.monotonic() + self.window, task.result())
+            if len(self._recent) > 1024:
+                now = time.monotonic()
+                self._recent = {k: v for k, v in self._recent.items() if v[0] > now}
+
+    def forget(self):
+        """清掉 micro-cache（寫入之後呼叫）；處理中的請求不受影響"""
+        self._recent.clear()
+
+
+# HTTP 請求共用一份（/metrics 的 cache="singleflight"）
+# SINGLEFLIGHT_WINDOW_MS：回應保留多少毫秒（預設 0，只合併處理中的請求）
+REQUESTS = SingleFlight(float(os.getenv("SINGLEFLIGHT_WINDOW_MS", 0)) / 1000)
+
+# 路由比對後 FastAPI 放進 scope 的欄位；合併的請求沒有經過路由，從第一個請求複製過來（MetricsMiddleware 要用）
+_ROUTING_KEYS = ("route", "endpoint", "path_params")
+
+
+class SingleFlightMiddleware:
+    """
+    純 ASGI middleware，合併同時到達、內容相同的 GET 請求。
+    要放在 CORSMiddleware 裡面（先 add_middleware），CORS 標頭才會依各自的 Origin 產生。
+    SINGLEFLIGHT_PATHS：要合併的路徑（逗號分隔，完全相同才算），預設為 DEFAULT_PATHS
+    """
+
+    def __init__(self, app, paths: Optional[Iterable[str]] = None, flight: Optional[SingleFlight] = None):
+        self.app = app
+        self.paths = frozenset(paths if paths is not None else _paths_from_env())
+        self.flight = flight or REQUESTS
+
+    def _key(self, scope) -> tuple:
+        query = tuple(sorted(parse_qsl(scope.get("query_string", b"").decode("latin-1"),
+                                       keep_blank_values=True)))
+        accept, etag = "", None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+            elif name == b"if-none-match":
+                etag = value
+        return scope["path"], query, choose_encoding(accept) if accept else None, etag
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if scope["method"] != "GET":
+            if self.flight.window <= 0:
+                return await self.app(scope, receive, send)
+            # 寫入前後都清一次：寫入期間完成的讀取可能是寫入前的結果
+            self.flight.forget()
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                self.flight.forget()
+        if scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+
+        async def run():
+            messages = []
+
+            async def capture(message):
+                messages.append(message)
+
+            await self.app(scope, receive, capture)
+            return messages, {k: scope[k] for k in _ROUTING_KEYS if k in scope}
+
+        messages, routing = await self.flight.do(self._key(scope), run)
+        scope.update(routing)
+        for message in messages:
+            # 外層的 middleware 會直接改 headers，每個請求各送一份
+            message = dict(message)
+            if "headers" in message:
+                message["headers"] = list(message["headers"])
+            await send(message)
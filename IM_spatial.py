@@ -0,0 +1,209 @@
+"""
+桌位的空間索引：GET /tables?bbox=… 只取畫面範圍內的桌位，以及新增 / 修改 / 整批儲存時的重疊檢查
+
+座標和前端編輯器（kaiwei/seats-project 的 KCafe.jsx）一致：
+- left / top 是桌子中心，單位為背景圖的百分比
+- width / height 是格數，半寬 = width x GRID_UNIT_X、半高 = height x GRID_UNIT_Y
+- 重疊的判斷同 rectsOverlap：只有邊貼在一起不算重疊
+
+每個樓層一個均勻網格（GridIndex，格子邊長 SPATIAL_CELL_SIZE，預設 5 = 畫面的 5%），
+一張桌子登記在它蓋到的每個格子裡；範圍查詢 / 重疊檢查只看查詢範圍蓋到的格子，
+不用兩兩比對。SpatialIndex 掛在 TableCache 上（跟 IM_stats 一樣），桌位異動時只更新那一張。
+整批儲存時由 find_overlaps 另外建一份網格，逐張放入並檢查，O(n)（桌子大小相近時）。
+"""
+
+import math
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+GRID_UNIT_X = 2
+GRID_UNIT_Y = 3.125
+SPATIAL_CELL_SIZE = float(os.getenv("SPATIAL_CELL_SIZE", 5))
+# 一張桌子 / 一次查詢蓋到超過這麼多格時不登記到格子裡，改成每次都直接比對
+MAX_CELLS = 1024
+# PATCH 帶到這些欄位時才需要重新檢查重疊
+GEOMETRY_FIELDS = frozenset(("floor", "left", "top", "width", "height"))
+
+Rect = Tuple[float, float, float, float]  # (x1, y1, x2, y2)
+
+
+def table_rect(table: dict) -> Rect:
+    half_w = table["width"] * GRID_UNIT_X
+    half_h = table["height"] * GRID_UNIT_Y
+    return table["left"] - half_w, table["top"] - half_h, table["left"] + half_w, table["top"] + half_h
+
+
+def rects_overlap(a: Rect, b: Rect) -> bool:
+    """面積有重疊（前端的 rectsOverlap）"""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def rects_intersect(a: Rect, b: Rect) -> bool:
+    """有任何交集，邊貼在一起也算（bbox 查詢用）"""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def parse_bbox(value: str) -> Rect:
+    """bbox=x1,y1,x2,y2；格式錯誤時丟 ValueError"""
+    parts = [float(p) for p in value.split(",")]
+    if len(parts) != 4 or not all(math.isfinite(p) for p in parts):
+        raise ValueError("bbox must be four numbers: x1,y1,x2,y2")
+    x1, y1, x2, y2 = parts
+    if x1 > x2 or y1 > y2:
+        raise ValueError("bbox must satisfy x1 <= x2 and y1 <= y2")
+    return x1, y1, x2, y2
+
+
+class GridIndex:
+    """單一樓層的均勻網格：key → rect"""
+
+    def __init__(self, cell_size: float = SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._rects: Dict[str, Rect] = {}
+        self._oversized: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._rects)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rects
+
+    def _cell_range(self, rect: Rect) -> Optional[Tuple[range, range]]:
+        """rect 蓋到的格子；不是有限值或超過 MAX_CELLS 格時回傳 None"""
+        if not all(math.isfinite(v) for v in rect):
+            return None
+        size = self.cell_size
+        xs = range(math.floor(rect[0] / size), math.floor(rect[2] / size) + 1)
+        ys = range(math.floor(rect[1] / size), math.floor(rect[3] / size) + 1)
+        return (xs, ys) if len(xs) * len(ys) <= MAX_CELLS else None
+
+    def insert(self, key: str, rect: Rect):
+        self._rects[key] = rect
+        cells = self._cell_range(rect)
+        if cells is None:
+            self._oversized.add(key)
+            return
+        xs, ys = cells
+        for x in xs:
+            for y in ys:
+                self._cells.setdefault((x, y), set()).add(key)
+
+    def remove(self, key: str):
+        rect = self._rects.pop(key, None)
+        if rect is None:
+            return
+        if key in self._oversized:
+            self._oversized.discard(key)
+            return
+        xs, ys = self._cell_range(rect)
+        for x in xs:
+            for y in ys:
+                cell = self._cells[(x, y)]
+                cell.discard(key)
+                if not cell:
+                    del self._cells[(x, y)]
+
+    def _candidates(self, rect: Rect) -> Iterable[str]:
+        cells = self._cell_range(rect)
+        if cells is None or len(cells[0]) * len(cells[1]) > len(self._cells):
+            # 查詢範圍比整個網格還大：直接全部比對
+            return list(self._rects)
+        xs, ys = cells
+        found = set(self._oversized)
+        for x in xs:
+            for y in ys:
+                found.update(self._cells.get((x, y), ()))
+        return found
+
+    def search(self, rect: Rect) -> List[str]:
+        """跟 rect 有交集（含邊）的 key"""
+        return [k for k in self._candidates(rect) if rects_intersect(self._rects[k], rect)]
+
+    def overlapping(self, rect: Rect) -> List[str]:
+        """跟 rect 面積重疊的 key"""
+        return [k for k in self._candidates(rect) if rects_overlap(self._rects[k], rect)]
+
+
+def _has_geometry(table: dict) -> bool:
+    return all(isinstance(table.get(f), (int, float)) for f in ("left", "top", "width", "height"))
+
+
+def find_overlaps(tables: Iterable[dict]) -> List[Tuple[str, str]]:
+    """整份配置裡互相重疊的 (table_id, table_id)，同樓層才比對"""
+    floors: Dict[str, GridIndex] = {}
+    pairs = []
+    for table in tables:
+        if not _has_geometry(table):
+            continue
+        grid = floors.setdefault(table.get("floor"), GridIndex())
+        rect = table_rect(table)
+        pairs.extend((other, table["table_id"]) for other in sorted(grid.overlapping(rect)))
+        grid.insert(table["table_id"], rect)
+    return pairs
+
+
+class SpatialIndex:
+    """TableCache listener：每個樓層一個 GridIndex"""
+
+    def __init__(self, cell_size: float = SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self._floors: Dict[str, GridIndex] = {}
+        self._tables: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    # ---------- TableCache listener ----------
+    def reset(self, tables):
+        with self._lock:
+            self._floors = {}
+            self._tables = {}
+            for table in tables:
+                self._add(table)
+
+    def apply(self, old: Optional[dict], new: Optional[dict]):
+        with self._lock:
+            if old is not None:
+                self._remove(old)
+            if new is not None:
+                self._add(new)
+
+    def _add(self, table: dict):
+        if not _has_geometry(table):
+            return
+        grid = self._floors.get(table["floor"])
+        if grid is None:
+            grid = self._floors[table["floor"]] = GridIndex(self.cell_size)
+        grid.insert(table["table_id"], table_rect(table))
+        self._tables[table["table_id"]] = table
+
+    def _remove(self, table: dict):
+        indexed = self._tables.pop(table["table_id"], None)
+        if indexed is None:
+            return
+        grid = self._floors[indexed["floor"]]
+        grid.remove(indexed["table_id"])
+        if not len(grid):
+            del self._floors[indexed["floor"]]
+
+    # ---------- 查詢 ----------
+    def search(self, bbox: Rect, floor: Optional[str] = None) -> List[dict]:
+        """跟 bbox 有交集的桌位（依 table_id 排序）；floor 為 None 時查所有樓層"""
+        with self._lock:
+            grids = [self._floors.get(floor)] if floor is not None else list(self._floors.values())
+            found = [k for grid in grids if grid is not None for k in grid.search(bbox)]
+            return [self._tables[k] for k in sorted(found)]
+
+    def collisions(self, table: dict, ignore: Iterable[str] = ()) -> List[str]:
+        """
+        table（新增或修改後的內容）跟同樓層哪些桌位重疊；
+        ignore：不用比對的 table_id（修改時為自己原本的 table_id）
+        """
+        if not _has_geometry(table):
+            return []
+        skip = {table["table_id"], *ignore}
+        with self._lock:
+            grid = self._floors.get(table["floor"])
+            if grid is None:
+                return []
+            return sorted(k for k in grid.overlapping(table_rect(table)) if k not in skip)
@@ -0,0 +1,494 @@
+"""
+內嵌 SQLite 儲存引擎（STORAGE_ENGINE=sqlite）
+
+和 IM_storage.MongoTableStore 有相同的方法與語意，單店部署不需要另外架 MongoDB，
+資料存取都在本機檔案上完成（WAL 模式，讀寫互不阻擋），也方便在沒有資料庫伺服器的機器上測試。
+
+- 桌位欄位和 TableBase 一一對應成 column，tags 以 JSON 字串儲存
+- 背景設定整份以 JSON 儲存（欄位較自由）
+- 每個寫入都在同一個 transaction 裡取 revision，revision 與資料一起 commit
+- _id 用 24 碼十六進位字串，格式和 MongoDB ObjectId 相同
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+from IM_indexes import INDEXES
+from IM_storage import DuplicateTableError
+
+TABLE_FIELDS = (
+    "table_id", "floor", "index", "name",
+    "left", "top", "width", "height",
+    "capacity", "occupied", "extraSeatLimit",
+    "tags", "description", "updateTime", "available",
+)
+
+# store 上的 collection 名稱 → SQLite table 名稱
+SQL_TABLES = {
+    "tables": "tables", "tombstones": "tombstones", "backgrounds": "backgrounds",
+    "occupancy_events": "occupancy_events", "occupancy_rollups": "occupancy_rollups",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    _id TEXT PRIMARY KEY,
+    table_id TEXT NOT NULL,
+    floor TEXT,
+    "index" INTEGER,
+    name TEXT,
+    "left" REAL,
+    "top" REAL,
+    width REAL,
+    height REAL,
+    capacity INTEGER NOT NULL DEFAULT 0,
+    occupied INTEGER NOT NULL DEFAULT 0,
+    extraSeatLimit INTEGER NOT NULL DEFAULT 0,
+    tags TEXT NOT NULL DEFAULT '[]',
+    description TEXT NOT NULL DEFAULT '',
+    updateTime TEXT,
+    available INTEGER,
+    rev INTEGER
+);
+CREATE TABLE IF NOT EXISTS tombstones (
+    table_id TEXT NOT NULL,
+    floor TEXT,
+    rev INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS backgrounds (
+    floor_id TEXT NOT NULL,
+    _id TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL DEFAULT 0,
+    reset_rev INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO counters (name) VALUES ('tables');
+CREATE TABLE IF NOT EXISTS occupancy_events (
+    ts TEXT NOT NULL,
+    table_id TEXT NOT NULL,
+    floor TEXT,
+    occupied INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    seats INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS occupancy_rollups (
+    level TEXT NOT NULL,
+    "key" TEXT NOT NULL,
+    hour TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS occupancy_state (
+    name TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+"""
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:24]
+
+
+def _quote(column: str) -> str:
+    return f'"{column}"'
+
+
+def _to_row(doc: dict) -> dict:
+    row = {k: v for k, v in doc.items() if k in TABLE_FIELDS}
+    if "tags" in row:
+        row["tags"] = json.dumps(row["tags"] or [], ensure_ascii=False)
+    if isinstance(row.get("updateTime"), datetime):
+        row["updateTime"] = row["updateTime"].isoformat()
+    if "available" in row:
+        row["available"] = None if row["available"] is None else int(row["available"])
+    return row
+
+
+def _ts(value: datetime) -> str:
+    # 固定到微秒，字串排序才會和時間順序一致
+    return value.isoformat(timespec="microseconds")
+
+
+def _from_row(row: sqlite3.Row) -> dict:
+    doc = dict(row)
+    doc["tags"] = json.loads(doc["tags"])
+    doc["available"] = None if doc["available"] is None else bool(doc["available"])
+    if doc.get("updateTime"):
+        doc["updateTime"] = datetime.fromisoformat(doc["updateTime"])
+    return doc
+
+
+class SqliteTableStore:
+    # /health 回報的資料庫種類
+    engine = "SQLite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.executescript(SCHEMA)
+            # table_id 的 unique index 是重複檢查的依據，建表時就先把登記的 index 建好
+            for target, specs in INDEXES.items():
+                for spec in specs:
+                    self._create_index_sync(target, spec)
+
+    # ---------- 執行方式 ----------
+    async def _run(self, fn, *args):
+        return await run_in_threadpool(self._locked, fn, *args)
+
+    def _locked(self, fn, *args):
+        # 同一個 connection 由多個執行緒共用，一次只讓一個 transaction 執行
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(*args)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    def _next_rev(self) -> int:
+        row = self.conn.execute(
+            "UPDATE counters SET seq = seq + 1 WHERE name = 'tables' RETURNING seq"
+        ).fetchone()
+        return row["seq"]
+
+    def _get(self, table_id: str) -> Optional[dict]:
+        row = self.conn.execute("SELECT * FROM tables WHERE table_id = ?", (table_id,)).fetchone()
+        return _from_row(row) if row else None
+
+    def _all(self, where: str = "", params=()) -> List[dict]:
+        rows = self.conn.execute(f"SELECT * FROM tables {where} ORDER BY rowid", params).fetchall()
+        return [_from_row(r) for r in rows]
+
+    def _insert_sync(self, doc: dict, rev: int):
+        row = _to_row(doc)
+        row["_id"], row["rev"] = _new_id(), rev
+        columns = ", ".join(_quote(c) for c in row)
+        marks = ", ".join("?" for _ in row)
+        try:
+            self.conn.execute(f"INSERT INTO tables ({columns}) VALUES ({marks})", tuple(row.values()))
+        except sqlite3.IntegrityError:
+            raise DuplicateTableError(doc["table_id"])
+        doc["_id"], doc["rev"] = row["_id"], rev
+        return doc
+
+    def _mark_reset_sync(self, rev: int):
+        self.conn.execute("UPDATE counters SET reset_rev = MAX(reset_rev, ?) WHERE name = 'tables'", (rev,))
+        self.conn.execute("DELETE FROM tombstones WHERE rev < ?", (rev,))
+
+    async def changes_since(self, since: int) -> dict:
+        def run():
+            counter = self.conn.execute("SELECT seq, reset_rev FROM counters WHERE name = 'tables'").fetchone()
+            seq, reset_rev = counter["seq"], counter["reset_rev"]
+            if since <= 0 or since < reset_rev or since > seq:
+                upserted = self._all()
+                return {"reset": True, "upserted": upserted, "deleted": [],
+                        "cursor": max([seq] + [d["rev"] or 0 for d in upserted])}
+            upserted = self._all("WHERE rev > ?", (since,))
+            deleted = self.conn.execute(
+                "SELECT table_id, rev FROM tombstones WHERE rev > ?", (since,)).fetchall()
+            cursor = max([since] + [d["rev"] for d in upserted] + [d["rev"] for d in deleted])
+            live = {d["table_id"]: d["rev"] for d in upserted}
+            deleted_ids = sorted({d["table_id"] for d in deleted if d["rev"] > live.get(d["table_id"], 0)})
+            return {"reset": False, "upserted": upserted, "deleted": deleted_ids, "cursor": cursor}
+        return await self._run(run)
+
+    # ---------- 桌位 ----------
+    async def find_all(self, primary: bool = False) -> List[dict]:
+        return await self._run(self._all)
+
+    async def insert(self, doc: dict) -> dict:
+        return await self._run(lambda: self._insert_sync(doc, self._next_rev()))
+
+    async def update(self, table_id: str, updates: dict) -> Optional[dict]:
+        def run():
+            new_id = updates.get("table_id", table_id)
+            old = self._get(table_id) if new_id != table_id else None
+            row = {**_to_row(updates), "rev": self._next_rev()}
+            assignments = ", ".join(f"{_quote(c)} = ?" for c in row)
+            try:
+                cur = self.conn.execute(f"UPDATE tables SET {assignments} WHERE table_id = ?",
+                                        (*row.values(), table_id))
+            except sqlite3.IntegrityError:
+                raise DuplicateTableError(new_id)
+            if not cur.rowcount:
+                return None
+            if old is not None:
+                # 改了 table_id：舊的 table_id 在同一個 revision 記一筆 tombstone
+                self.conn.execute("INSERT INTO tombstones (table_id, floor, rev) VALUES (?, ?, ?)",
+                                  (table_id, old.get("floor"), row["rev"]))
+            return self._get(new_id)
+        return await self._run(run)
+
+    async def delete(self, table_id: str) -> Optional[dict]:
+        def run():
+            doc = self._get(table_id)
+            if doc is None:
+                return None
+            self.conn.execute("DELETE FROM tables WHERE table_id = ?", (table_id,))
+            self.conn.execute("INSERT INTO tombstones (table_id, floor, rev) VALUES (?, ?, ?)",
+                              (table_id, doc.get("floor"), self._next_rev()))
+            return doc
+        return await self._run(run)
+
+    async def clear(self) -> int:
+        def run():
+            rev = self._next_rev()
+            count = self.conn.execute("DELETE FROM tables").rowcount
+            self._mark_reset_sync(rev)
+            return count
+        return await self._run(run)
+
+    async def upsert_many(self, docs: List[dict]) -> dict:
+        """依 table_id 整筆寫入（保留原本的 _id），一批在同一個 transaction；單筆失敗記在 errors"""
+        def run():
+            rev = self._next_rev()
+            report = {"inserted": 0, "updated": 0, "errors": []}
+            for i, doc in enumerate(docs):
+                row = {**_to_row(doc), "rev": rev}
+                assignments = ", ".join(f"{_quote(c)} = ?" for c in row)
+                try:
+                    cur = self.conn.execute(f"UPDATE tables SET {assignments} WHERE table_id = ?",
+                                            (*row.values(), doc["table_id"]))
+                    if cur.rowcount:
+                        report["updated"] += 1
+                    else:
+                        self._insert_sync(dict(doc), rev)
+                        report["inserted"] += 1
+                except (sqlite3.Error, DuplicateTableError) as e:
+                    report["errors"].append({"index": i, "table_id": doc["table_id"], "error": str(e)})
+            return report
+        if not docs:
+            return {"inserted": 0, "updated": 0, "errors": []}
+        return await self._run(run)
+
+    async def apply_layout(self, diff) -> dict:
+        """寫入 IM_layout.diff_layout 的結果，整個套用在同一個 transaction 裡（任何一筆失敗就全部不生效）"""
+        def run():
+            rev = self._next_rev()
+            deleted = []
+            for table_id in diff.deletes:
+                doc = self._get(table_id)
+                if doc is None:
+                    continue
+                self.conn.execute("DELETE FROM tables WHERE table_id = ?", (table_id,))
+                self.conn.execute("INSERT INTO tombstones (table_id, floor, rev) VALUES (?, ?, ?)",
+                                  (table_id, doc.get("floor"), rev))
+                deleted.append({"table_id": table_id, "floor": doc.get("floor")})
+            for doc in diff.inserts:
+                self._insert_sync(dict(doc), rev)
+            for table_id, fields in diff.updates:
+                row = {**_to_row(fields), "rev": rev}
+                assignments = ", ".join(f"{_quote(c)} = ?" for c in row)
+                self.conn.execute(f"UPDATE tables SET {assignments} WHERE table_id = ?", (*row.values(), table_id))
+            changed = [doc["table_id"] for doc in diff.inserts] + [table_id for table_id, _ in diff.updates]
+            return {"upserted": [self._get(table_id) for table_id in changed], "deleted": deleted}
+        if not (diff.inserts or diff.updates or diff.deletes):
+            return {"upserted": [], "deleted": []}
+        return await self._run(run)
+
+    async def delete_except(self, keep: Set[str]) -> List[dict]:
+        def run():
+            rows = self.conn.execute("SELECT table_id, floor FROM tables").fetchall()
+            doomed = [{"table_id": r["table_id"], "floor": r["floor"]} for r in rows if r["table_id"] not in keep]
+            if doomed:
+                rev = self._next_rev()
+                self.conn.executemany("DELETE FROM tables WHERE table_id = ?", [(d["table_id"],) for d in doomed])
+                self.conn.executemany("INSERT INTO tombstones (table_id, floor, rev) VALUES (?, ?, ?)",
+                                      [(d["table_id"], d["floor"], rev) for d in doomed])
+            return doomed
+        return await self._run(run)
+
+    async def iter_tables(self, batch_size: int = 500) -> AsyncIterator[List[dict]]:
+        """依 table_id 分頁讀取（keyset pagination），每頁一個短 transaction，不會長時間鎖住連線"""
+        last = ""
+        while True:
+            batch = await self._run(
+                self._all_by_table_id, "WHERE table_id > ?", (last,), batch_size)
+            if not batch:
+                return
+            yield batch
+            last = batch[-1]["table_id"]
+
+    def _all_by_table_id(self, where: str, params, limit: int) -> List[dict]:
+        rows = self.conn.execute(f"SELECT * FROM tables {where} ORDER BY table_id LIMIT ?",
+                                 (*params, limit)).fetchall()
+        return [_from_row(r) for r in rows]
+
+    async def exists(self, table_id: str) -> bool:
+        return await self._run(lambda: self._get(table_id) is not None)
+
+    async def check_in(self, table_id: str, guests: int, use_extra_seats: bool = True) -> Optional[dict]:
+        limit = "capacity + extraSeatLimit" if use_extra_seats else "capacity"
+
+        def run():
+            cur = self.conn.execute(
+                f"UPDATE tables SET occupied = occupied + ?, updateTime = ?, rev = ? "
+                f"WHERE table_id = ? AND occupied + ? <= {limit}",
+                (guests, datetime.now().isoformat(), self._next_rev(), table_id, guests),
+            )
+            return self._get(table_id) if cur.rowcount else None
+        return await self._run(run)
+
+    async def check_out(self, table_id: str, guests: int) -> Optional[dict]:
+        def run():
+            cur = self.conn.execute(
+                "UPDATE tables SET occupied = occupied - ?, rev = ? WHERE table_id = ? AND occupied >= ?",
+                (guests, self._next_rev(), table_id, guests),
+            )
+            return self._get(table_id) if cur.rowcount else None
+        return await self._run(run)
+
+    async def occupancy_by_floor(self) -> Dict[str, Dict[str, int]]:
+        def run():
+            rows = self.conn.execute(
+                "SELECT floor, COUNT(*) AS tables, SUM(capacity + extraSeatLimit) AS seats, "
+                "SUM(occupied) AS occupied FROM tables "
+                "WHERE capacity > 0 AND table_id NOT LIKE 's\\_%' ESCAPE '\\' GROUP BY floor"
+            ).fetchall()
+            return {r["floor"]: {"tables": r["tables"], "seats": r["seats"], "occupied": r["occupied"]}
+                    for r in rows}
+        return await self._run(run)
+
+    # ---------- index ----------
+    def _create_index_sync(self, target: str, spec) -> str:
+        table = SQL_TABLES[target]
+        unique = "UNIQUE " if spec.unique else ""
+        columns = ", ".join(_quote(field) for field, _ in spec.keys)
+        self.conn.execute(f"CREATE {unique}INDEX IF NOT EXISTS {table}__{spec.name} ON {table} ({columns})")
+        return spec.name
+
+    async def index_information(self, target: str) -> dict:
+        """回傳和 pymongo index_information() 相同格式：{name: {"key": [(欄位, 1)], "unique": bool}}"""
+        table = SQL_TABLES[target]
+
+        def run():
+            info = {}
+            for idx in self.conn.execute(f"PRAGMA index_list({table})").fetchall():
+                if idx["name"].startswith("sqlite_autoindex"):
+                    continue
+                name = idx["name"].removeprefix(f"{table}__")
+                columns = self.conn.execute(f"PRAGMA index_info({idx['name']})").fetchall()
+                info[name] = {"key": [(c["name"], 1) for c in columns], "unique": bool(idx["unique"])}
+            return info
+        return await self._run(run)
+
+    async def create_index(self, target: str, spec) -> str:
+        return await self._run(self._create_index_sync, target, spec)
+
+    async def explain_find(self, target: str, query: dict) -> dict:
+        """
+        把簡單的查詢條件（等於、$gt/$gte/$lt/$lte）轉成 SQL 跑 EXPLAIN QUERY PLAN，
+        結果包成和 MongoDB explain 相同的形狀，給 IM_indexes.find_collscans 使用
+        """
+        ops = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+        clauses, params = [], []
+        for field, cond in query.items():
+            if isinstance(cond, dict):
+                for op, value in cond.items():
+                    clauses.append(f"{_quote(field)} {ops[op]} ?")
+                    params.append(value)
+            else:
+                clauses.append(f"{_quote(field)} = ?")
+                params.append(cond)
+        sql = f"SELECT * FROM {SQL_TABLES[target]} WHERE {' AND '.join(clauses) or '1'}"
+
+        def run():
+            details = [r["detail"] for r in self.conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            scan = any(re.match(r"SCAN (TABLE )?\w+$", d) for d in details)
+            return {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN" if scan else "IXSCAN",
+                                                     "details": details}}}
+        return await self._run(run)
+
+    # ---------- 入座歷史（見 IM_analytics） ----------
+    async def ensure_occupancy_events(self, ttl_seconds: int):
+        """事件表在建立連線時就已經建好；過期事件由 prune_occupancy_events 刪除"""
+
+    async def append_occupancy_events(self, events: List[dict]):
+        rows = [(_ts(e["ts"]), e["table_id"], e["floor"], e["occupied"], e["delta"], e["seats"]) for e in events]
+        await self._run(lambda: self.conn.executemany(
+            "INSERT INTO occupancy_events (ts, table_id, floor, occupied, delta, seats) VALUES (?, ?, ?, ?, ?, ?)",
+            rows))
+
+    async def occupancy_events_between(self, start: datetime, end: datetime) -> List[dict]:
+        def run():
+            rows = self.conn.execute(
+                "SELECT * FROM occupancy_events WHERE ts >= ? AND ts < ? ORDER BY ts", (_ts(start), _ts(end))
+            ).fetchall()
+            return [{**dict(r), "ts": datetime.fromisoformat(r["ts"])} for r in rows]
+        return await self._run(run)
+
+    async def prune_occupancy_events(self, before: datetime) -> int:
+        return await self._run(
+            lambda: self.conn.execute("DELETE FROM occupancy_events WHERE ts < ?", (_ts(before),)).rowcount)
+
+    async def save_occupancy_rollups(self, docs: List[dict]):
+        rows = [(d["level"], d["key"], _ts(d["hour"]), json.dumps({**d, "hour": _ts(d["hour"])}, ensure_ascii=False))
+                for d in docs]
+        await self._run(lambda: self.conn.executemany(
+            'INSERT INTO occupancy_rollups (level, "key", hour, doc) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (level, "key", hour) DO UPDATE SET doc = excluded.doc', rows))
+
+    async def occupancy_rollups(self, level: str, key: Optional[str], start: datetime, end: datetime) -> List[dict]:
+        sql = "SELECT doc FROM occupancy_rollups WHERE level = ? AND hour >= ? AND hour < ?"
+        params = [level, _ts(start), _ts(end)]
+        if key is not None:
+            sql += ' AND "key" = ?'
+            params.append(key)
+
+        def run():
+            docs = [json.loads(r["doc"]) for r in self.conn.execute(sql + " ORDER BY hour", params)]
+            for doc in docs:
+                doc["hour"] = datetime.fromisoformat(doc["hour"])
+            return docs
+        return await self._run(run)
+
+    async def get_occupancy_state(self) -> Optional[dict]:
+        def run():
+            row = self.conn.execute("SELECT doc FROM occupancy_state WHERE name = 'rollup'").fetchone()
+            if row is None:
+                return None
+            state = json.loads(row["doc"])
+            return {"hour": datetime.fromisoformat(state["hour"]), "levels": state["levels"]}
+        return await self._run(run)
+
+    async def save_occupancy_state(self, state: dict):
+        doc = json.dumps({"hour": _ts(state["hour"]), "levels": state["levels"]}, ensure_ascii=False)
+        await self._run(lambda: self.conn.execute(
+            "INSERT INTO occupancy_state (name, doc) VALUES ('rollup', ?) "
+            "ON CONFLICT (name) DO UPDATE SET doc = excluded.doc", (doc,)))
+
+    # ---------- 背景設定 ----------
+    async def get_background(self, floor_id: str) -> Optional[dict]:
+        def run():
+            row = self.conn.execute("SELECT _id, doc FROM backgrounds WHERE floor_id = ?", (floor_id,)).fetchone()
+            return {**json.loads(row["doc"]), "_id": row["_id"]} if row else None
+        return await self._run(run)
+
+    async def save_background(self, setting: dict) -> dict:
+        def run():
+            row = self.conn.execute("SELECT _id FROM backgrounds WHERE floor_id = ?",
+                                    (setting["floor_id"],)).fetchone()
+            _id = row["_id"] if row else _new_id()
+            doc = json.dumps(setting, ensure_ascii=False)
+            if row:
+                self.conn.execute("UPDATE backgrounds SET doc = ? WHERE _id = ?", (doc, _id))
+            else:
+                self.conn.execute("INSERT INTO backgrounds (floor_id, _id, doc) VALUES (?, ?, ?)",
+                                  (setting["floor_id"], _id, doc))
+            return {**setting, "_id": _id}
+        return await self._run(run)
@@ -0,0 +1,139 @@
+"""
+靜態頁面與前端資源（預先壓縮、ETag、長效快取）
+
+顧客掃 QR code 打開的 /customer、店員用的 /management，以及 React 打包後的檔案、public/img 的圖片，
+內容在程式啟動後就不會再變，所以在登記時就一次準備好：
+- 原始內容、gzip（level 9）、brotli（quality 11，需要安裝 brotli 套件；沒裝時只提供 gzip）
+- ETag 為內容的 sha256，壓縮版本共用同一個 weak ETag（內容相同、只差在傳輸編碼）
+- 依 Accept-Encoding 挑選 br > gzip > 原始內容，回應都帶 Vary: Accept-Encoding
+- If-None-Match 相符時回 304
+
+Cache-Control：
+- 檔名帶 hash 的打包檔（/app/assets/…）：一年 + immutable，內容一改檔名就會變
+- 圖片（/img/…）：一天
+- HTML（/customer、/management、/app）：STATIC_HTML_MAX_AGE 秒（預設 300），過期後帶 ETag 回來確認
+
+React 打包方式：在 kaiwei/seats-project 執行 npm run build，輸出在 dist/，由 /app 提供
+（FRONTEND_DIST 可以指定其他目錄）。
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, NamedTuple, Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from IM_compress import choose_encoding
+from IM_http import etag_matches
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli 為選用套件
+    brotli = None
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+FRONTEND_DIR = os.path.join(ROOT, "kaiwei", "seats-project")
+FRONTEND_DIST = os.getenv("FRONTEND_DIST", os.path.join(FRONTEND_DIR, "dist"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+IMAGE_CACHE = "public, max-age=86400"
+HTML_CACHE = f"public, max-age={int(os.getenv('STATIC_HTML_MAX_AGE', 300))}"
+
+# 已經是壓縮格式的檔案再壓一次只會更大
+_COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+_MIN_COMPRESS_SIZE = 512
+
+
+class StaticAsset(NamedTuple):
+    body: bytes
+    media_type: str
+    etag: str
+    cache_control: str
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+
+class StaticAssets:
+
+    def __init__(self):
+        self._assets: Dict[str, StaticAsset] = {}
+
+    def add(self, path: str, body, media_type: str, cache_control: str = HTML_CACHE) -> StaticAsset:
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        compressed = {}
+        if media_type.startswith(_COMPRESSIBLE) and len(body) >= _MIN_COMPRESS_SIZE:
+            compressed["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                compressed["br"] = brotli.compress(body, quality=11)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:20]}"'
+        asset = StaticAsset(body, media_type, etag, cache_control, **compressed)
+        self._assets[path] = asset
+        return asset
+
+    def add_directory(self, url_prefix: str, directory: str, cache_control: str):
+        """登記 directory 底下所有檔案，網址為 url_prefix + 相對路徑"""
+        if not os.path.isdir(directory):
+            return 0
+        count = 0
+        for base, _, files in os.walk(directory):
+            for name in files:
+                full = os.path.join(base, name)
+                rel = os.path.relpath(full, directory).replace(os.sep, "/")
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if media_type.startswith("text/"):
+                    media_type += "; charset=utf-8"
+                with open(full, "rb") as f:
+                    self.add(f"{url_prefix}/{rel}", f.read(), media_type, cache_control)
+                count += 1
+        return count
+
+    def get(self, path: str) -> Optional[StaticAsset]:
+        return self._assets.get(path)
+
+    def response(self, request: Request, path: str) -> Response:
+        asset = self._assets.get(path)
+        if asset is None:
+            raise HTTPException(status_code=404, detail="Not found")
+        headers = {"ETag": f"W/{asset.etag}", "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request, asset.etag):
+            return Response(status_code=304, headers=headers)
+        available = [name for name in ("br", "gzip") if getattr(asset, name) is not None]
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""), available)
+        if encoding is None:
+            return Response(asset.body, media_type=asset.media_type, headers=headers)
+        headers["Content-Encoding"] = encoding
+        return Response(getattr(asset, encoding), media_type=asset.media_type, headers=headers)
+
+
+# 整個程序共用一份；/customer、/management 由 kaiwei/simple_local_server 登記
+ASSETS = StaticAssets()
+
+# 圖片：打包過就用 dist 裡的複本，否則直接用 public/img
+ASSETS.add_directory("/img", os.path.join(FRONTEND_DIR, "public", "img"), IMAGE_CACHE)
+ASSETS.add_directory("/img", os.path.join(FRONTEND_DIST, "img"), IMAGE_CACHE)
+ASSETS.add_directory("/app/assets", os.path.join(FRONTEND_DIST, "assets"), IMMUTABLE)
+if os.path.isfile(os.path.join(FRONTEND_DIST, "index.html")):
+    with open(os.path.join(FRONTEND_DIST, "index.html"), "rb") as f:
+        ASSETS.add("/app", f.read(), "text/html; charset=utf-8", HTML_CACHE)
+
+router = APIRouter()
+
+
+@router.get("/img/{path:path}", include_in_schema=False)
+async def get_image(path: str, request: Request):
+    return ASSETS.response(request, f"/img/{path}")
+
+
+@router.get("/app/assets/{path:path}", include_in_schema=False)
+async def get_frontend_asset(path: str, request: Request):
+    return ASSETS.response(request, f"/app/assets/{path}")
+
+
+@router.get("/app", include_in_schema=False)
+@router.get("/app/{path:path}", include_in_schema=False)
+async def get_frontend(request: Request, path: str = ""):
+    # React 的前端路由：其他 /app/… 都回傳同一份 index.html
+    return ASSETS.response(request, "/app")
@@ -0,0 +1,135 @@
+"""
+入座統計（每樓層 / 全店）：桌數、座位數、已入座人數、使用率
+
+掛在 TableCache 上（cache.add_listener），每次桌位異動只做 O(1) 的加減，
+GET /stats 直接回傳目前的累計值，不需要掃整個 collection。
+另外有一個背景 task 定期用 aggregation 跟資料庫對帳（reconcile），
+發現不一致就以資料庫為準修正，結果記錄在 lastReconcile。
+
+統計範圍和管理頁面一致：只算 capacity > 0 且 table_id 不以 "s_" 開頭的桌子。
+"""
+
+import asyncio
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+FIELDS = ("tables", "seats", "occupied")
+
+
+def is_seatable(table: dict) -> bool:
+    return table.get("capacity", 0) > 0 and not table["table_id"].startswith("s_")
+
+
+def _contribution(table: Optional[dict]):
+    if table is None or not is_seatable(table):
+        return None
+    seats = table.get("capacity", 0) + table.get("extraSeatLimit", 0)
+    return table.get("floor"), (1, seats, table.get("occupied", 0))
+
+
+def _with_rate(totals: Dict[str, int]) -> dict:
+    rate = totals["occupied"] / totals["seats"] if totals["seats"] > 0 else 0.0
+    return {**totals, "utilization": round(rate, 4)}
+
+
+class OccupancyStats:
+
+    def __init__(self, store):
+        self.store = store
+        self._floors: Dict[str, Dict[str, int]] = {}
+        self._version = 0  # 每次異動 +1，對帳時用來判斷期間有沒有新的寫入
+        self._lock = threading.Lock()
+        self.last_reconcile: Optional[dict] = None
+
+    # ---------- TableCache listener ----------
+    def reset(self, tables):
+        floors: Dict[str, Dict[str, int]] = {}
+        for table in tables:
+            self._add(floors, _contribution(table), 1)
+        with self._lock:
+            self._floors = floors
+            self._version += 1
+
+    def apply(self, old: Optional[dict], new: Optional[dict]):
+        with self._lock:
+            self._add(self._floors, _contribution(old), -1)
+            self._add(self._floors, _contribution(new), 1)
+            self._version += 1
+
+    @staticmethod
+    def _add(floors, contribution, sign: int):
+        if contribution is None:
+            return
+        floor, values = contribution
+        totals = floors.setdefault(floor, dict.fromkeys(FIELDS, 0))
+        for field, value in zip(FIELDS, values):
+            totals[field] += sign * value
+        if totals["tables"] == 0:
+            del floors[floor]
+
+    # ---------- 查詢 ----------
+    def snapshot(self) -> dict:
+        with self._lock:
+            floors = {f: dict(t) for f, t in self._floors.items()}
+        store = dict.fromkeys(FIELDS, 0)
+        for totals in floors.values():
+            for field in FIELDS:
+                store[field] += totals[field]
+        return {
+            "store": _with_rate(store),
+            "floors": {f: _with_rate(t) for f, t in sorted(floors.items())},
+            "lastReconcile": self.last_reconcile,
+        }
+
+    # ---------- 對帳 ----------
+    async def reconcile(self) -> dict:
+        """
+        用資料庫重算一次並比對；有差異且對帳期間沒有新的寫入時，以資料庫為準覆蓋。
+        回傳（同時記錄在 last_reconcile）：{"time", "drift": {樓層: {欄位: 差值}}, "corrected"}
+        """
+        with self._lock:
+            version = self._version
+        actual = await self.store.occupancy_by_floor()
+
+        with self._lock:
+            drift = {}
+            for floor in set(actual) | set(self._floors):
+                expected = self._floors.get(floor, dict.fromkeys(FIELDS, 0))
+                real = actual.get(floor, dict.fromkeys(FIELDS, 0))
+                diff = {f: real[f] - expected[f] for f in FIELDS if real[f] != expected[f]}
+                if diff:
+                    drift[floor] = diff
+            # 對帳期間有寫入時，資料庫結果可能比累計值新或舊，這一輪先不覆蓋
+            corrected = bool(drift) and version == self._version
+            if corrected:
+                self._floors = actual
+                self._version += 1
+
+        self.last_reconcile = {
+            "time": datetime.now().isoformat(),
+            "drift": drift,
+            "corrected": corrected,
+        }
+        return self.last_reconcile
+
+    def start_reconciler(self, interval: Optional[float] = None):
+        """
+        在目前的 event loop 上啟動背景定期對帳（於 startup 事件中呼叫）
+        STATS_RECONCILE_INTERVAL=秒數（預設 300，<= 0 代表不啟動）
+        """
+        if interval is None:
+            interval = float(os.getenv("STATS_RECONCILE_INTERVAL", 300))
+        if interval <= 0:
+            return None
+
+        async def run():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await self.reconcile()
+                except Exception as e:  # 資料庫暫時連不上時，下一輪再試
+                    self.last_reconcile = {"time": datetime.now().isoformat(), "error": str(e)}
+
+        return asyncio.create_task(run())
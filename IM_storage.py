@@ -0,0 +1,452 @@
+"""
+桌位 / 背景設定的資料存取層
+
+路由一律 `async def` 並透過這裡存取資料庫，用環境變數 MONGO_DRIVER 選擇 driver：
+- sync （預設）：原本的 pymongo MongoClient，每個操作丟到 threadpool 執行，
+  併發量受 threadpool 大小限制
+- async：PyMongo 的 AsyncMongoClient，在 event loop 上直接 await，
+  等待遠端 MongoDB 回應時不佔用執行緒
+
+兩種 driver 的 collection 方法名稱相同，差別只在「怎麼呼叫」，
+所以查詢內容都寫在 MongoTableStore，AsyncMongoTableStore 只覆寫 _call / _find / _aggregate。
+
+用環境變數 STORAGE_ENGINE 選擇儲存引擎：
+- mongo （預設）：上面兩種 MongoDB driver
+- sqlite：內嵌 SQLite（IM_sqlite.SqliteTableStore），檔案位置由 SQLITE_PATH 指定，
+  預設為專案目錄下的 cafe_seats.db；單店部署或沒有資料庫伺服器的機器可以直接使用
+"""
+
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+from pymongo import DeleteMany, InsertOne, ReplaceOne, UpdateOne
+from pymongo.collection import ReturnDocument
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
+
+from IM_mongo import MongoSettings, create_mongo_client, mongo_settings_from_env
+
+TABLE_COLLECTION = "im_final_project"
+BACKGROUND_COLLECTION = "background_settings"
+COUNTER_ID = "tables"
+OCCUPANCY_STATE_ID = "occupancy_rollup"
+# changes_since 的 cursor 停在現在往前這麼多秒：要大於一次寫入的時間加上各台應用伺服器之間的時鐘誤差
+REVISION_SETTLE_SECONDS = float(os.getenv("REVISION_SETTLE_SECONDS", 10))
+
+
+def _now_us() -> int:
+    return time.time_ns() // 1000
+
+
+class DuplicateTableError(Exception):
+    """table_id 已經存在（table_id 有 unique index）"""
+
+
+class MongoTableStore:
+    """同步 pymongo 版本"""
+
+    # /health 回報的資料庫種類
+    engine = "MongoDB"
+
+    def __init__(self, db, table_collection: str = TABLE_COLLECTION,
+                 bg_collection: str = BACKGROUND_COLLECTION, read_preference=None):
+        self.db = db
+        self.tables = db[table_collection]
+        self.backgrounds = db[bg_collection]
+        # 不經過快取的唯讀讀取（匯出、讀背景設定）用的 collection，可以設定成讀 secondary（見 IM_mongo）
+        self.read_tables = self.tables.with_options(read_preference=read_preference) \
+            if read_preference else self.tables
+        self.read_backgrounds = self.backgrounds.with_options(read_preference=read_preference) \
+            if read_preference else self.backgrounds
+        # 差異同步用：被刪除桌位的紀錄，以及最近一次整批重置的 reset_rev
+        self.tombstones = db[f"{table_collection}_tombstones"]
+        self.counters = db[f"{table_collection}_counters"]
+        self._last_rev = 0
+        # 入座歷史：事件（time-series collection）與每小時彙總（見 IM_analytics）
+        self.occupancy_events = db[f"{table_collection}_occupancy_events"]
+        self.occupancy_rollups = db[f"{table_collection}_occupancy_rollups"]
+
+    # ---------- 呼叫方式（子類別覆寫） ----------
+    async def _call(self, method, *args, **kwargs):
+        return await run_in_threadpool(method, *args, **kwargs)
+
+    async def _find(self, collection, *args, **kwargs) -> List[dict]:
+        return await run_in_threadpool(lambda: list(collection.find(*args, **kwargs)))
+
+    async def _aggregate(self, collection, pipeline) -> List[dict]:
+        return await run_in_threadpool(lambda: list(collection.aggregate(pipeline)))
+
+    async def _next_batch(self, cursor, size: int) -> List[dict]:
+        return await run_in_threadpool(lambda: list(itertools.islice(cursor, size)))
+
+    async def _close(self, cursor):
+        await run_in_threadpool(cursor.close)
+
+    # ---------- revision ----------
+    def _next_revision(self) -> int:
+        """
+        下一個 revision：目前時間（微秒），同一個程序內嚴格遞增。每個寫入路徑都把它寫進桌位的 rev 欄位，
+        GET .../changes?since= 就能只回傳 rev 比 since 大的桌位。
+
+        revision 在寫入送出之前就決定了，不需要另外讀寫計數器（入座 / 離座仍然只有一次 find_one_and_update）；
+        代價是較早拿到 revision 的寫入可能較晚完成、各台伺服器的時鐘也有誤差，
+        所以 changes_since 給出的 cursor 停在 REVISION_SETTLE_SECONDS 之前
+        """
+        self._last_rev = max(_now_us(), self._last_rev + 1)
+        return self._last_rev
+
+    async def _mark_reset(self, rev: int):
+        # 整批清空之後，舊的 tombstone 都不需要了：比 reset_rev 舊的 cursor 一律整批重抓
+        await self._call(self.counters.update_one, {"_id": COUNTER_ID}, {"$max": {"reset_rev": rev}})
+        await self._call(self.tombstones.delete_many, {"rev": {"$lt": rev}})
+
+    async def changes_since(self, since: int) -> dict:
+        """
+        回傳 {"reset", "upserted", "deleted", "cursor"}：
+        - reset 為 True 時 upserted 是全部桌位，前端應整批替換
+        - 否則 upserted 為 rev > since 的桌位、deleted 為之後被刪掉的 table_id
+        - cursor 下次帶回來當 since：停在 REVISION_SETTLE_SECONDS 之前（見 _next_revision），
+          所以最近的寫入下一次可能會再送一次，前端依 table_id 覆蓋即可
+        """
+        counter = await self._call(self.counters.find_one, {"_id": COUNTER_ID}, {"reset_rev": 1}) or {}
+        reset_rev = counter.get("reset_rev", 0)
+        # 先決定 cursor 再讀資料：cursor 以前的寫入這時都已經完成，下面的查詢一定看得到
+        now = _now_us()
+        settled = max(now - int(REVISION_SETTLE_SECONDS * 1_000_000), reset_rev)
+        if since <= 0 or since < reset_rev or since > now:
+            # 整批重抓一定讀 primary，跟 cursor 對得上
+            upserted = await self._find(self.tables)
+            return {"reset": True, "upserted": upserted, "deleted": [], "cursor": settled}
+
+        upserted = await self._find(self.tables, {"rev": {"$gt": since}})
+        deleted = await self._find(self.tombstones, {"rev": {"$gt": since}})
+        cursor = max(since, settled)
+        # 同一個 table_id 先刪後又新增時，以較新的那筆為準
+        live = {d["table_id"]: d["rev"] for d in upserted}
+        deleted_ids = sorted({d["table_id"] for d in deleted if d["rev"] > live.get(d["table_id"], 0)})
+        return {"reset": False, "upserted": upserted, "deleted": deleted_ids, "cursor": cursor}
+
+    # ---------- 桌位 ----------
+    async def find_all(self, primary: bool = False) -> List[dict]:
+        """
+        整批讀出全部桌位（依 MONGO_READ_PREFERENCE 可能讀 secondary）；
+        primary=True 時一定讀 primary（快取載入、要拿來比對後寫回的情況）
+        """
+        return await self._find(self.tables if primary else self.read_tables)
+
+    async def insert(self, doc: dict) -> dict:
+        rev = self._next_revision()
+        doc["rev"] = rev
+        try:
+            result = await self._call(self.tables.insert_one, doc)
+        except DuplicateKeyError:
+            raise DuplicateTableError(doc["table_id"])
+        doc["_id"] = result.inserted_id
+        return doc
+
+    async def update(self, table_id: str, updates: dict) -> Optional[dict]:
+        """
+        局部更新，回傳更新後的 document；找不到時回傳 None。
+        改了 table_id 時，舊的 table_id 在同一個 revision 記一筆 tombstone（差異同步才會把它刪掉）
+        """
+        renamed = updates.get("table_id", table_id) != table_id
+        rev = self._next_revision()
+        updates = {**updates, "rev": rev}
+        try:
+            doc = await self._call(
+                self.tables.find_one_and_update,
+                {"table_id": table_id},
+                {"$set": updates},
+                return_document=ReturnDocument.BEFORE if renamed else ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            raise DuplicateTableError(updates["table_id"])
+        if renamed and doc is not None:
+            await self._call(self.tombstones.insert_one,
+                             {"table_id": table_id, "floor": doc.get("floor"), "rev": rev})
+            doc = {**doc, **updates}
+        return doc
+
+    async def delete(self, table_id: str) -> Optional[dict]:
+        """刪除並回傳被刪掉的 document；找不到時回傳 None"""
+        rev = self._next_revision()
+        deleted = await self._call(self.tables.find_one_and_delete, {"table_id": table_id})
+        if deleted is not None:
+            tombstone = {"table_id": table_id, "floor": deleted.get("floor"), "rev": rev}
+            await self._call(self.tombstones.insert_one, tombstone)
+        return deleted
+
+    async def clear(self) -> int:
+        rev = self._next_revision()
+        result = await self._call(self.tables.delete_many, {})
+        await self._mark_reset(rev)
+        return result.deleted_count
+
+    async def upsert_many(self, docs: List[dict]) -> dict:
+        """
+        依 table_id 整筆寫入（沒有就新增，有就覆蓋並保留原本的 _id），一次 bulk_write、共用一個 revision。
+        回傳 {"inserted", "updated", "errors"}，errors 為 [{"index": docs 中的位置, "table_id", "error"}]，
+        其中一筆失敗不影響其他筆
+        """
+        if not docs:
+            return {"inserted": 0, "updated": 0, "errors": []}
+        rev = self._next_revision()
+        ops = [ReplaceOne({"table_id": doc["table_id"]}, {**doc, "rev": rev}, upsert=True) for doc in docs]
+        try:
+            result = (await self._call(self.tables.bulk_write, ops, ordered=False)).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+        errors = [
+            {"index": err["index"], "table_id": docs[err["index"]]["table_id"], "error": err.get("errmsg", "")}
+            for err in result.get("writeErrors", [])
+        ]
+        return {"inserted": result.get("nUpserted", 0), "updated": result.get("nMatched", 0), "errors": errors}
+
+    @asynccontextmanager
+    async def _transaction(self):
+        """
+        MongoDB transaction（伺服器要是 replica set 或 sharded cluster；單機可以設成只有一個成員的 replica set）。
+        with 區塊裡的操作都要帶 session=，正常結束時 commit，發生例外時 abort，已經做的寫入全部不生效
+        """
+        session = self.db.client.start_session()
+        try:
+            await self._call(session.start_transaction)
+            try:
+                yield session
+            except BaseException:
+                await self._call(session.abort_transaction)
+                raise
+            await self._call(session.commit_transaction)
+        finally:
+            await self._call(session.end_session)
+
+    async def apply_layout(self, diff) -> dict:
+        """
+        寫入 IM_layout.diff_layout 的結果：刪除（DeleteMany）、新增（InsertOne）、
+        有變動的欄位（UpdateOne $set）合成一次 bulk_write，連同 tombstone 在同一個 transaction 裡，
+        共用一個 revision；任何一筆失敗時整份配置都不會變動。
+        回傳 {"upserted": 新增與更新後的 document, "deleted": 被刪掉的 {table_id, floor}}
+        """
+        if not (diff.inserts or diff.updates or diff.deletes):
+            return {"upserted": [], "deleted": []}
+        rev = self._next_revision()
+        async with self._transaction() as session:
+            ops = []
+            deleted = []
+            if diff.deletes:
+                deleted = await self._find(self.tables, {"table_id": {"$in": diff.deletes}},
+                                           {"_id": 0, "table_id": 1, "floor": 1}, session=session)
+                ops.append(DeleteMany({"table_id": {"$in": diff.deletes}}))
+            ops += [InsertOne({**doc, "rev": rev}) for doc in diff.inserts]
+            ops += [UpdateOne({"table_id": table_id}, {"$set": {**fields, "rev": rev}})
+                    for table_id, fields in diff.updates]
+            try:
+                await self._call(self.tables.bulk_write, ops, ordered=False, session=session)
+            except BulkWriteError as e:
+                for err in e.details.get("writeErrors", []):
+                    if err.get("code") == 11000:
+                        raise DuplicateTableError((err.get("op") or {}).get("table_id", ""))
+                raise
+            if deleted:
+                await self._call(self.tombstones.insert_many,
+                                 [{"table_id": d["table_id"], "floor": d.get("floor"), "rev": rev}
+                                  for d in deleted], session=session)
+        changed = [doc["table_id"] for doc in diff.inserts] + [table_id for table_id, _ in diff.updates]
+        upserted = await self._find(self.tables, {"table_id": {"$in": changed}}) if changed else []
+        return {"upserted": upserted, "deleted": deleted}
+
+    async def delete_except(self, keep: Set[str]) -> List[dict]:
+        """刪掉 table_id 不在 keep 裡的桌位，回傳被刪掉的 {table_id, floor}（留下 tombstone）"""
+        doomed = await self._find(self.tables, {"table_id": {"$nin": list(keep)}},
+                                  {"_id": 0, "table_id": 1, "floor": 1})
+        if doomed:
+            rev = self._next_revision()
+            await self._call(self.tables.delete_many, {"table_id": {"$in": [d["table_id"] for d in doomed]}})
+            await self._call(self.tombstones.insert_many,
+                             [{"table_id": d["table_id"], "floor": d.get("floor"), "rev": rev} for d in doomed])
+        return doomed
+
+    async def iter_tables(self, batch_size: int = 500) -> AsyncIterator[List[dict]]:
+        """依 table_id 排序，每次從 cursor 取出 batch_size 筆（匯出用，記憶體裡只有一批）"""
+        cursor = self.read_tables.find({}, sort=[("table_id", 1)], batch_size=batch_size)
+        try:
+            while True:
+                batch = await self._next_batch(cursor, batch_size)
+                if not batch:
+                    return
+                yield batch
+        finally:
+            await self._close(cursor)
+
+    async def exists(self, table_id: str) -> bool:
+        return await self._call(self.tables.count_documents, {"table_id": table_id}, limit=1) > 0
+
+    async def check_in(self, table_id: str, guests: int, use_extra_seats: bool = True) -> Optional[dict]:
+        """occupied + guests 不超過上限時才加上去；條件不成立（或桌子不存在）回傳 None"""
+        limit = {"$add": ["$capacity", "$extraSeatLimit"]} if use_extra_seats else "$capacity"
+        return await self._call(
+            self.tables.find_one_and_update,
+            {
+                "table_id": table_id,
+                "$expr": {"$lte": [{"$add": ["$occupied", guests]}, limit]},
+            },
+            {"$inc": {"occupied": guests}, "$set": {"updateTime": datetime.now(), "rev": self._next_revision()}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def check_out(self, table_id: str, guests: int) -> Optional[dict]:
+        """目前人數 >= guests 時才扣掉；條件不成立（或桌子不存在）回傳 None"""
+        return await self._call(
+            self.tables.find_one_and_update,
+            {"table_id": table_id, "occupied": {"$gte": guests}},
+            {"$inc": {"occupied": -guests}, "$set": {"rev": self._next_revision()}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def occupancy_by_floor(self) -> Dict[str, Dict[str, int]]:
+        """各樓層的桌數 / 座位數 / 已入座人數（只算 capacity > 0 且不是 s_ 開頭的桌子）"""
+        pipeline = [
+            {"$match": {"capacity": {"$gt": 0}, "table_id": {"$not": {"$regex": "^s_"}}}},
+            {"$group": {
+                "_id": "$floor",
+                "tables": {"$sum": 1},
+                "seats": {"$sum": {"$add": ["$capacity", "$extraSeatLimit"]}},
+                "occupied": {"$sum": "$occupied"},
+            }},
+        ]
+        rows = await self._aggregate(self.tables, pipeline)
+        return {
+            row["_id"]: {"tables": row["tables"], "seats": row["seats"], "occupied": row["occupied"]}
+            for row in rows
+        }
+
+    # ---------- index ----------
+    async def index_information(self, target: str) -> dict:
+        """target 為 store 上的 collection 屬性名稱，例如 "tables"（見 IM_indexes.INDEXES）"""
+        return await self._call(getattr(self, target).index_information)
+
+    async def create_index(self, target: str, spec) -> str:
+        return await self._call(getattr(self, target).create_index,
+                                spec.keys, name=spec.name, unique=spec.unique)
+
+    async def explain_find(self, target: str, query: dict) -> dict:
+        command = {"find": getattr(self, target).name, "filter": query}
+        return await self._call(self.db.command, "explain", command, verbosity="queryPlanner")
+
+    # ---------- 入座歷史（見 IM_analytics） ----------
+    async def ensure_occupancy_events(self, ttl_seconds: int):
+        """
+        建立事件用的 time-series collection（MongoDB 5.0+），超過 ttl_seconds 的事件自動刪除；
+        已經存在或伺服器不支援時沿用一般 collection（由 prune_occupancy_events 清除）
+        """
+        if self.occupancy_events.name in await self._call(self.db.list_collection_names):
+            return
+        try:
+            await self._call(
+                self.db.create_collection, self.occupancy_events.name,
+                timeseries={"timeField": "ts", "metaField": "table_id", "granularity": "minutes"},
+                expireAfterSeconds=ttl_seconds,
+            )
+        except (CollectionInvalid, OperationFailure):
+            pass
+
+    async def append_occupancy_events(self, events: List[dict]):
+        # insert_many 會在傳入的 dict 加上 _id，先複製一份
+        await self._call(self.occupancy_events.insert_many, [dict(e) for e in events], ordered=False)
+
+    async def occupancy_events_between(self, start: datetime, end: datetime) -> List[dict]:
+        return await self._find(self.occupancy_events, {"ts": {"$gte": start, "$lt": end}},
+                                {"_id": 0}, sort=[("ts", 1)])
+
+    async def prune_occupancy_events(self, before: datetime) -> int:
+        options = await self._call(self.occupancy_events.options)
+        if "timeseries" in options:
+            return 0  # time-series collection 由 expireAfterSeconds 清除
+        result = await self._call(self.occupancy_events.delete_many, {"ts": {"$lt": before}})
+        return result.deleted_count
+
+    async def save_occupancy_rollups(self, docs: List[dict]):
+        ops = [ReplaceOne({"level": d["level"], "key": d["key"], "hour": d["hour"]}, d, upsert=True)
+               for d in docs]
+        if ops:
+            await self._call(self.occupancy_rollups.bulk_write, ops, ordered=False)
+
+    async def occupancy_rollups(self, level: str, key: Optional[str], start: datetime, end: datetime) -> List[dict]:
+        query = {"level": level, "hour": {"$gte": start, "$lt": end}}
+        if key is not None:
+            query["key"] = key
+        return await self._find(self.occupancy_rollups, query, {"_id": 0}, sort=[("hour", 1)])
+
+    async def get_occupancy_state(self) -> Optional[dict]:
+        doc = await self._call(self.counters.find_one, {"_id": OCCUPANCY_STATE_ID})
+        if doc is None:
+            return None
+        # table_id 可能含有 "." 等不能當欄位名稱的字元，levels 以 list 儲存
+        return {"hour": doc["hour"], "levels": {row[0]: row[1:] for row in doc["levels"]}}
+
+    async def save_occupancy_state(self, state: dict):
+        levels = [[table_id, *level] for table_id, level in state["levels"].items()]
+        await self._call(self.counters.replace_one, {"_id": OCCUPANCY_STATE_ID},
+                         {"hour": state["hour"], "levels": levels}, upsert=True)
+
+    # ---------- 背景設定 ----------
+    async def get_background(self, floor_id: str) -> Optional[dict]:
+        return await self._call(self.read_backgrounds.find_one, {"floor_id": floor_id})
+
+    async def save_background(self, setting: dict) -> dict:
+        return await self._call(
+            self.backgrounds.find_one_and_replace,
+            {"floor_id": setting["floor_id"]},
+            setting,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+
+class AsyncMongoTableStore(MongoTableStore):
+    """PyMongo AsyncMongoClient 版本：collection 方法本身就是 coroutine"""
+
+    async def _call(self, method, *args, **kwargs):
+        return await method(*args, **kwargs)
+
+    async def _find(self, collection, *args, **kwargs) -> List[dict]:
+        return await collection.find(*args, **kwargs).to_list(None)
+
+    async def _aggregate(self, collection, pipeline) -> List[dict]:
+        cursor = await collection.aggregate(pipeline)
+        return await cursor.to_list(None)
+
+    async def _next_batch(self, cursor, size: int) -> List[dict]:
+        return await cursor.to_list(size)
+
+    async def _close(self, cursor):
+        await cursor.close()
+
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cafe_seats.db")
+
+
+def create_table_store(settings: Optional[MongoSettings] = None, driver: Optional[str] = None,
+                       engine: Optional[str] = None):
+    """
+    依 STORAGE_ENGINE（mongo / sqlite）與 MONGO_DRIVER（sync / async）建立資料存取物件，
+    MongoDB 的連線設定（連線池、timeout、壓縮、read preference）見 IM_mongo
+    """
+    engine = engine or os.getenv("STORAGE_ENGINE", "mongo")
+    if engine == "sqlite":
+        from IM_sqlite import SqliteTableStore
+        return SqliteTableStore(os.getenv("SQLITE_PATH", DEFAULT_SQLITE_PATH))
+    if engine != "mongo":
+        raise ValueError(f"Unknown STORAGE_ENGINE: {engine!r} (expected 'mongo' or 'sqlite')")
+
+    driver = driver or os.getenv("MONGO_DRIVER", "sync")
+    if driver not in ("sync", "async"):
+        raise ValueError(f"Unknown MONGO_DRIVER: {driver!r} (expected 'sync' or 'async')")
+    settings = settings or mongo_settings_from_env()
+    db = create_mongo_client(settings, driver)[settings.database]
+    store_class = AsyncMongoTableStore if driver == "async" else MongoTableStore
+    return store_class(db, read_preference=settings.read_preference_for_reads())
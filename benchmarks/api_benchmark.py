@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+API 熱門路徑的 microbenchmark
+
+不需要資料庫伺服器：用 mongomock 取代 MongoClient（兩個 server 共用 IM_shared 的一份記憶體資料庫），
+依 --sizes 產生 20 / 200 / 5000 張桌子的假配置，在同一個程序裡透過 ASGI client 打 API：
+
+- 函式：format_table、TableBase / SeatUpdate 驗證、列表序列化（每次重新編碼 / EncodedListings）
+- 路由：GET /seats、PATCH /seats/{table_id}、GET /health（kaiwei/simple_local_server），
+        POST /tables、POST /background（IM_db_server）
+
+每一項輸出 mean / p50 / p95 / p99 與每秒次數，結果寫進 --output 的 JSON，
+帶 --baseline 時和之前的結果比較 p50，任何一項變慢超過 --threshold（預設 20%）就回傳 1。
+
+    pip install mongomock httpx
+    python benchmarks/api_benchmark.py --output bench.json
+    git checkout <其他 commit>
+    python benchmarks/api_benchmark.py --output new.json --baseline bench.json --threshold 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+import httpx
+import mongomock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "kaiwei"))
+# MONGO_URI 只是必填的設定，實際連線換成下面的 mongomock
+os.environ.update(STORAGE_ENGINE="mongo", MONGO_DRIVER="sync", MONGO_URI="mongodb://localhost:27017")
+
+import IM_mongo  # noqa: E402
+
+# 兩個 server 在 import 時建立 MongoClient，先換成 mongomock
+IM_mongo.MongoClient = mongomock.MongoClient
+
+import IM_db_server  # noqa: E402
+import IM_shared  # noqa: E402
+import simple_local_server  # noqa: E402
+
+# mongomock 不支援 time-series collection：先建成一般 collection，
+# startup 的 ensure_occupancy_events 看到已經存在就直接沿用
+IM_shared.store.db.create_collection(IM_shared.store.occupancy_events.name)
+from IM_json import EncodedListings, dumps  # noqa: E402
+from IM_query import TableQuery  # noqa: E402
+
+
+def make_layout(count: int) -> List[dict]:
+    now = datetime.now()
+    return [
+        {
+            "table_id": f"t_{i:04d}",
+            "floor": f"{i % 3 + 1}F",
+            "index": i,
+            "name": f"A{i}",
+            # 座標同前端編輯器（見 IM_spatial），排成不重疊的格子
+            "left": float(i % 40) * 2.5,
+            "top": float(i // 40) * 2.5,
+            "width": 0.5,
+            "height": 0.25,
+            "capacity": 4,
+            "occupied": i % 5,
+            "extraSeatLimit": 1,
+            "tags": ["窗邊", "插座"] if i % 2 else [],
+            "description": "靠窗四人桌",
+            "updateTime": now - timedelta(seconds=i),
+            "available": True,
+        }
+        for i in range(count)
+    ]
+
+
+def summarize(samples: List[float], elapsed: float) -> dict:
+    samples = sorted(samples)
+
+    def pct(q):
+        return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "ops_per_sec": len(samples) / elapsed if elapsed else float("inf"),
+    }
+
+
+def bench_sync(fn: Callable[[int], object], iterations: int) -> dict:
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - started)
+
+
+async def bench_async(fn, iterations: int) -> dict:
+    samples = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        resp = await fn(i)
+        samples.append(time.perf_counter() - t0)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"{resp.request.method} {resp.request.url} -> {resp.status_code}: {resp.text}")
+    return summarize(samples, time.perf_counter() - started)
+
+
+def bench_functions(layout: List[dict], raw: List[dict], iterations: int) -> Dict[str, dict]:
+    payloads = [{**t, "updateTime": t["updateTime"].isoformat()} for t in layout]
+    formatted = [simple_local_server.format_table(doc) for doc in raw]
+    query = TableQuery(floor=None, kind="table", min_free_seats=None, tags=None, sort="name")
+    listings = EncodedListings()
+    n = len(raw)
+    # 單筆的項目以「整份配置跑一遍」為一次，和列表回應的成本可以直接比較
+    return {
+        "format_table": bench_sync(lambda i: [simple_local_server.format_table(d) for d in raw], iterations),
+        "validate TableBase": bench_sync(
+            lambda i: [IM_db_server.TableBase.model_validate(p) for p in payloads], iterations),
+        "validate SeatUpdate": bench_sync(
+            lambda i: simple_local_server.SeatUpdate.model_validate(payloads[i % n]), iterations),
+        "listing encode": bench_sync(lambda i: dumps(query.apply(formatted)), iterations),
+        "listing cached": bench_sync(
+            lambda i: listings.get('"bench"', query.key, lambda: query.apply(formatted)), iterations),
+    }
+
+
+async def seed(layout: List[dict]):
+    # 測試資料直接寫進 mongomock（不經過 API，也不計時）
+    store = IM_shared.store
+    await store.clear()
+    store.tables.insert_many([{**t, "rev": 1} for t in layout])
+    await IM_shared.table_cache.load()
+
+
+async def bench_endpoints(layout: List[dict], iterations: int) -> Dict[str, dict]:
+    seats_app, tables_app = simple_local_server.app, IM_db_server.app
+    await seed(layout)
+    n = len(layout)
+    patch_bodies = [
+        {**t, "occupied": (t["occupied"] + 1) % 5, "updateTime": t["updateTime"].isoformat()}
+        for t in layout
+    ]
+    background = {"floor_id": "1F", "cropX": 0, "cropY": 0, "cropWidth": 800, "cropHeight": 600,
+                  "cropZoom": 1.0, "rotation": 0, "bgHidden": False, "gridHidden": False, "seatIndex": 0}
+
+    results = {}
+    seats = httpx.AsyncClient(transport=httpx.ASGITransport(app=seats_app), base_url="http://bench")
+    tables = httpx.AsyncClient(transport=httpx.ASGITransport(app=tables_app), base_url="http://bench")
+    async with seats, tables:
+        results["GET /seats"] = await bench_async(lambda i: seats.get("/seats"), iterations)
+        results["PATCH /seats/{table_id}"] = await bench_async(
+            lambda i: seats.patch(f"/seats/{layout[i % n]['table_id']}", json=patch_bodies[i % n]), iterations)
+        results["GET /health"] = await bench_async(lambda i: seats.get("/health"), iterations)
+        results["POST /tables"] = await bench_async(
+            lambda i: tables.post("/tables", json={**patch_bodies[i % n], "table_id": f"new_{i}", "left": -10.0 - 5 * i}),
+            iterations)
+        results["POST /background"] = await bench_async(
+            lambda i: tables.post("/background", json={**background, "cropX": i}), iterations)
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """回傳 p50 比 baseline 慢超過 threshold 的項目"""
+    regressions = []
+    print(f"\n{'benchmark':<36}{'base p50':>10}{'p50':>10}{'change':>9}")
+    for key, current in results.items():
+        if key not in baseline:
+            continue
+        before, after = baseline[key]["p50_ms"], current["p50_ms"]
+        change = (after - before) / before if before else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{key:<36}{before:>10.3f}{after:>10.3f}{change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=[20, 200, 5000])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="之前的結果 JSON，用來比較 p50")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="p50 變慢超過這個比例就算退步（0.2 = 20%%）")
+    args = parser.parse_args()
+
+    results = {}
+    async with simple_local_server.app.router.lifespan_context(simple_local_server.app), \
+            IM_db_server.app.router.lifespan_context(IM_db_server.app):
+        for size in args.sizes:
+            layout = make_layout(size)
+            raw = [{**t, "_id": f"{i:024x}", "rev": i + 1} for i, t in enumerate(layout)]
+            for name, r in bench_functions(layout, raw, args.iterations).items():
+                results[f"{size}/{name}"] = r
+            for name, r in (await bench_endpoints(layout, args.iterations)).items():
+                results[f"{size}/{name}"] = r
+
+    print(f"{'benchmark':<36}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>11}")
+    for key, r in results.items():
+        print(f"{key:<36}{r['mean_ms']:>10.3f}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}"
+              f"{r['p99_ms']:>10.3f}{r['ops_per_sec']:>11.1f}")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "iterations": args.iterations,
+            "sizes": args.sizes,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nwrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%} "
+                  f"(baseline {baseline['meta'].get('commit')})")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
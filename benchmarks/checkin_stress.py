@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+入座併發壓力測試：同時對同一張桌子送出大量 checkin，確認不會超賣
+
+用法（先啟動 simple_local_server.py 或 IM_db_server.py）：
+    python benchmarks/checkin_stress.py --base-url http://localhost:8001/seats --table t_01 --clients 300
+
+流程：
+1. 把該桌 occupied 歸零
+2. 用 --clients 個執行緒同時送出 POST {base-url}/{table}/checkin (guests=1)
+3. 檢查成功次數 == capacity + extraSeatLimit，且最後 occupied 沒有超過上限
+"""
+
+import argparse
+import json
+import sys
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def request(method, url, body=None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status, json.loads(resp.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def find_table(base_url, table_id):
+    # /seats 與 /tables 都有列出全部桌位的 GET
+    _, tables = request("GET", base_url)
+    return next((t for t in tables if t["table_id"] == table_id), None)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://localhost:8001/seats")
+    parser.add_argument("--table", required=True)
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--guests", type=int, default=1)
+    args = parser.parse_args()
+
+    table = find_table(args.base_url, args.table)
+    if table is None:
+        sys.exit(f"找不到桌位 {args.table}")
+    if table["occupied"] > 0:
+        request("POST", f"{args.base_url}/{args.table}/checkout", {"guests": table["occupied"]})
+    limit = table["capacity"] + table["extraSeatLimit"]
+
+    barrier = threading.Barrier(args.clients)
+
+    def checkin(_):
+        barrier.wait()  # 讓所有請求盡量同一時間送出
+        return request("POST", f"{args.base_url}/{args.table}/checkin", {"guests": args.guests})[0]
+
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        statuses = list(pool.map(checkin, range(args.clients)))
+
+    accepted = statuses.count(200)
+    rejected = statuses.count(409)
+    others = len(statuses) - accepted - rejected
+    final = find_table(args.base_url, args.table)
+
+    expected = limit // args.guests
+    print(f"上限 {limit} 人，{args.clients} 個請求：成功 {accepted}、409 {rejected}、其他 {others}")
+    print(f"最後 occupied = {final['occupied']}")
+
+    ok = accepted == expected and final["occupied"] == accepted * args.guests <= limit and others == 0
+    print("OK：沒有超賣" if ok else "FAIL：人數不一致")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+GET /tables 列表回應壓縮的比較
+
+以 --tables 指定的桌位數產生假資料（同 serialization_benchmark），對每種可用的編碼
+（identity / gzip / br / zstd，後兩者需要安裝 brotli、zstandard）比較：
+- bytes      ：實際送出的大小與壓縮率
+- compress ms：每次請求都重新壓縮的 CPU 時間（CompressionMiddleware 的路徑）
+- cached ms  ：EncodedListings 保存壓縮結果後，同一個快取版本的請求取用時間
+
+    python benchmarks/compression_benchmark.py --tables 20 200 1000 5000
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from serialization_benchmark import make_tables, measure
+from IM_compress import MIN_SIZE, PREFERENCE, compress
+from IM_json import EncodedListings, dumps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", nargs="+", type=int, default=[20, 200, 1000, 5000])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"encoders: {', '.join(PREFERENCE)}  (COMPRESS_MIN_SIZE={MIN_SIZE})")
+    print(f"{'tables':>7}{'encoding':>10}{'bytes':>10}{'ratio':>8}{'compress ms':>13}{'cached ms':>11}")
+    for count in args.tables:
+        tables = make_tables(count)
+        body = dumps(tables)
+        listings = EncodedListings()
+        for encoding in (None,) + PREFERENCE:
+            get = lambda: listings.get_encoded('"bench-1"', (), lambda: tables, encoding)  # noqa: E731
+            sent, used = get()  # 暖身（同時填入快取）
+            if encoding is None or used is None:
+                compress_ms = 0.0
+            else:
+                compress_ms = measure(lambda: compress(body, encoding), args.iterations)["mean_ms"]
+            cached_ms = measure(get, args.iterations)["mean_ms"]
+            print(f"{count:>7}{used or 'identity':>10}{len(sent):>10}{len(body) / len(sent):>7.1f}x"
+                  f"{compress_ms:>13.3f}{cached_ms:>11.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+sync / async MongoDB driver 的吞吐量與延遲比較
+
+對每一種 MONGO_DRIVER 各啟動一個 uvicorn（IM_db_server:app），
+再以 --concurrency 指定的同時連線數持續送請求 --duration 秒，
+輸出 requests/sec、p50、p99 與錯誤數。
+
+    pip install httpx
+    python benchmarks/driver_benchmark.py --concurrency 50 500 2000 --duration 10
+
+workload：
+- checkin（預設）：對隨機桌位交替送 POST /tables/{id}/checkin、/checkout（guests=1），
+  每個請求都會打到資料庫；409（滿桌 / 沒人）也算完成。結束後人數大致會回到原狀，
+  但仍會寫入資料庫，請對測試用的資料庫執行。
+- read：GET /tables（走記憶體快取，用來對照沒有資料庫往返時的上限）
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def start_server(driver: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, MONGO_DRIVER=driver)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "IM_db_server:app",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/tables")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.3)
+    raise RuntimeError(f"server at {base_url} did not become ready")
+
+
+def percentile_ms(sorted_latencies, q: float) -> float:
+    if not sorted_latencies:
+        return float("nan")
+    return sorted_latencies[min(len(sorted_latencies) - 1, int(q * len(sorted_latencies)))] * 1000
+
+
+async def run_load(base_url: str, workload: str, concurrency: int, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        table_ids = [t["table_id"] for t in (await client.get("/tables")).json()]
+        if workload == "checkin" and not table_ids:
+            raise RuntimeError("checkin workload needs at least one table")
+
+        latencies, errors = [], 0
+        stop_at = time.monotonic() + duration
+
+        async def worker():
+            nonlocal errors
+            action = "checkin"
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                try:
+                    if workload == "read":
+                        resp = await client.get("/tables")
+                    else:
+                        tid = random.choice(table_ids)
+                        resp = await client.post(f"/tables/{tid}/{action}", json={"guests": 1})
+                        action = "checkout" if action == "checkin" else "checkin"
+                    ok = resp.status_code in (200, 409)
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile_ms(latencies, 0.50),
+        "p99_ms": percentile_ms(latencies, 0.99),
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+        "errors": errors,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--drivers", nargs="+", default=["sync", "async"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[50, 500, 2000])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workload", choices=["checkin", "read"], default="checkin")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"{'driver':<7}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for driver in args.drivers:
+        server = start_server(driver, args.port)
+        try:
+            await wait_ready(base_url)
+            for concurrency in args.concurrency:
+                r = await run_load(base_url, args.workload, concurrency, args.duration)
+                print(f"{driver:<7}{concurrency:>8}{r['rps']:>10.1f}"
+                      f"{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errors']:>8}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+確認 IM_indexes.QUERIES 登記的查詢都有用到 index（explain() 裡沒有 COLLSCAN）
+
+    python benchmarks/index_check.py
+
+會先跑一次 ensure_indexes()，有查詢退化成全表掃描時以非 0 結束，
+讓 benchmark 流程直接失敗。
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from IM_indexes import ensure_indexes, find_collscans
+from IM_storage import create_table_store
+
+
+async def main() -> int:
+    store = create_table_store()
+    report = await ensure_indexes(store)
+    print("index report:", report)
+    problems = await find_collscans(store)
+    for p in problems:
+        print(f"COLLSCAN: {p['collection']} {p['filter']}")
+    print("OK：所有登記的查詢都有用到 index" if not problems else f"FAIL：{len(problems)} 個查詢沒有用到 index")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
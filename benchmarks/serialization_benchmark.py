@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+GET /tables 列表序列化的比較
+
+以 --tables 指定的桌位數產生假資料（格式同 format_table() 的輸出），比較三種做法每次回應的耗時：
+- response_model：原本的路徑，List[TableResponse] 逐筆驗證 → JSON 相容化 → json.dumps
+- dumps         ：IM_json.dumps 直接編碼（orjson，沒有安裝時為標準庫 json）
+- cached        ：IM_json.EncodedListings，同一個快取版本只編碼一次
+
+    python benchmarks/serialization_benchmark.py --tables 20 200 5000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from IM_db_server import TableResponse
+from IM_json import EncodedListings, dumps, orjson
+
+
+def make_tables(count: int) -> List[dict]:
+    now = datetime.now()
+    return [
+        {
+            "id": f"{i:024x}",
+            "table_id": f"t_{i:04d}",
+            "floor": f"{i % 3 + 1}F",
+            "index": i,
+            "name": f"A{i}",
+            "left": float(i % 40) * 30,
+            "top": float(i // 40) * 30,
+            "width": 60.0,
+            "height": 60.0,
+            "capacity": 4,
+            "occupied": i % 5,
+            "extraSeatLimit": 1,
+            "tags": ["窗邊", "插座"] if i % 2 else [],
+            "description": "靠窗四人桌",
+            "updateTime": now - timedelta(seconds=i),
+            "available": True,
+            "rev": i + 1,
+        }
+        for i in range(count)
+    ]
+
+
+def response_model_path(adapter: TypeAdapter, tables: List[dict]) -> bytes:
+    # 和 FastAPI 處理 response_model 的步驟相同：驗證 → 序列化成 JSON 相容的資料 → JSONResponse.render
+    validated = adapter.validate_python(tables)
+    content = adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def measure(fn, iterations: int) -> dict:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return {
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", nargs="+", type=int, default=[20, 200, 5000])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(List[TableResponse])
+    print(f"encoder: {'orjson' if orjson is not None else 'json (stdlib)'}")
+    print(f"{'tables':>7}{'path':>16}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'speedup':>9}")
+    for count in args.tables:
+        tables = make_tables(count)
+        listings = EncodedListings()
+        # 同一個快取版本底下，每次請求都是同樣的 (etag, 查詢參數)
+        paths = {
+            "response_model": lambda: response_model_path(adapter, tables),
+            "dumps": lambda: dumps(tables),
+            "cached": lambda: listings.get('"bench-1"', (), lambda: tables),
+        }
+        baseline = None
+        for name, fn in paths.items():
+            fn()  # 暖身（cached 也在這裡填入快取）
+            r = measure(fn, args.iterations)
+            baseline = baseline or r["mean_ms"]
+            print(f"{count:>7}{name:>16}{r['mean_ms']:>10.3f}{r['p50_ms']:>10.3f}"
+                  f"{r['p99_ms']:>10.3f}{baseline / r['mean_ms']:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+pytest 共用設定
+
+測試一律用 SQLite（暫存目錄裡的檔案），不需要 MongoDB 伺服器：
+IM_shared 在 import 時就依環境變數建立 store，所以要在任何 IM_ 模組被 import 之前設定好。
+
+    pip install -r requirements-dev.txt
+    python -m pytest -q
+"""
+
+import os
+import tempfile
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="im-tests-")
+os.environ["STORAGE_ENGINE"] = "sqlite"
+os.environ["SQLITE_PATH"] = os.path.join(_TMP, "tables.db")
+# 背景 task（對帳、入座歷史彙總）不在測試裡自動執行，需要時直接呼叫
+os.environ["STATS_RECONCILE_INTERVAL"] = "0"
+os.environ["OCCUPANCY_ROLLUP_INTERVAL"] = "0"
+
+
+def make_table(table_id: str, **fields) -> dict:
+    """POST /tables、PUT /tables/layout 可以直接送出的完整桌位資料"""
+    table = {
+        "table_id": table_id, "floor": "1F", "index": 1, "name": table_id,
+        "left": 50.0, "top": 50.0, "width": 2.0, "height": 1.0,
+        "capacity": 4, "occupied": 0, "extraSeatLimit": 0,
+        "tags": [], "description": "", "updateTime": None, "available": True,
+    }
+    table.update(fields)
+    return table
+
+
+@pytest.fixture(scope="session")
+def app_client():
+    # 整個測試只啟動一次（startup 的背景 task 綁在這個 TestClient 的 event loop 上）
+    from fastapi.testclient import TestClient
+    import IM_app
+
+    with TestClient(IM_app.app) as client:
+        yield client
+
+
+@pytest.fixture
+def client(app_client):
+    """每個測試從空的桌位 collection 開始"""
+    app_client.delete("/tables/clear")
+    return app_client
@@ -1,9 +1,54 @@
-import qrcode
+#!/usr/bin/env python3
+"""
+批次產生桌位 QR code（實作在 IM_qrcode）
 
-base_url = "https://你的網址/cafe-check-people.html?table_id="
-table_ids = ["A", "B", "C"]  # 每張桌子的代號
+    # 從資料庫讀桌位（連線設定同 server，見 IM_mongo / IM_storage）
+    python guanru/qrcode.py --out qr_codes
+    # 從前端匯出的 table_data.csv 讀桌位
+    python guanru/qrcode.py --csv kaiwei/table_data.csv --out qr_codes --base-url https://example.com/customer
 
-for table_id in table_ids:
-    full_url = base_url + table_id
-    img = qrcode.make(full_url)
-    img.save(f"{table_id}_QR.png")
+輸出 out 目錄：每張桌位一個 PNG、qr_manifest.json、可以直接列印的 qr_sheets.pdf。
+再執行一次時只會重做網址或圖片設定有變的桌位。
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# 這個檔名和 qrcode 套件同名：把本目錄從 sys.path 拿掉，才不會 import 到自己
+sys.path = [p for p in sys.path if os.path.abspath(p or ".") != HERE]
+sys.path.insert(0, os.path.dirname(HERE))
+
+from IM_qrcode import DEFAULT_STYLE, QR_BASE_URL, generate, tables_from_csv, tables_from_store  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="產生桌位 QR code 與列印用頁面")
+    parser.add_argument("--csv", help="table_data.csv 路徑；沒有指定時從資料庫讀取")
+    parser.add_argument("--out", default="qr_codes")
+    parser.add_argument("--base-url", default=QR_BASE_URL)
+    parser.add_argument("--workers", type=int, default=None, help="process 數，預設為 CPU 數")
+    parser.add_argument("--box-size", type=int, default=DEFAULT_STYLE.box_size)
+    parser.add_argument("--border", type=int, default=DEFAULT_STYLE.border)
+    parser.add_argument("--error-correction", choices="LMQH", default=DEFAULT_STYLE.error_correction)
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=5)
+    parser.add_argument("--no-sheets", action="store_true")
+    parser.add_argument("--force", action="store_true", help="忽略 manifest，全部重新產生")
+    args = parser.parse_args()
+
+    tables = tables_from_csv(args.csv) if args.csv else asyncio.run(tables_from_store())
+    style = DEFAULT_STYLE._replace(box_size=args.box_size, border=args.border,
+                                   error_correction=args.error_correction)
+    report = generate(tables, args.out, base_url=args.base_url, style=style, workers=args.workers,
+                      force=args.force, sheets=not args.no_sheets, columns=args.columns, rows=args.rows)
+    print(f"✅ rendered {len(report['rendered'])}, skipped {len(report['skipped'])}, "
+          f"removed {len(report['removed'])} → {os.path.abspath(args.out)}")
+    if report["sheets"]:
+        print(f"🖨️  {report['sheets']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -245,7 +245,8 @@ const KCafe = ({ hideMenu = false }) => {
   const [tables, setTables] = useState([]);
 
   useEffect(() => {
-    fetch("http://localhost:8002/tables")
+    // 只載入目前顯示的樓層
+    fetch("http://localhost:8002/tables?floor=1F")
       .then(res => res.json())
       .then(data => {
         const fetched = data;
@@ -309,29 +310,36 @@ const KCafe = ({ hideMenu = false }) => {
     }
   
 
-    await fetch("http://localhost:8002/tables/clear", {
-      method: "DELETE"
-    });
-
-    const results = await Promise.allSettled(
-        newTables.map(t =>
-          fetch("http://localhost:8002/tables", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify(t)
-          })
-        )
-      );
-
-      const failed = results.filter(r =>
-        r.status === "rejected" || (r.value && !r.value.ok)
-      );
-
-      if (failed.length > 0) {
-        alert(`匯入完成，但有 ${failed.length} 筆資料上傳失敗，請檢查格式或資料內容`);
-      } else {
-        alert(`匯入成功，共匯入 ${newTables.length} 筆桌位`);
+    // 畫面上先顯示的是匯入的配置，失敗時改回伺服器上實際的桌位
+    const reloadTables = () =>
+      fetch("http://localhost:8002/tables?floor=1F")
+        .then(res => res.json())
+        .then(setTables)
+        .catch(err => console.error("讀取資料失敗", err));
+
+    // 整份配置一次送出，由伺服器跟現有配置比對後只寫入有變動的桌位（入座人數不會被覆蓋）；
+    // 伺服器在同一個 transaction 裡寫入，回傳錯誤時桌位配置不會有任何變動（背景與商家設定在上面已經另外送出）
+    try {
+      const res = await fetch("http://localhost:8002/tables/layout", {
+        method: "PUT",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(newTables)
+      });
+      if (!res.ok) {
+        const errJson = await res.json().catch(() => null);
+        console.error("匯入失敗:", res.status, errJson);
+        alert("匯入失敗，請檢查格式或資料內容；桌位配置沒有寫入，背景與商家設定已更新");
+        reloadTables();
+        return;
       }
+      setTables(await res.json());
+      alert(`匯入成功，共匯入 ${newTables.length} 筆桌位`);
+    } catch (err) {
+      // 連線中斷時無法得知伺服器是否已經寫入，以伺服器上的資料為準
+      console.error("匯入失敗", err);
+      alert("匯入失敗：無法確認伺服器是否已寫入，畫面會重新載入目前的桌位配置");
+      reloadTables();
+    }
   };
 
 
@@ -615,7 +623,8 @@ const KCafe = ({ hideMenu = false }) => {
   const saveEditForm = () => {
     const name = editTableInput.name.trim() || editTableInput.name;
     const payload = { ...editTableInput, name };
-    delete payload.id;  
+    delete payload.id;
+    delete payload.rev;  // 伺服器自己遞增的 revision，不是可以修改的欄位
 
     fetch(`http://localhost:8002/tables/${payload.table_id}`, {
       method: "PATCH",
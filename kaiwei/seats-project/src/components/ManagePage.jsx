@@ -1,29 +1,65 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import '../styles/ManagePage.css';
 
 const ManagePage = () => {
   const [tables, setTables] = useState([]);
   const [stats, setStats] = useState({ totalTables: 0, totalCapacity: 0, totalOccupied: 0, occupancyRate: '0%' });
   const [lastUpdate, setLastUpdate] = useState('-');
+  // /tables/changes 回傳的 cursor，0 代表整批重新載入
+  const cursorRef = useRef(0);
 
   // 判斷是否為 guest 視角
   const isGuest = window.location.pathname.includes('/guest');
 
   useEffect(() => {
-    loadTables();
-    const interval = setInterval(loadTables, 10000);
-    return () => clearInterval(interval);
+    // 瀏覽器不支援 SSE 時退回每 10 秒輪詢
+    if (!window.EventSource) {
+      loadTables();
+      const interval = setInterval(syncChanges, 10000);
+      return () => clearInterval(interval);
+    }
+
+    const source = new EventSource('http://localhost:8002/tables/events');
+    const applyEvent = e => {
+      const event = JSON.parse(e.data);
+      setTables(prev => {
+        let next = event.type === 'clear' ? [] : prev.filter(t => t.table_id !== event.table_id);
+        const t = event.table;
+        if (event.type === 'upsert' && t.capacity > 0 && !t.table_id.startsWith('s_')) {
+          next = [...next, t].sort((a, b) => a.name.localeCompare(b.name));
+        }
+        updateStats(next);
+        return next;
+      });
+      setLastUpdate(new Date().toLocaleTimeString());
+    };
+    ['upsert', 'delete', 'clear'].forEach(type => source.addEventListener(type, applyEvent));
+    source.addEventListener('reload', () => loadTables());
+    // 連線（或斷線重連）成功時補抓漏掉的異動
+    source.onopen = () => syncChanges();
+    return () => source.close();
   }, []);
 
-  const loadTables = async () => {
+  const loadTables = () => {
+    cursorRef.current = 0;
+    return syncChanges();
+  };
+
+  // 只抓 cursor 之後新增 / 更新 / 刪除的桌位，套用到目前的列表上
+  const syncChanges = async () => {
     try {
-      const response = await fetch('http://localhost:8002/tables');
-      let data = await response.json();
-      data = data.filter(t => t.capacity > 0 && !t.table_id.startsWith('s_'));
-      data.sort((a, b) => a.name.localeCompare(b.name));
-      setTables(data);
+      const response = await fetch(`http://localhost:8002/tables/changes?since=${cursorRef.current}`);
+      const data = await response.json();
+      const visible = data.upserted.filter(t => t.capacity > 0 && !t.table_id.startsWith('s_'));
+      setTables(prev => {
+        const changed = new Set([...data.deleted, ...data.upserted.map(t => t.table_id)]);
+        const next = (data.reset ? visible : prev.filter(t => !changed.has(t.table_id)).concat(visible))
+          .sort((a, b) => a.name.localeCompare(b.name));
+        updateStats(next);
+        return next;
+      });
+      cursorRef.current = data.cursor;
       setLastUpdate(new Date().toLocaleTimeString());
-      updateStats(data);
     } catch (err) {
       console.error('載入失敗:', err);
     }
@@ -41,21 +77,17 @@ const ManagePage = () => {
       const table = tables.find(t => t.table_id === tableId);
       if (!table) return;
 
-      const maxCapacity = table.capacity + (table.extraSeatLimit || 0);
-      const newOccupied = Math.max(0, Math.min(maxCapacity, table.occupied + delta));
-      if (newOccupied === table.occupied) return;
-
-      const response = await fetch(`http://localhost:8002/tables/${tableId}`, {
-        method: 'PATCH',
+      // 由伺服器原子地加減人數，超過容量 / 低於 0 時回 409
+      const action = delta > 0 ? 'checkin' : 'checkout';
+      const response = await fetch(`http://localhost:8002/tables/${tableId}/${action}`, {
+        method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          occupied: newOccupied,
-          updateTime: delta > 0 ? new Date().toISOString() : table.updateTime
-        })
+        body: JSON.stringify({ guests: Math.abs(delta) })
       });
+      if (response.status === 409) return;
       if (!response.ok) throw new Error('更新失敗');
-
-      loadTables();
+      // 支援 SSE 時畫面會由 /tables/events 推播的事件更新
+      if (!window.EventSource) syncChanges();
     } catch (error) {
       alert('更新錯誤: ' + error.message);
     }
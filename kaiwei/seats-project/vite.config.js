@@ -2,6 +2,8 @@ import { defineConfig } from 'vite'
 import react from '@vitejs/plugin-react'
 
 // https://vite.dev/config/
-export default defineConfig({
+export default defineConfig(({ command }) => ({
   plugins: [react()],
-})
+  // 打包後由後端的 /app 提供（見 IM_static.py）
+  base: command === 'build' ? '/app/' : '/',
+}))
@@ -3,42 +3,44 @@
 Simple Local Server - 直接使用 MongoDB（與 IM_db_server 共用同一個資料庫）
 """
 
-from fastapi import FastAPI, HTTPException, Path
+from fastapi import APIRouter, FastAPI, HTTPException, Path, Query, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
-from pymongo import MongoClient
-from pymongo.collection import ReturnDocument
-from bson import ObjectId
 from datetime import datetime
-import urllib.parse
-
-app = FastAPI(title="Simple Cafe Seat Management (MongoDB)")
-
-# ===== 1. CORS 設定 =====
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+import os
+import sys
+
+# 共用模組（IM_events 等）放在專案根目錄
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from IM_events import SSE_HEADERS
+from IM_http import etag_matches, not_modified, weak_etag
+from IM_query import TableQuery
+from IM_compress import CompressionMiddleware
+from IM_singleflight import SingleFlightMiddleware
+from IM_json import dumps, json_response, listing_response
+from IM_occupancy import OccupancyChange, check_in, check_out
+from IM_spatial import GEOMETRY_FIELDS
+from IM_storage import DuplicateTableError
+from IM_metrics import REGISTRY as metrics, MetricsMiddleware
+from IM_static import ASSETS, HTML_CACHE, router as static_router
+
+# ===== 1. 共用資料層 =====
+# 資料庫連線（STORAGE_ENGINE / MONGO_DRIVER / MONGO_URI 等環境變數）、記憶體快取、入座統計、
+# SSE 推播都和 IM_db_server 的 /tables 路由共用同一份（見 IM_shared）
+from IM_shared import (
+    store, format_table, publish_upsert, startup, ops_router,
+    table_cache as seat_cache,
+    table_stats as seat_stats,
+    table_events as seat_events,
+    table_listings as seat_listings,
+    seat_index,
+    spatial_index,
+    reject_overlaps,
 )
 
-# ===== 2. MongoDB 連線設定 =====
-# 請確認以下參數與 IM_db_server.py 裡面完全一致
-username = urllib.parse.quote_plus("user_01")
-password = urllib.parse.quote_plus("ll75dbilab@2025")
-host = "140.112.110.129:27017"
-database = "dify_db_bilab_2025_accounting"
-MONGO_URI = f"mongodb://{username}:{password}@{host}/{database}"
-
-client = MongoClient(MONGO_URI)
-db = client[database]
-table_collection = db["im_final_project"]
-bg_collection    = db["background_settings"]  # 如果你之後還需要背景設定
-
-# ===== 3. Pydantic Schemas =====
+# ===== 2. Pydantic Schemas =====
 class SeatBase(BaseModel):
     # 前端送過來的欄位，和 IM_db_server 中 TableBase 幾乎一致
     table_id: str
@@ -83,47 +85,28 @@ class SeatUpdate(BaseModel):
     description: Optional[str]
     updateTime: Optional[datetime]
     available: Optional[bool]
+    # 前端會把讀到的整筆資料（含 rev）送回來；rev 由伺服器遞增，收到時忽略
+    rev: Optional[int] = None
 
     class Config:
         extra = "forbid"
 
 class SeatResponse(SeatBase):
     id: str  # MongoDB 的 _id 轉成字串
+    rev: Optional[int] = None  # 每次寫入遞增的 revision，差異同步用
 
-# ===== 4. Helper: 將 MongoDB doc 轉成前端回傳的格式 =====
-def format_table(table: dict) -> dict:
-    """
-    把 MongoDB 拿到的 document 轉成前端要的 JSON schema
-    - tags: 如果存成字串，就拆成 list；如果已經是 list，就直接回傳。
-    - id: 將原本的 _id 轉成字串
-    """
-    tags = table.get("tags", [])
-    if isinstance(tags, str):
-        tags = [tag.strip() for tag in tags.split(",") if tag.strip()]
-
-    return {
-        "id": str(table["_id"]),
-        "table_id": table["table_id"],
-        "floor": table["floor"],
-        "index": table["index"],
-        "name": table["name"],
-        "left": table["left"],
-        "top": table["top"],
-        "width": table["width"],
-        "height": table["height"],
-        "capacity": table["capacity"],
-        "occupied": table["occupied"],
-        "extraSeatLimit": table["extraSeatLimit"],
-        "tags": tags,
-        "description": table.get("description", ""),
-        "updateTime": table.get("updateTime"),
-        "available": table["available"]
-    }
+class SeatChanges(BaseModel):
+    reset: bool                   # True：upserted 是全部桌位，前端要整批替換
+    upserted: List[SeatResponse]  # 新增或更新過的桌位
+    deleted: List[str]            # 被刪除的 table_id
+    cursor: int                   # 下次請求帶回來的 since
 
-# ===== 5. API Routes =====
+# ===== 3. API Routes =====
+# /seats、/health、/customer、/management；單獨啟動時掛在最下面的 app，合併部署時由 IM_app 掛上
+router = APIRouter()
 
-@app.get("/")
-def read_root():
+@router.get("/")
+async def read_root():
     return {
         "message": "Simple Cafe Seat Management API (MongoDB)",
         "endpoints": {
@@ -135,107 +118,195 @@ def read_root():
         "note": "使用 MongoDB 作為後端儲存"
     }
 
-@app.get("/seats", response_model=List[SeatResponse])
-def get_all_seats():
+@router.get("/seats", response_model=List[SeatResponse])
+async def get_all_seats(request: Request, query: TableQuery = Depends()):
     """
-    取得所有桌位資料，轉成列表回傳
+    取得桌位資料，轉成列表回傳
+    - 可用 floor / kind / min_free_seats / tags / sort / bbox 篩選排序（見 IM_query.TableQuery）
+    - 回應帶 ETag（快取的 version），請求帶相同的 If-None-Match 時直接回 304
+    - 快取內的資料不再經過 response_model 驗證，直接送出編碼好的 JSON（見 IM_json）
+    - 依 Accept-Encoding 回傳 br / zstd / gzip 壓縮過的內容，同一個版本只壓縮一次（見 IM_compress）
     """
-    tables = table_collection.find()
-    return [format_table(t) for t in tables]
-
-@app.post("/seats", response_model=SeatResponse)
-def create_seat(seat: SeatBase):
+    etag = await seat_cache.etag()
+    if etag_matches(request, etag):
+        return not_modified(weak_etag(etag))
+    etag, tables = await seat_cache.snapshot()
+    return listing_response(request, seat_listings, etag, query.key,
+                            lambda: query.apply(query.candidates(tables, spatial_index)))
+
+@router.post("/seats", response_model=SeatResponse)
+async def create_seat(seat: SeatBase):
     """
-    新增一筆桌位資料到 MongoDB
+    新增一筆桌位資料到 MongoDB（跟同樓層其他桌位重疊時回 409）
     """
-    data = seat.dict()
-    result = table_collection.insert_one(data)
-    data["_id"] = result.inserted_id
-    return format_table(data)
-
-@app.patch("/seats/{table_id}", response_model=SeatResponse)
-def update_seat(table_id: str, seat: SeatUpdate):
+    reject_overlaps(seat.dict())
+    try:
+        formatted = format_table(await store.insert(seat.dict()))
+    except DuplicateTableError:
+        raise HTTPException(status_code=409, detail=f"Table '{seat.table_id}' already exists")
+    publish_upsert(formatted)
+    return formatted
+
+@router.patch("/seats/{table_id}", response_model=SeatResponse)
+async def update_seat(table_id: str, seat: SeatUpdate):
     """
     用 table_id 來更新某筆桌位資料(局部更新)
     """
-    updates = {k: v for k, v in seat.dict(exclude_unset=True).items()}
+    updates = {k: v for k, v in seat.dict(exclude_unset=True).items() if k != "rev"}
     if "updateTime" in updates and isinstance(updates["updateTime"], str):
         # 如果前端傳 updateTime 是字串，要轉一次
         try:
             updates["updateTime"] = datetime.fromisoformat(updates["updateTime"].replace('Z', '+00:00'))
         except:
             updates["updateTime"] = datetime.now()
-
-    result = table_collection.update_one(
-        {"table_id": table_id},
-        {"$set": updates}
-    )
-    if result.matched_count == 0:
+    if updates.keys() & GEOMETRY_FIELDS:
+        current = await seat_cache.get(table_id)
+        if current is not None:
+            reject_overlaps({**current, **updates}, ignore=(table_id,))
+
+    try:
+        updated = await store.update(table_id, updates)
+    except DuplicateTableError as e:
+        raise HTTPException(status_code=409, detail=f"Table '{e}' already exists")
+    if updated is None:
         raise HTTPException(status_code=404, detail="Table not found")
 
-    updated = table_collection.find_one({"table_id": table_id})
-    return format_table(updated)
+    updated = format_table(updated)
+    if updated["table_id"] != table_id:
+        # 改了 table_id：訂閱者要先刪掉舊的那張（舊的樓層以快取裡的為準）
+        old = seat_cache.remove(table_id)
+        seat_events.publish("delete", table_id, (old or updated)["floor"])
+    publish_upsert(updated)
+    return updated
 
-@app.delete("/seats/{table_id}")
-def delete_seat(table_id: str):
+@router.post("/seats/{table_id}/checkin", response_model=SeatResponse)
+async def checkin_seat(table_id: str, change: OccupancyChange):
+    """
+    入座：由資料庫原子地把 occupied 加上 guests
+    - 加完會超過 capacity（useExtraSeats 時為 capacity + extraSeatLimit）就回 409，不會超賣
+    - 回傳更新後的桌位
+    """
+    updated = format_table(await check_in(store, table_id, change.guests, change.useExtraSeats))
+    publish_upsert(updated)
+    return updated
+
+@router.post("/seats/{table_id}/checkout", response_model=SeatResponse)
+async def checkout_seat(table_id: str, change: OccupancyChange):
+    """
+    離座：原子地把 occupied 減掉 guests，目前人數不夠扣時回 409
+    """
+    updated = format_table(await check_out(store, table_id, change.guests))
+    publish_upsert(updated)
+    return updated
+
+@router.delete("/seats/{table_id}")
+async def delete_seat(table_id: str):
     """
     刪除指定 table_id 的桌位
     """
-    result = table_collection.delete_one({"table_id": table_id})
-    if result.deleted_count == 0:
+    deleted = await store.delete(table_id)
+    if deleted is None:
         raise HTTPException(status_code=404, detail=f"Table '{table_id}' not found")
+    seat_cache.remove(table_id)
+    seat_events.publish("delete", table_id, deleted.get("floor"))
     return {"message": f"Table '{table_id}' deleted successfully"}
 
-@app.get("/seats/table/{table_id}", response_model=SeatResponse)
-def get_seat_by_table_id(table_id: str):
+@router.get("/seats/events")
+async def stream_seat_events(request: Request, floor: Optional[str] = None):
+    """
+    SSE 推播：任何桌位新增 / 更新 / 刪除都會即時送出一個事件
+    - ?floor=1F 只收該樓層的事件
+    - 事件內容：{"id", "type": "upsert" | "delete" | "clear", "table_id", "floor", "table"}
+    """
+    return StreamingResponse(
+        seat_events.stream(request, floor),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+@router.get("/seats/changes", response_model=SeatChanges)
+async def get_seat_changes(since: int = 0):
+    """
+    差異同步：只回傳 rev > since 之後新增 / 更新 / 刪除的桌位
+    - 第一次（since=0）或 cursor 已經早於最近一次整批清空時，reset=True 並回傳全部桌位
+    - 前端保存回傳的 cursor，下次帶回來當 since
+    """
+    changes = await store.changes_since(since)
+    changes["upserted"] = [format_table(t) for t in changes["upserted"]]
+    return json_response(dumps(changes))
+
+@router.get("/seats/table/{table_id}", response_model=SeatResponse)
+async def get_seat_by_table_id(table_id: str):
     """
     依 table_id 查單筆桌位
     """
-    table = table_collection.find_one({"table_id": table_id})
+    table = await seat_cache.get(table_id)
     if not table:
         raise HTTPException(status_code=404, detail=f"Table '{table_id}' not found")
-    return format_table(table)
+    return table
 
-@app.get("/seats/available")
-def get_available_seats():
+@router.get("/seats/available")
+async def get_available_seats(request: Request, query: TableQuery = Depends()):
     """
-    取得所有 available 且 capacity > 0 的桌位
+    取得所有 available 且 capacity > 0 的桌位（篩選參數、ETag 同 /seats）
     """
-    tables = table_collection.find({
-        "available": True,
-        "capacity": {"$gt": 0}
-    })
-    return [format_table(t) for t in tables]
+    etag = await seat_cache.etag()
+    if etag_matches(request, etag):
+        return not_modified(weak_etag(etag))
+    etag, tables = await seat_cache.snapshot()
+    return listing_response(
+        request, seat_listings, etag, ("available",) + query.key,
+        lambda: query.apply([t for t in query.candidates(tables, spatial_index)
+                             if t["available"] is True and t["capacity"] > 0]),
+    )
 
-@app.get("/health")
-def health_check():
+@router.get("/seats/recommend")
+async def recommend_seats(
+    request: Request,
+    party: int = Query(..., ge=1),
+    tags: Optional[str] = None,
+    floor: Optional[str] = None,
+    limit: int = Query(5, ge=1, le=50),
+):
     """
-    健康檢查：回傳資料庫連線狀態以及桌位總數與座位使用狀況
+    依人數與偏好推薦桌位（見 IM_recommend）
+    - party=4：人數，只推薦空位（capacity + extraSeatLimit - occupied）坐得下的桌子
+    - tags=插座,窗邊：偏好標籤（最多 3 個），符合越多越前面；floor=1F 只看某一層
+    - 排序：符合的標籤數 → 浪費的座位數 → 桌名
+    - 從記憶體索引查詢，不掃過全部桌位；ETag 同 /seats
     """
-    count      = table_collection.count_documents({})
-    occupied_total = sum(t.get("occupied", 0) for t in table_collection.find())
-    capacity_total = sum(
-        t.get("capacity", 0) + t.get("extraSeatLimit", 0)
-        for t in table_collection.find()
-    )
+    etag = await seat_cache.etag()
+    if etag_matches(request, etag):
+        return not_modified(weak_etag(etag))
+    wanted = [t.strip() for t in tags.split(",") if t.strip()] if tags else []
+    results = seat_index.recommend(party, wanted, floor, limit)
+    return json_response(dumps({"party": party, "floor": floor, "tags": wanted, "results": results}), etag=etag)
+
+@router.post("/seats/cache/refresh")
+async def refresh_seat_cache():
+    """
+    手動重新載入記憶體快取（例如直接改過資料庫之後）
+    - 環境變數 TABLE_CACHE_MAX_AGE 控制快取最久多少秒會自動重新載入一次
+    """
+    count = await seat_cache.load()
+    return {"message": f"Reloaded {count} tables"}
+
+@router.get("/health")
+async def health_check():
+    """
+    健康檢查：只回報服務還活著，桌位總數與座位使用狀況直接取自 /stats 的累計值（不掃資料庫）
+    """
+    totals = seat_stats.snapshot()["store"]
     return {
         "status": "healthy",
-        "database": "MongoDB",
-        "count": count,
-        "occupied_total": occupied_total,
-        "capacity_total": capacity_total
+        "database": store.engine,
+        "count": totals["tables"],
+        "occupied_total": totals["occupied"],
+        "capacity_total": totals["seats"]
     }
 
-# ===== 6. Serve HTML (Customer & Management Interfaces) =====
-
-@app.get("/customer", response_class=HTMLResponse)
-def serve_customer_interface():
-    """
-    客戶端網頁：點到 /customer 時回傳內嵌的 HTML
-    （此段內容和原本 simple_local_server.py 幾乎完全相同，只是把 fetch 的 URL 改成 /seats，
-     且在載入資料後先做 name 排序。）
-    """
-    return """
+# ===== 4. Serve HTML (Customer & Management Interfaces) =====
+CUSTOMER_HTML = """
 <!DOCTYPE html>
 <html lang="zh-TW">
 <head>
@@ -297,13 +368,9 @@ def serve_customer_interface():
         || new URLSearchParams(window.location.search).get('table');
 
         async function loadTables() {
-            const response = await fetch(API_URL);
-            const data = await response.json();
-            tables = data.filter(
-                t => t.capacity > 0 && !t.table_id.toLowerCase().startsWith('s_')
-            );
-
-            tables.sort((a, b) => String(a.name).localeCompare(String(b.name)));
+            // 篩選（可入座的桌子）與依名稱排序都在伺服器端完成
+            const response = await fetch(`${API_URL}?kind=table&sort=name`);
+            tables = await response.json();
             populateTableSelect();
 
             if (preselectTableIdParam) {
@@ -422,16 +489,20 @@ def serve_customer_interface():
             btn.textContent = '處理中...';
             
             try {
-                const newOccupied = (selectedTable.occupied || 0) + guestCount;
-                const response = await fetch(`${API_URL}/${selectedTable.table_id}`, {
-                    method: 'PATCH',
+                // 由伺服器原子地加上人數，座位不夠時回 409（避免兩組客人同時搶到最後的位子）
+                const response = await fetch(`${API_URL}/${selectedTable.table_id}/checkin`, {
+                    method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
                     body: JSON.stringify({
-                        occupied: newOccupied,
-                        updateTime: new Date().toISOString()
+                        guests: guestCount,
+                        useExtraSeats: document.getElementById('extraChair').value === 'yes'
                     })
                 });
                 
+                if (response.status === 409) {
+                    loadTables();
+                    throw new Error('座位已被其他客人選走，請重新選擇');
+                }
                 if (!response.ok) throw new Error('更新失敗');
                 
                 showResult(`✅ 入座成功！桌子: ${selectedTable.name}，人數: ${guestCount} 人`, 'success');
@@ -463,14 +534,20 @@ def serve_customer_interface():
 </html>
     """
 
-@app.get("/management", response_class=HTMLResponse)
-def serve_management_interface():
+ASSETS.add("/customer", CUSTOMER_HTML, "text/html; charset=utf-8", HTML_CACHE)
+
+@router.get("/customer", response_class=HTMLResponse)
+async def serve_customer_interface(request: Request):
     """
-    管理員介面：回傳內嵌 HTML，顯示所有桌位狀態並可 + / − 入座人數
-    （此段內容和原本 simple_local_server.py 幾乎完全相同，只是將 fetch URL 改成 /seats，
-     並在取得資料後先做 name 排序。）
+    客戶端網頁：點到 /customer 時回傳內嵌的 HTML
+    - 桌位清單由 GET /seats?kind=table&sort=name 取得，篩選與依名稱排序都在伺服器端完成
+    - 網址帶 ?table_id=（桌上的 QR code）時直接選好那張桌子
+    - 入座呼叫 POST /seats/{table_id}/checkin，由伺服器原子地加上人數，座位不夠時回 409 並重新載入
+    - 內容在啟動時就壓縮好（gzip / brotli），帶 ETag 與 Cache-Control，重複開啟時回 304（見 IM_static）
     """
-    return """
+    return ASSETS.response(request, "/customer")
+
+MANAGEMENT_HTML = """
 <!DOCTYPE html>
 <html lang="zh-TW">
 <head>
@@ -540,15 +617,28 @@ def serve_management_interface():
     <script>
         const API_URL = "/seats";
         let tables = [];
+        let cursor = 0;  // /seats/changes 回傳的 cursor，0 代表整批重新載入
 
-        async function loadTables() {
+        function loadTables() {
+            cursor = 0;
+            return syncChanges();
+        }
+
+        async function syncChanges() {
             try {
-                const response = await fetch(API_URL);
+                const response = await fetch(`${API_URL}/changes?since=${cursor}`);
                 const data = await response.json();
                 // 只顯示 capacity > 0、且不是 seat (table_id 不以 "s_" 開頭)
-                tables = data.filter(t => t.capacity > 0 && !t.table_id.startsWith('s_'));
+                const visible = data.upserted.filter(t => t.capacity > 0 && !t.table_id.startsWith('s_'));
+                if (data.reset) {
+                    tables = visible;
+                } else {
+                    const changed = new Set([...data.deleted, ...data.upserted.map(t => t.table_id)]);
+                    tables = tables.filter(t => !changed.has(t.table_id)).concat(visible);
+                }
+                cursor = data.cursor;
                 
-                // ＝ 新增：依照 name 欄位做排序 ＝
+                // 差異合併進目前的清單後依名稱排序
                 tables.sort((a, b) => a.name.localeCompare(b.name));
                 
                 renderTables();
@@ -633,25 +723,17 @@ def serve_management_interface():
                 const table = tables.find(t => t.table_id === tableId);
                 if (!table) return;
 
-                const currentOccupied = table.occupied || 0;
-                const maxCapacity = (table.capacity || 0) + (table.extraSeatLimit || 0);
-                const newOccupied = Math.max(0, Math.min(maxCapacity, currentOccupied + delta));
-                
-                if (newOccupied === currentOccupied) return;
-
-                const response = await fetch(`${API_URL}/${tableId}`, {
-                    method: 'PATCH',
+                const action = delta > 0 ? 'checkin' : 'checkout';
+                const response = await fetch(`${API_URL}/${tableId}/${action}`, {
+                    method: 'POST',
                     headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify({
-                        occupied: newOccupied,
-                        updateTime: delta > 0 ? new Date().toISOString() : table.updateTime
-                    })
+                    body: JSON.stringify({ guests: Math.abs(delta) })
                 });
 
+                if (response.status === 409) return;  // 已經滿桌 / 已經沒人
                 if (!response.ok) throw new Error('更新失敗');
 
-                table.occupied = newOccupied;
-                if (delta > 0) table.updateTime = new Date().toISOString();
+                Object.assign(table, await response.json());
                 renderTables();
                 updateStats();
 
@@ -661,16 +743,78 @@ def serve_management_interface():
             }
         }
 
-        window.addEventListener('DOMContentLoaded', () => {
-            loadTables();
-            setInterval(loadTables, 10000); // 每 10 秒自動刷新
-        });
+        function applySeatEvent(e) {
+            const event = JSON.parse(e.data);
+            if (event.type === 'clear') {
+                tables = [];
+            } else {
+                tables = tables.filter(t => t.table_id !== event.table_id);
+                const t = event.table;
+                if (event.type === 'upsert' && t.capacity > 0 && !t.table_id.startsWith('s_')) {
+                    tables.push(t);
+                    tables.sort((a, b) => a.name.localeCompare(b.name));
+                }
+            }
+            renderTables();
+            updateStats();
+            document.getElementById('lastUpdate').textContent = `最近入座: ${new Date().toLocaleTimeString()}`;
+        }
+
+        function subscribeSeatEvents() {
+            // 瀏覽器不支援 SSE 時退回每 10 秒輪詢（只抓有變動的桌位）
+            if (!window.EventSource) {
+                loadTables();
+                setInterval(syncChanges, 10000);
+                return;
+            }
+            const source = new EventSource(`${API_URL}/events`);
+            ['upsert', 'delete', 'clear'].forEach(type => source.addEventListener(type, applySeatEvent));
+            source.addEventListener('reload', () => loadTables());
+            // 斷線後 EventSource 會自動重連，重連成功時補抓斷線期間的異動
+            source.onopen = () => syncChanges();
+        }
+
+        window.addEventListener('DOMContentLoaded', subscribeSeatEvents);
     </script>
 </body>
 </html>
     """
 
-# ===== 7. 啟動 Uvicorn =====
+ASSETS.add("/management", MANAGEMENT_HTML, "text/html; charset=utf-8", HTML_CACHE)
+
+@router.get("/management", response_class=HTMLResponse)
+async def serve_management_interface(request: Request):
+    """
+    管理員介面：回傳內嵌 HTML，顯示所有桌位狀態並可 + / − 入座人數
+    - + / − 呼叫 POST /seats/{table_id}/checkin、checkout，超過容量或低於 0 時由伺服器回 409
+    - 訂閱 GET /seats/events（SSE）即時套用每一筆異動；連線（重連）時用 GET /seats/changes?since=
+      補抓期間的差異，收到 reload 時整批重新載入；瀏覽器不支援 SSE 時每 10 秒輪詢 /seats/changes
+    - 差異是合併進目前的清單，所以合併後在瀏覽器端依名稱排序
+    - 內容在啟動時就壓縮好（gzip / brotli），帶 ETag 與 Cache-Control，重複開啟時回 304（見 IM_static）
+    """
+    return ASSETS.response(request, "/management")
+
+# ===== 5. 單獨啟動用的 app =====
+app = FastAPI(title="Simple Cafe Seat Management (MongoDB)")
+# 同時到達、內容相同的 GET 只交給路由處理一次（見 IM_singleflight）；要在 CORS 裡面，所以先加
+app.add_middleware(SingleFlightMiddleware)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+# 其他 JSON 回應超過 COMPRESS_MIN_SIZE 時依 Accept-Encoding 壓縮
+app.add_middleware(CompressionMiddleware)
+# 請求數 / 延遲 / 處理中的請求數，由 GET /metrics 輸出
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+app.include_router(router)
+app.include_router(ops_router)
+app.include_router(static_router)
+app.on_event("startup")(startup)
+
+# ===== 6. 啟動 Uvicorn =====
 if __name__ == "__main__":
     import uvicorn
     print("🚀 Starting simple local server (using MongoDB)...")
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from conftest import make_table
+from IM_analytics import STORE_KEY, OccupancyLog, rollup_hour, summarize
+from IM_sqlite import SqliteTableStore
+
+H10 = datetime(2026, 3, 2, 10)
+H11 = datetime(2026, 3, 2, 11)
+
+
+def _event(minute, table_id, occupied, delta, floor="1F", seats=4, hour=H10):
+    return {"ts": hour.replace(minute=minute), "table_id": table_id, "floor": floor,
+            "occupied": occupied, "delta": delta, "seats": seats}
+
+
+def _by_level(docs):
+    return {(d["level"], d["key"]): d for d in docs}
+
+
+def test_rollup_hour_is_time_weighted():
+    levels = {"A1": ["1F", 0, 4], "B1": ["2F", 0, 4]}
+    events = [_event(15, "A1", 2, 2), _event(45, "A1", 0, -2)]
+
+    docs, end_levels = rollup_hour(H10, H11, levels, events)
+    docs = _by_level(docs)
+
+    a1 = docs[("table", "A1")]
+    assert a1["occupied_seconds"] == 2 * 1800
+    assert a1["seat_seconds"] == 4 * 3600
+    assert (a1["arrivals"], a1["peak_occupied"], a1["peak_utilization"]) == (2, 2, 0.5)
+    assert ("table", "B1") not in docs  # 沒有事件也沒有人坐
+    assert docs[("floor", "2F")]["seat_seconds"] == 4 * 3600
+    store = docs[("store", STORE_KEY)]
+    assert (store["seat_seconds"], store["peak_utilization"]) == (8 * 3600, 0.25)
+    assert end_levels == levels
+
+
+def test_rollup_hour_moves_seats_between_floors():
+    levels = {"A1": ["1F", 2, 4]}
+    docs, end_levels = rollup_hour(H10, H11, levels, [_event(30, "A1", 2, 0, floor="2F")])
+    docs = _by_level(docs)
+    assert docs[("floor", "1F")]["occupied_seconds"] == 2 * 1800
+    assert docs[("floor", "2F")]["occupied_seconds"] == 2 * 1800
+    assert docs[("floor", "2F")]["arrivals"] == 0
+    assert end_levels == {"A1": ["2F", 2, 4]}
+
+
+def test_summarize_buckets_by_day():
+    hourly = [
+        {"hour": H10, "seconds": 3600, "occupied_seconds": 3600, "seat_seconds": 14400,
+         "peak_occupied": 2, "peak_utilization": 0.5, "arrivals": 2},
+        {"hour": H11, "seconds": 3600, "occupied_seconds": 10800, "seat_seconds": 14400,
+         "peak_occupied": 4, "peak_utilization": 1.0, "arrivals": 3},
+    ]
+    series, total = summarize(hourly, "day")
+    assert series == [{"start": "2026-03-02T00:00:00", "avgUtilization": 0.5, "avgOccupied": 2.0,
+                       "peakUtilization": 1.0, "peakOccupied": 4, "arrivals": 5}]
+    assert total == {k: v for k, v in series[0].items() if k != "start"}
+
+
+def test_apply_records_only_occupancy_changes():
+    log = OccupancyLog(store=None, retention_days=1)
+    table = make_table("A1", capacity=4)
+    log.apply(None, table)
+    log.apply(table, {**table, "name": "改名"})        # 座位數、人數都沒變
+    log.apply(table, {**table, "occupied": 3})
+    log.apply(None, make_table("s_plant", capacity=0))  # 裝飾物件不列入
+
+    events = list(log._pending)
+    assert [(e["occupied"], e["delta"], e["seats"]) for e in events] == [(0, 0, 4), (3, 3, 4)]
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    return SqliteTableStore(str(tmp_path / "analytics.db"))
+
+
+def test_rollup_and_query_through_store(sqlite_store):
+    async def scenario():
+        log = OccupancyLog(sqlite_store, retention_days=1)
+        await log.ensure_storage()
+        await sqlite_store.append_occupancy_events([_event(30, "A1", 4, 4)])
+        # 上次彙總停在 10 點：這次從 10 點補到 11:30
+        await sqlite_store.save_occupancy_state({"hour": H10, "levels": {"A1": ["1F", 0, 4]}})
+        await log.rollup(now=H11.replace(minute=30))
+        return await log.query("table", "A1", H10, H11.replace(minute=30))
+
+    result = asyncio.run(scenario())
+    assert [p["start"] for p in result["series"]] == ["2026-03-02T10:00:00", "2026-03-02T11:00:00"]
+    assert result["series"][1]["avgUtilization"] == 1.0
+    assert result["summary"]["arrivals"] == 4
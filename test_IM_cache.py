@@ -0,0 +1,55 @@
+import asyncio
+
+from IM_cache import TableCache
+
+
+class _SlowStore:
+    """find_all() 回傳呼叫當下的內容，但要等 release 之後才回來"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.reading = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def find_all(self, primary: bool = False):
+        # 快取是增量更新的基準，一定要讀 primary
+        assert primary
+        snapshot = [dict(t) for t in self.tables]
+        self.reading.set()
+        await self.release.wait()
+        return snapshot
+
+
+def test_load_keeps_writes_made_while_reading():
+    async def scenario():
+        store = _SlowStore([{"table_id": "A1", "rev": 1}, {"table_id": "A2", "rev": 2}])
+        cache = TableCache(store, formatter=dict)
+        load = asyncio.ensure_future(cache.load())
+        await store.reading.wait()
+
+        cache.put({"table_id": "A1", "rev": 3})
+        cache.put({"table_id": "A3", "rev": 4})
+        cache.remove("A2")
+        store.release.set()
+        await load
+
+        tables = {t["table_id"]: t["rev"] for t in await cache.all()}
+        assert tables == {"A1": 3, "A3": 4}
+
+    asyncio.run(scenario())
+
+
+def test_load_prefers_newer_rev_from_database():
+    async def scenario():
+        store = _SlowStore([{"table_id": "A1", "rev": 5}])
+        cache = TableCache(store, formatter=dict)
+        load = asyncio.ensure_future(cache.load())
+        await store.reading.wait()
+
+        cache.put({"table_id": "A1", "rev": 4})
+        store.release.set()
+        await load
+
+        assert (await cache.get("A1"))["rev"] == 5
+
+    asyncio.run(scenario())
@@ -0,0 +1,27 @@
+from conftest import make_table
+
+
+def _seed(client, count=20):
+    for i in range(count):
+        client.post("/tables", json=make_table(f"A{i}", left=5.0 + i * 5, description="靠窗座位" * 5))
+
+
+def test_compressed_and_identity_share_a_weak_etag(client):
+    _seed(client)
+    gzipped = client.get("/tables", headers={"Accept-Encoding": "gzip"})
+    plain = client.get("/tables", headers={"Accept-Encoding": "identity"})
+
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    assert gzipped.headers["etag"].startswith("W/")
+    assert gzipped.headers["etag"] == plain.headers["etag"]
+
+
+def test_not_modified_sends_vary(client):
+    _seed(client)
+    etag = client.get("/seats", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+
+    resp = client.get("/seats", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    assert "Accept-Encoding" in resp.headers["vary"]
@@ -0,0 +1,82 @@
+from conftest import make_table
+
+
+def test_patch_accepts_object_read_back_with_rev(client):
+    # 前端編輯表單把 GET 拿到的整筆資料（只拿掉 id）PATCH 回來，裡面帶著 rev
+    created = client.post("/tables", json=make_table("A1")).json()
+    assert created["rev"] is not None
+    payload = {k: v for k, v in created.items() if k != "id"}
+    payload["name"] = "窗邊 A1"
+
+    resp = client.patch("/tables/A1", json=payload)
+    assert resp.status_code == 200
+    assert resp.json()["name"] == "窗邊 A1"
+    # rev 由伺服器遞增，不會被送來的值蓋掉
+    assert resp.json()["rev"] > created["rev"]
+
+
+def test_seat_patch_accepts_rev(client):
+    created = client.post("/seats", json=make_table("S1")).json()
+    payload = {k: v for k, v in created.items() if k != "id"}
+    payload["rev"] = 0
+
+    resp = client.patch("/seats/S1", json=payload)
+    assert resp.status_code == 200
+    assert resp.json()["rev"] > created["rev"]
+
+
+def test_rename_shows_up_as_delete_in_changes(client):
+    client.post("/tables", json=make_table("A1"))
+    cursor = client.get("/tables/changes").json()["cursor"]
+
+    assert client.patch("/tables/A1", json={**make_table("A9"), "left": 50.0}).status_code == 200
+
+    changes = client.get("/tables/changes", params={"since": cursor}).json()
+    assert changes["reset"] is False
+    assert [t["table_id"] for t in changes["upserted"]] == ["A9"]
+    assert changes["deleted"] == ["A1"]
+
+
+def test_rename_publishes_delete_for_old_id(client, monkeypatch):
+    import IM_shared
+
+    client.post("/tables", json=make_table("A1"))
+    published = []
+    monkeypatch.setattr(IM_shared.table_events, "publish",
+                        lambda event, table_id=None, floor=None, table=None: published.append((event, table_id, floor)))
+
+    client.patch("/tables/A1", json=make_table("A9", floor="2F"))
+    assert published == [("delete", "A1", "1F"), ("upsert", "A9", "2F")]
+
+
+def test_seat_health_reports_configured_engine(client):
+    assert client.get("/health").json()["database"] == "SQLite"
+
+
+def test_changes_since_returns_only_newer_revisions(client):
+    client.post("/tables", json=make_table("A1"))
+    client.post("/tables", json=make_table("A2", left=10.0))
+    first = client.get("/tables/changes").json()
+    assert first["reset"] is True
+    assert sorted(t["table_id"] for t in first["upserted"]) == ["A1", "A2"]
+
+    client.post("/tables/A1/checkin", json={"guests": 1})
+    client.delete("/tables/A2")
+    delta = client.get("/tables/changes", params={"since": first["cursor"]}).json()
+    assert delta["reset"] is False
+    assert [(t["table_id"], t["occupied"]) for t in delta["upserted"]] == [("A1", 1)]
+    assert delta["deleted"] == ["A2"]
+
+    idle = client.get("/seats/changes", params={"since": delta["cursor"]}).json()
+    assert (idle["upserted"], idle["deleted"], idle["cursor"]) == ([], [], delta["cursor"])
+
+
+def test_changes_since_resets_after_clear(client):
+    client.post("/tables", json=make_table("A1"))
+    cursor = client.get("/tables/changes").json()["cursor"]
+    client.delete("/tables/clear")
+    client.post("/tables", json=make_table("B1"))
+
+    changes = client.get("/tables/changes", params={"since": cursor}).json()
+    assert changes["reset"] is True
+    assert [t["table_id"] for t in changes["upserted"]] == ["B1"]
@@ -0,0 +1,42 @@
+import asyncio
+import json
+from datetime import datetime
+
+from IM_events import TableEventBroker, format_sse
+
+
+def test_subscribers_only_get_their_floor():
+    async def scenario():
+        broker = TableEventBroker()
+        first, second = broker.subscribe("1F"), broker.subscribe("2F")
+        everything = broker.subscribe()
+
+        broker.publish("upsert", "A1", "1F", {"table_id": "A1"})
+        broker.publish("clear")
+        await asyncio.sleep(0)
+
+        def drain(sub):
+            return [sub.queue.get_nowait()["type"] for _ in range(sub.queue.qsize())]
+        return drain(first), drain(second), drain(everything)
+
+    assert asyncio.run(scenario()) == (["upsert", "clear"], ["clear"], ["upsert", "clear"])
+
+
+def test_slow_subscriber_drops_oldest_events():
+    async def scenario():
+        broker = TableEventBroker(queue_size=2)
+        sub = broker.subscribe()
+        for table_id in ("A1", "A2", "A3"):
+            broker.publish("delete", table_id)
+        await asyncio.sleep(0)
+        return [sub.queue.get_nowait()["table_id"] for _ in range(sub.queue.qsize())]
+
+    assert asyncio.run(scenario()) == ["A2", "A3"]
+
+
+def test_format_sse():
+    event = {"id": 7, "type": "upsert", "table_id": "A1", "floor": "1F",
+             "table": {"updateTime": datetime(2026, 3, 2, 10)}}
+    head, data = format_sse(event).rstrip("\n").split("\ndata: ")
+    assert head == "id: 7\nevent: upsert"
+    assert json.loads(data)["table"]["updateTime"] == "2026-03-02T10:00:00"
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from IM_indexes import INDEXES, QUERIES, ensure_indexes, find_collscans  # noqa: E402
+from IM_storage import MongoTableStore  # noqa: E402
+
+
+@pytest.fixture
+def mongo_store():
+    return MongoTableStore(mongomock.MongoClient()["im_test"])
+
+
+def _fake_explain(store):
+    """
+    mongomock 沒有 explain：查詢條件包含某個 index 的第一個欄位時選 IXSCAN，否則 COLLSCAN。
+    回傳的形狀跟新版 MongoDB 一樣（winningPlan.queryPlan 底下是 FETCH → IXSCAN）
+    """
+    async def explain_find(target, query):
+        indexes = await store.index_information(target)
+        if any(info["key"][0][0] in query for info in indexes.values()):
+            plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+        else:
+            plan = {"stage": "COLLSCAN"}
+        return {"queryPlanner": {"winningPlan": {"queryPlan": plan}}}
+    return explain_find
+
+
+def test_ensure_indexes_creates_declared_indexes(mongo_store):
+    async def scenario():
+        report = await ensure_indexes(mongo_store)
+        expected = [f"{target}.{spec.name}" for target, specs in INDEXES.items() for spec in specs]
+        assert report == {"created": expected, "mismatched": [], "extra": [], "failed": []}
+
+        info = mongo_store.tables.index_information()
+        assert info["table_id_unique"]["unique"]
+        assert info["floor_available_capacity"]["key"] == [("floor", 1), ("available", 1), ("capacity", 1)]
+
+        # 第二次啟動時沒有任何變動
+        assert await ensure_indexes(mongo_store) == {"created": [], "mismatched": [], "extra": [], "failed": []}
+
+    asyncio.run(scenario())
+
+
+def test_ensure_indexes_reports_drift(mongo_store):
+    async def scenario():
+        await ensure_indexes(mongo_store)
+        # 被手動刪掉的 index 會補建；同名但設定不同、沒有登記的 index 只回報，不動它
+        mongo_store.tables.drop_index("rev")
+        mongo_store.backgrounds.drop_index("floor_id_unique")
+        mongo_store.backgrounds.create_index([("floor_id", 1)], name="floor_id_unique")
+        mongo_store.tables.create_index([("name", 1)], name="name")
+
+        report = await ensure_indexes(mongo_store)
+        assert report["created"] == ["tables.rev"]
+        assert report["mismatched"] == ["backgrounds.floor_id_unique"]
+        assert report["extra"] == ["tables.name"]
+        assert report["failed"] == []
+        assert not mongo_store.backgrounds.index_information()["floor_id_unique"].get("unique")
+
+    asyncio.run(scenario())
+
+
+def test_ensure_indexes_reports_failed_unique_index(mongo_store):
+    async def scenario():
+        # 既有資料的 table_id 重複時 unique index 建不起來
+        mongo_store.tables.insert_many([{"table_id": "A1"}, {"table_id": "A1"}])
+        report = await ensure_indexes(mongo_store)
+        assert [f["index"] for f in report["failed"]] == ["tables.table_id_unique"]
+        assert "tables.table_id_unique" not in report["created"]
+
+    asyncio.run(scenario())
+
+
+def test_find_collscans_flags_queries_without_index(mongo_store, monkeypatch):
+    monkeypatch.setattr(mongo_store, "explain_find", _fake_explain(mongo_store))
+
+    async def scenario():
+        # 還沒建 index：每個登記的查詢都是全表掃描
+        assert len(await find_collscans(mongo_store)) == len(QUERIES)
+
+        await ensure_indexes(mongo_store)
+        assert await find_collscans(mongo_store) == []
+
+        mongo_store.tombstones.drop_index("rev")
+        assert await find_collscans(mongo_store) == [{"collection": "tombstones", "filter": {"rev": {"$gt": 0}}}]
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+import gzip
+import json
+from datetime import datetime
+
+from IM_json import EncodedListings, dumps
+
+
+def test_dumps_matches_fastapi_datetime_format():
+    assert json.loads(dumps({"t": datetime(2026, 3, 2, 10, 5), "name": "窗邊"})) == \
+        {"t": "2026-03-02T10:05:00", "name": "窗邊"}
+
+
+def test_listings_encode_once_per_version():
+    listings = EncodedListings(max_entries=2)
+    builds = []
+
+    def build(value):
+        def run():
+            builds.append(value)
+            return [value]
+        return run
+
+    assert listings.get('"v1"', "a", build(1)) == b"[1]"
+    assert listings.get('"v1"', "a", build(2)) == b"[1]"
+    listings.get('"v1"', "b", build(3))
+    listings.get('"v1"', "c", build(4))           # 超過 max_entries，丟掉最久沒用到的 a
+    assert listings.get('"v1"', "a", build(5)) == b"[5]"
+    assert listings.get('"v2"', "a", build(6)) == b"[6]"  # 換版本後整份重建
+    assert builds == [1, 3, 4, 5, 6]
+
+
+def test_listings_cache_compressed_variants():
+    listings = EncodedListings(min_compress_size=10)
+    rows = [{"table_id": f"A{i}", "name": "窗邊座位"} for i in range(50)]
+
+    body, encoding = listings.get_encoded('"v1"', "all", lambda: rows, "gzip")
+    assert encoding == "gzip"
+    assert json.loads(gzip.decompress(body)) == rows
+    again, _ = listings.get_encoded('"v1"', "all", lambda: [], "gzip")
+    assert again is body
+
+    small, encoding = EncodedListings(min_compress_size=10_000).get_encoded('"v1"', "all", lambda: rows, "gzip")
+    assert encoding is None and json.loads(small) == rows
@@ -0,0 +1,94 @@
+import asyncio
+
+from conftest import make_table
+from IM_layout import diff_layout, parse_layout
+
+
+def test_diff_layout_inserts_updates_and_deletes():
+    current = [make_table("A1"), make_table("A2"), make_table("A3")]
+    submitted = [make_table("A1"), make_table("A2", name="窗邊"), make_table("A4")]
+
+    diff = diff_layout(current, submitted)
+    assert [d["table_id"] for d in diff.inserts] == ["A4"]
+    assert diff.updates == [("A2", {"name": "窗邊"})]
+    assert diff.deletes == ["A3"]
+
+
+def test_diff_layout_ignores_live_fields():
+    current = [make_table("A1", occupied=3, updateTime="2026-01-01T12:00:00")]
+    diff = diff_layout(current, [make_table("A1", occupied=0, updateTime=None)])
+    assert diff == ([], [], [])
+
+
+def test_diff_layout_compares_legacy_comma_tags():
+    current = [make_table("A1", tags="插座, 窗邊")]
+    assert diff_layout(current, [make_table("A1", tags=["插座", "窗邊"])]).updates == []
+
+
+def test_put_layout_keeps_ids_and_occupancy(client):
+    client.put("/tables/layout", json=[make_table("A1"), make_table("A2", left=10.0)])
+    before = {t["table_id"]: t for t in client.get("/tables").json()}
+    client.post("/tables/A1/checkin", json={"guests": 2})
+
+    resp = client.put("/tables/layout", json=[make_table("A1", name="吧台"), make_table("A3", left=20.0)])
+    assert resp.status_code == 200
+    assert resp.headers["X-Layout-Diff"] == "inserted=1, updated=1, deleted=1"
+
+    after = {t["table_id"]: t for t in resp.json()}
+    assert sorted(after) == ["A1", "A3"]
+    assert after["A1"]["id"] == before["A1"]["id"]
+    assert after["A1"]["name"] == "吧台"
+    assert after["A1"]["occupied"] == 2
+
+
+
+def _chunks(text: str, size: int):
+    async def gen():
+        data = text.encode("utf-8")
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+    return gen()
+
+
+def test_parse_layout_handles_quoted_newlines_across_chunks():
+    csv_text = ('topbar-title,bgHidden,gridHidden,seatIndexShown\r\n咖啡廳,false,true,true\r\n\r\n'
+                'table_id,name,description\r\nA1,A1,"第一行\r\n第二行"\r\nA2,A2\r\n')
+
+    async def collect():
+        return [item async for item in parse_layout(_chunks(csv_text, 7))]
+
+    items = asyncio.run(collect())
+    assert items[0] == ("settings", 2, {"topbar-title": "咖啡廳", "bgHidden": "false",
+                                        "gridHidden": "true", "seatIndexShown": "true"})
+    assert items[1] == ("table", 5, {"table_id": "A1", "name": "A1", "description": "第一行\n第二行"})
+    assert items[2] == ("error", 7, "expected 3 columns, got 2")
+
+
+def test_export_then_import_round_trip(client):
+    client.post("/tables", json=make_table("A1", tags=["插座", "窗邊"], description='說明, 含 "引號"'))
+    client.post("/tables", json=make_table("A2", left=10.0))
+    exported = client.get("/layout/export").text
+
+    client.post("/tables", json=make_table("A3", left=80.0))
+    report = client.post("/layout/import", params={"mode": "replace"}, content=exported.encode("utf-8")).json()
+    assert (report["inserted"], report["updated"], report["deleted"], report["errorCount"]) == (0, 2, 1, 0)
+
+    tables = {t["table_id"]: t for t in client.get("/tables").json()}
+    assert sorted(tables) == ["A1", "A2"]
+    assert tables["A1"]["tags"] == ["插座", "窗邊"]
+    assert tables["A1"]["description"] == '說明, 含 "引號"'
+
+
+def test_import_reports_bad_rows_and_keeps_the_rest(client):
+    header = "table_id,floor,index,name,left,top,width,height,capacity,occupied,extraSeatLimit," \
+             "tags,description,updateTime,available\r\n"
+    csv_text = (header
+                + "A1,1F,1,A1,50,50,2,1,4,0,0,,,,true\r\n"
+                + "A2,1F,2,A2,abc,50,2,1,4,0,0,,,,true\r\n"
+                + "A3,1F,3,A3,51,50,2,1,4,0,0,,,,true\r\n")
+    report = client.post("/layout/import", params={"mode": "replace"}, content=csv_text.encode()).json()
+
+    assert report["inserted"] == 1
+    assert [(e["line"], e["table_id"]) for e in report["errors"]] == [(3, "A2"), (4, "A3")]
+    assert "overlaps A1" in report["errors"][1]["error"]
+    assert report["deleted"] == 0  # 有錯誤時 replace 不刪除
@@ -0,0 +1,38 @@
+import re
+
+from conftest import make_table
+
+
+def _sample(body: str, name: str, **labels) -> float:
+    """exposition 裡 name{labels...} 的值（labels 只要包含指定的那些即可）"""
+    for line in body.splitlines():
+        match = re.match(rf"{name}\{{(.*)\}} (\S+)$", line)
+        if match and all(f'{k}="{v}"' in match.group(1).split(",") for k, v in labels.items()):
+            return float(match.group(2))
+    raise AssertionError(f"{name} {labels} not found")
+
+
+def test_metrics_exposes_request_counter_and_histogram(client):
+    client.post("/tables", json=make_table("A1"))
+    before = client.get("/metrics").text
+    labels = {"method": "POST", "route": "/tables/{table_id}/checkin", "status": "200"}
+    try:
+        seen = _sample(before, "http_requests_total", **labels)
+    except AssertionError:
+        seen = 0
+
+    for _ in range(3):
+        assert client.post("/tables/A1/checkin", json={"guests": 1}).status_code == 200
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+
+    assert "# TYPE http_requests_total counter" in body
+    assert "# TYPE http_request_duration_seconds histogram" in body
+    # 路由樣板當 label，不是實際的路徑
+    assert _sample(body, "http_requests_total", **labels) == seen + 3
+    assert _sample(body, "http_request_duration_seconds_count", **labels) == seen + 3
+    assert _sample(body, "http_request_duration_seconds_bucket", le="+Inf", **labels) == seen + 3
+    assert _sample(body, "http_request_duration_seconds_sum", **labels) > 0
+    assert 'route="/tables/A1/checkin"' not in body
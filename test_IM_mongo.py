@@ -0,0 +1,14 @@
+import pytest
+
+from IM_mongo import mongo_settings_from_env
+
+
+def test_mongo_uri_is_required(monkeypatch):
+    monkeypatch.delenv("MONGO_URI", raising=False)
+    with pytest.raises(RuntimeError, match="MONGO_URI"):
+        mongo_settings_from_env()
+
+
+def test_mongo_uri_from_env(monkeypatch):
+    monkeypatch.setenv("MONGO_URI", "mongodb://localhost:27017")
+    assert mongo_settings_from_env().uri == "mongodb://localhost:27017"
@@ -0,0 +1,38 @@
+import asyncio
+
+import httpx
+import pytest
+
+from conftest import make_table
+
+CAPACITY, EXTRA = 4, 2
+
+
+async def _concurrent_checkins(app, path: str, count: int, **change):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+        return await asyncio.gather(*(http.post(path, json=change) for _ in range(count)))
+
+
+@pytest.mark.parametrize("prefix", ["/tables", "/seats"])
+def test_parallel_checkins_never_overbook(client, prefix):
+    import IM_app
+
+    client.post("/tables", json=make_table("A1", capacity=CAPACITY, extraSeatLimit=EXTRA))
+    responses = asyncio.run(_concurrent_checkins(IM_app.app, f"{prefix}/A1/checkin", 20, guests=1))
+
+    statuses = sorted(r.status_code for r in responses)
+    assert statuses == [200] * (CAPACITY + EXTRA) + [409] * (20 - CAPACITY - EXTRA)
+    occupied = client.get("/seats/table/A1").json()["occupied"]
+    assert occupied == CAPACITY + EXTRA
+
+
+def test_parallel_checkins_without_extra_seats(client):
+    import IM_app
+
+    client.post("/tables", json=make_table("A1", capacity=CAPACITY, extraSeatLimit=EXTRA))
+    responses = asyncio.run(_concurrent_checkins(
+        IM_app.app, "/tables/A1/checkin", 10, guests=3, useExtraSeats=False))
+
+    assert sum(r.status_code == 200 for r in responses) == 1
+    assert client.get("/seats/table/A1").json()["occupied"] <= CAPACITY
@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+from conftest import make_table
+
+import IM_qrcode
+
+
+@pytest.fixture
+def fake_render(monkeypatch):
+    """qrcode[pil] 是選用套件：改用假的 render_png，記錄實際產生了哪些網址"""
+    rendered = []
+
+    def render_png(url, style=IM_qrcode.DEFAULT_STYLE):
+        rendered.append(url)
+        return f"PNG {url} {style.box_size}".encode("utf-8")
+
+    monkeypatch.setattr(IM_qrcode, "render_png", render_png)
+    IM_qrcode.QR_IMAGES.clear()
+    yield rendered
+    IM_qrcode.QR_IMAGES.clear()
+
+
+def test_generate_skips_unchanged_tables(tmp_path, fake_render):
+    tables = [make_table("A1"), make_table("A2")]
+    first = IM_qrcode.generate(tables, str(tmp_path), base_url="http://cafe/c", sheets=False)
+    assert first["rendered"] == ["A1", "A2"]
+    assert len(fake_render) == 2
+
+    # 內容沒變的桌位不重做；新的桌位、PNG 不見的桌位才產生，不在清單裡的桌位刪掉 PNG
+    os.remove(tmp_path / "A2.png")
+    second = IM_qrcode.generate([make_table("A2"), make_table("A3")], str(tmp_path),
+                                base_url="http://cafe/c", sheets=False)
+    assert second["rendered"] == ["A2", "A3"]
+    assert second["skipped"] == []
+    assert second["removed"] == ["A1"]
+    assert not (tmp_path / "A1.png").exists()
+
+    third = IM_qrcode.generate([make_table("A2"), make_table("A3")], str(tmp_path),
+                               base_url="http://cafe/c", sheets=False)
+    assert third["rendered"] == []
+    assert third["skipped"] == ["A2", "A3"]
+    assert len(fake_render) == 4
+
+    # 網址變了，內容雜湊跟著變，全部重新產生
+    fourth = IM_qrcode.generate([make_table("A2")], str(tmp_path), base_url="http://cafe/d", sheets=False)
+    assert fourth["rendered"] == ["A2"]
+    manifest = json.loads((tmp_path / IM_qrcode.MANIFEST_NAME).read_text(encoding="utf-8"))
+    assert manifest["tables"]["A2"]["url"] == "http://cafe/d?table_id=A2"
+
+
+def test_table_qr_etag_and_not_modified(client, fake_render, monkeypatch):
+    import IM_db_server
+
+    monkeypatch.setattr(IM_db_server, "qrcode", object())
+    client.post("/tables", json=make_table("A1"))
+
+    resp = client.get("/tables/A1/qr")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "image/png"
+    etag = resp.headers["etag"]
+    assert etag
+
+    resp = client.get("/tables/A1/qr", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+    # 304 不產生圖片，第二次也沒有重新產生
+    assert len(fake_render) == 1
+
+    # 圖片設定不同，ETag 也不同
+    resp = client.get("/tables/A1/qr", params={"box_size": 4}, headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+
+    assert client.get("/tables/B9/qr").status_code == 404
@@ -0,0 +1,44 @@
+from conftest import make_table
+from IM_query import TableQuery, natural_key
+
+
+def _query(**params):
+    defaults = {"floor": None, "kind": None, "min_free_seats": None, "tags": None, "sort": None, "bbox": None}
+    return TableQuery(**{**defaults, **params})
+
+
+def _ids(tables):
+    return [t["table_id"] for t in tables]
+
+
+TABLES = [
+    make_table("A10", name="A10", capacity=4, occupied=1, tags=["插座"]),
+    make_table("A2", name="A2", capacity=2, tags=["插座", "窗邊"]),
+    make_table("B1", name="B1", floor="2F", capacity=6),
+    make_table("s_1", name="盆栽", capacity=0),
+]
+
+
+def test_natural_key_orders_numbers_numerically():
+    assert sorted(["A10", "a2", "A1"], key=natural_key) == ["A1", "a2", "A10"]
+
+
+def test_filters_combine():
+    assert _ids(_query(floor="1F", kind="table").apply(TABLES)) == ["A10", "A2"]
+    assert _ids(_query(kind="seat").apply(TABLES)) == ["s_1"]
+    assert _ids(_query(min_free_seats=3).apply(TABLES)) == ["A10", "B1"]
+    assert _ids(_query(tags="插座,窗邊").apply(TABLES)) == ["A2"]
+
+
+def test_multi_field_sort():
+    assert _ids(_query(kind="table", sort="-free,name").apply(TABLES)) == ["B1", "A10", "A2"]
+    assert _ids(_query(kind="table", sort="floor,name").apply(TABLES)) == ["A2", "A10", "B1"]
+
+
+def test_listing_endpoint_filters_and_rejects_unknown_sort(client):
+    for i, table in enumerate(TABLES):
+        client.post("/tables", json={**table, "left": 10.0 + i * 20})
+
+    resp = client.get("/seats", params={"kind": "table", "sort": "-free"})
+    assert _ids(resp.json()) == ["B1", "A10", "A2"]
+    assert client.get("/tables", params={"sort": "price"}).status_code == 422
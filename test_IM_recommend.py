@@ -0,0 +1,60 @@
+from conftest import make_table
+from IM_recommend import SeatIndex
+
+
+def _ids(results):
+    return [r["table"]["table_id"] for r in results]
+
+
+def _index(*tables):
+    index = SeatIndex()
+    index.reset(list(tables))
+    return index
+
+
+def test_prefers_matching_tags_then_least_waste_then_name():
+    index = _index(
+        make_table("A1", name="A1", capacity=6),
+        make_table("A2", name="A2", capacity=4, tags=["窗邊"]),
+        make_table("A10", name="A10", capacity=4),
+        make_table("A3", name="A3", capacity=4),
+    )
+    results = index.recommend(4, ["窗邊"])
+    assert _ids(results) == ["A2", "A3", "A10", "A1"]
+    assert results[0]["matchedTags"] == ["窗邊"]
+    assert results[-1]["wastedSeats"] == 2
+
+
+def test_skips_tables_that_cannot_seat_the_party():
+    index = _index(
+        make_table("A1", capacity=4, occupied=2),
+        make_table("A2", capacity=4, available=False),
+        make_table("s_1", capacity=8),  # 裝飾物件
+        make_table("A3", capacity=2, extraSeatLimit=1),
+    )
+    assert _ids(index.recommend(3)) == ["A3"]
+
+
+def test_floor_filter_and_limit():
+    index = _index(*(make_table(f"A{i}", floor="1F" if i % 2 else "2F") for i in range(10)))
+    assert _ids(index.recommend(1, floor="2F", limit=3)) == ["A0", "A2", "A4"]
+    assert len(index.recommend(1, limit=7)) == 7
+
+
+def test_follows_check_ins():
+    table = make_table("A1", capacity=4)
+    index = _index(table)
+    seated = {**table, "occupied": 2}
+    index.apply(table, seated)
+    assert index.recommend(3) == []
+    assert index.recommend(2)[0]["freeSeats"] == 2
+
+
+def test_recommend_endpoint(client):
+    client.post("/tables", json=make_table("A1", capacity=2))
+    client.post("/tables", json=make_table("A2", capacity=6, left=10.0, tags=["插座"]))
+
+    body = client.get("/seats/recommend", params={"party": 2, "tags": "插座"}).json()
+    assert body["tags"] == ["插座"]
+    assert [r["table"]["table_id"] for r in body["results"]] == ["A2", "A1"]
+    assert client.get("/seats/recommend", params={"party": 0}).status_code == 422
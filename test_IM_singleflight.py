@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+import pytest
+
+from IM_singleflight import SingleFlight, SingleFlightMiddleware
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*(flight.do("k", load) for _ in range(10)))
+        assert results == [1] * 10
+        assert (flight.hits, flight.misses) == (9, 1)
+        # 執行完就不再合併（window=0）
+        assert await flight.do("k", load) == 2
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("db down")
+
+        results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+        assert [str(r) for r in results] == ["db down"] * 3
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def load():
+            await release.wait()
+            return "ok"
+
+        first = asyncio.ensure_future(flight.do("k", load))
+        second = asyncio.ensure_future(flight.do("k", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        release.set()
+        assert await second == "ok"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(scenario())
+
+
+def test_micro_cache_window_and_forget():
+    async def scenario():
+        flight = SingleFlight(window=60)
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await flight.do("k", load) == 1
+        assert await flight.do("k", load) == 1
+        flight.forget()
+        assert await flight.do("k", load) == 2
+
+    asyncio.run(scenario())
+
+
+def test_middleware_coalesces_identical_gets():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["query_string"])
+        await asyncio.sleep(0.01)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"hello"})
+
+    middleware = SingleFlightMiddleware(app, paths=["/tables"], flight=SingleFlight())
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=middleware)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            same = [http.get("/tables?b=2&a=1"), http.get("/tables?a=1&b=2")]
+            other = [http.get("/tables?a=2"), http.get("/other"), http.get("/other")]
+            return await asyncio.gather(*same, *other)
+
+    responses = asyncio.run(scenario())
+    assert all(r.text == "hello" for r in responses)
+    # query string 順序不同仍是同一個請求；不在 paths 裡的路徑不合併
+    assert len(calls) == 4
@@ -0,0 +1,72 @@
+import pytest
+
+from conftest import make_table
+from IM_spatial import GridIndex, SpatialIndex, find_overlaps, parse_bbox, rects_overlap, table_rect
+
+
+def test_table_rect_uses_editor_grid_units():
+    # 半寬 = width x 2、半高 = height x 3.125（同 KCafe.jsx）
+    assert table_rect(make_table("A1", left=50.0, top=50.0, width=2.0, height=1.0)) == (46.0, 46.875, 54.0, 53.125)
+
+
+def test_touching_edges_do_not_overlap():
+    assert not rects_overlap((0, 0, 10, 10), (10, 0, 20, 10))
+    assert rects_overlap((0, 0, 10, 10), (9.9, 0, 20, 10))
+
+
+@pytest.mark.parametrize("value", ["1,2,3", "a,b,c,d", "5,0,1,1", "0,0,inf,1"])
+def test_parse_bbox_rejects_bad_input(value):
+    with pytest.raises(ValueError):
+        parse_bbox(value)
+
+
+def test_grid_index_search_and_remove():
+    grid = GridIndex(cell_size=5)
+    grid.insert("a", (0, 0, 4, 4))
+    grid.insert("b", (20, 20, 24, 24))
+    grid.insert("huge", (-1e6, -1e6, 1e6, 1e6))  # 超過 MAX_CELLS，改成每次直接比對
+
+    assert sorted(grid.search((3, 3, 6, 6))) == ["a", "huge"]
+    assert sorted(grid.overlapping((4, 4, 30, 30))) == ["b", "huge"]  # 跟 a 只有角貼在一起
+    grid.remove("a")
+    grid.remove("huge")
+    assert "a" not in grid and len(grid) == 1
+    assert grid.search((3, 3, 6, 6)) == []
+
+
+def test_find_overlaps_only_within_a_floor():
+    tables = [
+        make_table("A1"),
+        make_table("A2", left=51.0),
+        make_table("B1", floor="2F", left=51.0),
+        make_table("A3", left=80.0),
+    ]
+    assert find_overlaps(tables) == [("A1", "A2")]
+
+
+def test_spatial_index_follows_cache_updates():
+    index = SpatialIndex()
+    a1, a2 = make_table("A1", left=10.0), make_table("A2", left=80.0)
+    index.reset([a1, a2])
+    assert [t["table_id"] for t in index.search((0, 0, 20, 100), floor="1F")] == ["A1"]
+
+    moved = {**a1, "left": 79.0}
+    index.apply(a1, moved)
+    assert index.search((0, 0, 20, 100)) == []
+    assert index.collisions(make_table("A9", left=79.5)) == ["A1", "A2"]
+    assert index.collisions(moved, ignore=("A1",)) == ["A2"]
+
+
+def test_bbox_query_and_overlap_rejection(client):
+    client.post("/tables", json=make_table("A1", left=10.0))
+    client.post("/tables", json=make_table("A2", left=80.0))
+
+    found = client.get("/tables", params={"bbox": "0,0,20,100"}).json()
+    assert [t["table_id"] for t in found] == ["A1"]
+    assert client.get("/tables", params={"bbox": "1,2,3"}).status_code == 422
+
+    assert client.post("/tables", json=make_table("A3", left=11.0)).status_code == 409
+    assert client.patch("/tables/A2", json=make_table("A2", left=12.0)).status_code == 409
+    resp = client.put("/tables/layout", json=[make_table("A1"), make_table("A2", left=51.0)])
+    assert resp.status_code == 422
+    assert "A1/A2" in resp.json()["detail"]
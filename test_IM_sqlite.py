@@ -0,0 +1,18 @@
+import asyncio
+
+from IM_indexes import IndexSpec
+from IM_sqlite import SqliteTableStore
+
+
+def test_explain_find_detects_full_scans(tmp_path):
+    store = SqliteTableStore(str(tmp_path / "explain.db"))
+
+    async def scenario():
+        await store.create_index("tables", IndexSpec("floor_1", [("floor", 1)]))
+        indexed = await store.explain_find("tables", {"floor": "1F"})
+        unindexed = await store.explain_find("tables", {"description": "x"})
+        return indexed, unindexed
+
+    indexed, unindexed = asyncio.run(scenario())
+    assert indexed["queryPlanner"]["winningPlan"]["stage"] == "IXSCAN"
+    assert unindexed["queryPlanner"]["winningPlan"]["stage"] == "COLLSCAN"
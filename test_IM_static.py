@@ -0,0 +1,87 @@
+import gzip
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+import IM_static
+
+
+class _FakeBrotli:
+    """brotli 是選用套件：用固定前綴代替真正的壓縮結果"""
+
+    @staticmethod
+    def compress(body, quality=11):
+        return b"br:" + body
+
+
+def _static_client(monkeypatch) -> TestClient:
+    monkeypatch.setattr(IM_static, "brotli", _FakeBrotli)
+    assets = IM_static.StaticAssets()
+    assets.add("/page", "<p>桌位</p>" * 200, "text/html; charset=utf-8")
+    assets.add("/tiny", "<p>ok</p>", "text/html; charset=utf-8")
+
+    app = FastAPI()
+
+    @app.get("/{path}")
+    async def page(path: str, request: Request):
+        return assets.response(request, f"/{path}")
+
+    return TestClient(app)
+
+
+def test_encoding_follows_accept_encoding(monkeypatch):
+    client = _static_client(monkeypatch)
+    body = ("<p>桌位</p>" * 200).encode("utf-8")
+
+    br = client.get("/page", headers={"Accept-Encoding": "gzip, br"})
+    assert br.headers["content-encoding"] == "br"
+    assert br.content == b"br:" + body
+
+    gz = client.get("/page", headers={"Accept-Encoding": "gzip"})
+    assert gz.headers["content-encoding"] == "gzip"
+    assert gz.content == body  # TestClient 會自動解 gzip
+
+    plain = client.get("/page", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == body
+
+    # 太小的內容不壓縮
+    tiny = client.get("/tiny", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in tiny.headers
+
+    for resp in (br, gz, plain, tiny):
+        assert resp.headers["vary"] == "Accept-Encoding"
+    # 不同編碼共用同一個 weak ETag
+    assert br.headers["etag"].startswith("W/")
+    assert br.headers["etag"] == gz.headers["etag"] == plain.headers["etag"]
+
+
+def test_gzip_is_precompressed_once():
+    asset = IM_static.StaticAssets().add("/page", "<p>桌位</p>" * 200, "text/html; charset=utf-8")
+    assert gzip.decompress(asset.gzip) == asset.body
+    assert len(asset.gzip) < len(asset.body)
+
+
+def test_if_none_match_returns_304(monkeypatch):
+    client = _static_client(monkeypatch)
+    etag = client.get("/page").headers["etag"]
+
+    resp = client.get("/page", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert resp.status_code == 304
+    assert resp.content == b""
+    assert resp.headers["etag"] == etag
+    assert resp.headers["vary"] == "Accept-Encoding"
+    assert resp.headers["cache-control"] == IM_static.HTML_CACHE
+
+    assert client.get("/page", headers={"If-None-Match": 'W/"other"'}).status_code == 200
+    assert client.get("/missing").status_code == 404
+
+
+def test_customer_page_served_from_assets(client):
+    first = client.get("/customer", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in first.headers["vary"]
+
+    resp = client.get("/customer", headers={"If-None-Match": first.headers["etag"]})
+    assert resp.status_code == 304
@@ -0,0 +1,42 @@
+import asyncio
+
+from conftest import make_table
+from IM_stats import OccupancyStats
+
+
+class _Store:
+    def __init__(self, floors):
+        self.floors = floors
+
+    async def occupancy_by_floor(self):
+        return self.floors
+
+
+def test_incremental_updates_match_a_full_recount():
+    stats = OccupancyStats(store=None)
+    a1 = make_table("A1", capacity=4, extraSeatLimit=2)
+    stats.reset([a1, make_table("B1", floor="2F", capacity=2), make_table("s_1", capacity=3)])
+
+    stats.apply(a1, {**a1, "occupied": 3})
+    stats.apply(None, make_table("A2", capacity=2, occupied=1))
+    stats.apply(make_table("B1", floor="2F", capacity=2), None)
+
+    snapshot = stats.snapshot()
+    assert snapshot["floors"] == {"1F": {"tables": 2, "seats": 8, "occupied": 4, "utilization": 0.5}}
+    assert snapshot["store"] == snapshot["floors"]["1F"]
+
+
+def test_reconcile_corrects_drift_from_the_database():
+    stats = OccupancyStats(_Store({"1F": {"tables": 1, "seats": 4, "occupied": 2}}))
+    stats.reset([make_table("A1", capacity=4)])
+
+    report = asyncio.run(stats.reconcile())
+    assert report["drift"] == {"1F": {"occupied": 2}}
+    assert report["corrected"] is True
+    assert stats.snapshot()["store"]["occupied"] == 2
+
+
+def test_stats_endpoint_follows_check_ins(client):
+    client.post("/tables", json=make_table("A1", capacity=4))
+    client.post("/tables/A1/checkin", json={"guests": 3})
+    assert client.get("/stats").json()["store"]["occupied"] == 3
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from conftest import make_table
+
+mongomock = pytest.importorskip("mongomock")
+
+from IM_storage import MongoTableStore  # noqa: E402
+
+
+@pytest.fixture
+def mongo_store():
+    return MongoTableStore(mongomock.MongoClient()["im_test"])
+
+
+def test_cursor_stops_before_inflight_revision(mongo_store):
+    async def scenario():
+        await mongo_store.insert(make_table("A1"))
+        first = await mongo_store.changes_since(0)
+
+        # 較早拿到 revision 的寫入還沒完成，較晚的寫入先寫完
+        slow_rev = mongo_store._next_revision()
+        await mongo_store.insert(make_table("A2", left=10.0))
+        during = await mongo_store.changes_since(first["cursor"])
+        assert "A2" in [t["table_id"] for t in during["upserted"]]
+        assert during["cursor"] < slow_rev
+        mongo_store.tables.update_one({"table_id": "A1"}, {"$set": {"rev": slow_rev}})
+
+        after = await mongo_store.changes_since(during["cursor"])
+        # A1 的修改不會被跳過；A2 再送一次，前端依 table_id 覆蓋
+        assert sorted(t["table_id"] for t in after["upserted"]) == ["A1", "A2"]
+
+    asyncio.run(scenario())
+
+
+def test_reset_cursor_stops_before_inflight_revision(mongo_store):
+    async def scenario():
+        slow_rev = mongo_store._next_revision()
+        await mongo_store.insert(make_table("A1"))
+        snapshot = await mongo_store.changes_since(0)
+        assert snapshot["reset"]
+        assert snapshot["cursor"] < slow_rev
+
+    asyncio.run(scenario())
+
+
+def test_cursor_after_clear_skips_older_tombstones(mongo_store):
+    async def scenario():
+        await mongo_store.insert(make_table("A1"))
+        await mongo_store.clear()
+        await mongo_store.insert(make_table("A2"))
+
+        snapshot = await mongo_store.changes_since(0)
+        assert [t["table_id"] for t in snapshot["upserted"]] == ["A2"]
+        # cursor 不會早於整批重置的 revision，下一次不會又整批重抓
+        changes = await mongo_store.changes_since(snapshot["cursor"])
+        assert not changes["reset"]
+        assert [t["table_id"] for t in changes["upserted"]] == ["A2"]
+
+    asyncio.run(scenario())
+
+
+def test_rename_writes_tombstone_for_old_id(mongo_store):
+    async def scenario():
+        await mongo_store.insert(make_table("A1"))
+        cursor = (await mongo_store.changes_since(0))["cursor"]
+
+        renamed = await mongo_store.update("A1", {"table_id": "A9"})
+        assert renamed["table_id"] == "A9"
+
+        changes = await mongo_store.changes_since(cursor)
+        assert [t["table_id"] for t in changes["upserted"]] == ["A9"]
+        assert changes["deleted"] == ["A1"]
+
+    asyncio.run(scenario())
+
+
+class _RecordingSession:
+    """mongomock 沒有 session：只記錄 transaction 的呼叫順序"""
+
+    def __init__(self, calls):
+        self.calls = calls
+
+    def start_transaction(self):
+        self.calls.append("start")
+
+    def commit_transaction(self):
+        self.calls.append("commit")
+
+    def abort_transaction(self):
+        self.calls.append("abort")
+
+    def end_session(self):
+        self.calls.append("end")
+
+
+def test_apply_layout_runs_in_one_transaction(mongo_store, monkeypatch):
+    from IM_layout import diff_layout
+    from IM_storage import DuplicateTableError
+
+    from mongomock.not_implemented import ignore_feature, warn_on_feature
+
+    calls = []
+    monkeypatch.setattr(mongo_store.db.client, "start_session", lambda: _RecordingSession(calls), raising=False)
+    ignore_feature("session")
+    mongo_store.tables.create_index("table_id", unique=True)
+
+    async def scenario():
+        await mongo_store.insert(make_table("A1"))
+        result = await mongo_store.apply_layout(diff_layout([make_table("A1")], [make_table("A2")]))
+        assert [d["table_id"] for d in result["upserted"]] == ["A2"]
+        assert calls == ["start", "commit", "end"]
+
+        calls.clear()
+        await mongo_store.insert(make_table("A3"))
+        # A3 在比對之後才被別的請求新增：InsertOne 撞到 unique index，整個 transaction abort
+        with pytest.raises(DuplicateTableError):
+            await mongo_store.apply_layout(diff_layout([], [make_table("A3")]))
+        assert calls == ["start", "abort", "end"]
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        warn_on_feature("session")